@@ -207,3 +207,76 @@ class DebugPanel:
                     st.write(f"- Chunk Overlap: {result.get('chunk_overlap', 'N/A')}")
                 else:
                     st.error("No RAG configuration found")
+
+        # Batch Test Search
+        self._render_batch_test_search(token)
+
+    def _render_batch_test_search(self, token: str) -> None:
+        """Batch test search: nhiều probe queries trong một request, kết quả stream về theo từng query"""
+        st.subheader("🧪 Batch Test Search")
+        queries_text = st.text_area(
+            "Queries (one per line)",
+            placeholder="Enter one query per line...",
+            height=150,
+            key="batch_search_queries"
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            batch_k = st.number_input("Number of results (k)", min_value=1, max_value=50, value=5, key="batch_search_k")
+        with col2:
+            config_ids_text = st.text_input(
+                "RAG config ids (optional, comma separated)",
+                placeholder="Latest config if empty",
+                key="batch_search_config_ids"
+            )
+
+        if st.button("Run Batch Search", key="batch_search_btn"):
+            queries = [q.strip() for q in queries_text.splitlines() if q.strip()]
+            if not queries:
+                st.warning("Please enter at least one query.")
+                return
+
+            try:
+                config_ids = [int(x) for x in config_ids_text.split(",") if x.strip()] or None
+            except ValueError:
+                st.error("Config ids must be integers.")
+                return
+
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            rows = []
+            details = []
+            expected = len(queries) * (len(config_ids) if config_ids else 1)
+
+            for line in self.chat_service.test_search_batch(queries, batch_k, token, config_ids):
+                if not line.get("success"):
+                    st.error(f"Search error: {line.get('message', 'Unknown error')}")
+                    if "query" not in line:
+                        continue
+
+                results = line.get("results", [])
+                rows.append({
+                    "Config": line.get("rag_config_name", ""),
+                    "Query": line.get("query", ""),
+                    "Results": line.get("num_results", 0),
+                    "Top Score": round(results[0]["similarity_score"], 4) if results else None,
+                    "Latency (ms)": line.get("latency_ms")
+                })
+                details.append(line)
+
+                progress_bar.progress(min(len(rows) / expected, 1.0))
+                status_text.text(f"Received {len(rows)}/{expected} results...")
+
+            status_text.text(f"Done: {len(rows)} results")
+            if rows:
+                st.dataframe(rows, use_container_width=True)
+
+            for line in details:
+                with st.expander(f"[{line.get('rag_config_name', '')}] {line.get('query', '')}", expanded=False):
+                    for i, doc_result in enumerate(line.get("results", [])):
+                        st.write(f"**Result {i+1}** (Score: {doc_result.get('similarity_score', 0):.4f})")
+                        page_content = doc_result.get("page_content", "")
+                        if st.session_state.debug_show_full_content or len(page_content) <= 200:
+                            st.text(page_content)
+                        else:
+                            st.text(page_content[:200] + "...")
@@ -2,13 +2,6 @@ import streamlit as st
 import time
 from datetime import datetime
 from typing import Dict, Any, List
-try:
-    import PyPDF2
-    from PyPDF2 import PdfReader
-    HAS_PYPDF2 = True
-except ImportError:
-    HAS_PYPDF2 = False
-    PdfReader = None
 
 
 class DocumentManagementTab:
@@ -29,6 +22,7 @@ class DocumentManagementTab:
 
         with doc_col2:
             self._render_upload_form()
+            self._render_bulk_upload_form()
 
     def _render_document_list(self):
         """Hiển thị danh sách documents"""
@@ -119,52 +113,6 @@ class DocumentManagementTab:
         else:
             st.error(f"Failed to delete document: {result.get('error', 'Unknown error')}")
 
-    def _extract_pdf_metadata(self, uploaded_file) -> Dict[str, Any]:
-        """Extract metadata từ PDF file"""
-        if PdfReader is None:
-            st.warning("PyPDF2 chưa được cài đặt. Không thể đọc metadata từ PDF.")
-            return {"success": False, "pages": 1}
-
-        try:
-            # Reset file pointer
-            uploaded_file.seek(0)
-
-            # Đọc PDF
-            pdf_reader = PdfReader(uploaded_file)
-
-            # Lấy số trang
-            num_pages = len(pdf_reader.pages)
-
-            # Lấy metadata
-            metadata = pdf_reader.metadata
-
-            result = {
-                "success": True,
-                "pages": num_pages,
-            }
-
-            # Extract title nếu có
-            if metadata and metadata.get('/Title'):
-                result['title'] = metadata.get('/Title')
-
-            # Extract author nếu có
-            if metadata and metadata.get('/Author'):
-                result['author'] = metadata.get('/Author')
-
-            # Extract creation date nếu có
-            if metadata and metadata.get('/CreationDate'):
-                result['creation_date'] = metadata.get('/CreationDate')
-
-            # Reset file pointer lại để upload
-            uploaded_file.seek(0)
-
-            return result
-
-        except Exception as e:
-            st.warning(f"Không thể đọc PDF: {str(e)}")
-            uploaded_file.seek(0)  # Reset file pointer
-            return {"success": False, "pages": 1}
-
     def _render_upload_form(self):
         """Form upload document"""
         st.subheader("Upload Document")
@@ -172,31 +120,20 @@ class DocumentManagementTab:
         uploaded_file = st.file_uploader("Choose a PDF file", type="pdf", key="doc_uploader")
 
         if uploaded_file is not None:
-            # Tự động đọc metadata từ PDF
-            pdf_metadata = self._extract_pdf_metadata(uploaded_file)
-
-            # Hiển thị thông tin đã extract
-            if pdf_metadata.get("success"):
-                st.success(f"✓ PDF đã được phân tích: {pdf_metadata['pages']} trang")
-                if pdf_metadata.get('title'):
-                    st.info(f"Title từ PDF: {pdf_metadata['title']}")
-                if pdf_metadata.get('author'):
-                    st.info(f"Author từ PDF: {pdf_metadata['author']}")
-
-            # Form nhập thông tin (với giá trị mặc định từ PDF)
-            default_title = pdf_metadata.get('title') or uploaded_file.name.replace('.pdf', '')
-            default_author = pdf_metadata.get('author', '')
-            default_pages = pdf_metadata.get('pages', 1)
-
-            doc_title = st.text_input("Document Title", default_title)
-            doc_author = st.text_input("Author", default_author)
-            doc_pages = st.number_input("Total Pages", min_value=1, value=default_pages, disabled=True, help="Tự động đọc từ PDF")
-            doc_date = st.date_input("Creation Date", datetime.now())
+            # Số trang, title, author, creation date được server đọc từ PDF sau khi upload;
+            # chỉ nhập khi muốn ghi đè
+            st.caption("Số trang và metadata (title, author, creation date) được server đọc từ PDF. "
+                       "Để trống để dùng giá trị trong PDF.")
+            doc_title = st.text_input("Document Title", "", placeholder="(từ PDF)")
+            doc_author = st.text_input("Author", "", placeholder="(từ PDF)")
+            override_date = st.checkbox("Set creation date manually", value=False)
+            doc_date = st.date_input("Creation Date", datetime.now()) if override_date else None
+            cache_pages = st.checkbox("Parse page text now (faster first indexing)", value=True)
 
             if st.button("Upload Document", key="save_doc_btn", type="primary"):
-                self._save_document(uploaded_file, doc_title, doc_author, doc_pages, doc_date)
+                self._save_document(uploaded_file, doc_title, doc_author, doc_date, cache_pages)
 
-    def _save_document(self, file, title: str, author: str, pages: int, date):
+    def _save_document(self, file, title: str, author: str, date, cache_pages: bool = True):
         """Upload document lên backend"""
         token = st.session_state.get("token", "")
 
@@ -205,23 +142,20 @@ class DocumentManagementTab:
         status_text = st.empty()
 
         try:
-            # Read file data
-            status_text.text("Reading file...")
-            progress_bar.progress(20)
-            file_data = file.read()
-
-            # Upload to backend
+            # Upload to backend (gửi thẳng file object, không đọc thêm một bản copy)
             status_text.text("Uploading to server...")
-            progress_bar.progress(50)
+            progress_bar.progress(30)
+            file.seek(0)
 
             result = self.document_service.upload_document(
-                file_data=file_data,
+                file_data=file,
                 filename=file.name,
                 title=title if title else None,
                 author=author if author else None,
-                total_pages=pages,
+                total_pages=None,
                 creation_date=date.isoformat() if date else None,
-                token=token
+                token=token,
+                cache_pages=cache_pages
             )
 
             progress_bar.progress(80)
@@ -229,7 +163,7 @@ class DocumentManagementTab:
             if result["success"]:
                 status_text.text("Processing complete!")
                 progress_bar.progress(100)
-                st.success(f"Document '{title}' uploaded successfully!")
+                st.success(f"Document '{result['data'].get('title') or file.name}' uploaded successfully!")
                 time.sleep(1)
                 st.rerun()
             else:
@@ -241,3 +175,35 @@ class DocumentManagementTab:
             status_text.text("")
             progress_bar.empty()
             st.error(f"Upload failed: {str(e)}")
+
+    def _render_bulk_upload_form(self):
+        """Upload nhiều PDFs hoặc ZIP archives trong một request"""
+        with st.expander("Bulk Upload (multiple PDFs / ZIP)"):
+            uploaded_files = st.file_uploader(
+                "Choose PDF or ZIP files", type=["pdf", "zip"], accept_multiple_files=True, key="doc_bulk_uploader"
+            )
+            cache_pages = st.checkbox("Parse page text now (faster first indexing)", value=True, key="bulk_cache_pages")
+
+            if uploaded_files and st.button("Upload All", key="bulk_upload_btn", type="primary"):
+                token = st.session_state.get("token", "")
+                with st.spinner(f"Đang upload {len(uploaded_files)} files..."):
+                    result = self.document_service.bulk_upload_documents(
+                        files=uploaded_files, token=token, cache_pages=cache_pages
+                    )
+
+                if not result["success"]:
+                    st.error(f"Bulk upload failed: {result.get('error', 'Unknown error')}")
+                    return
+
+                data = result["data"]
+                st.success(data["message"])
+                problems = [r for r in data["results"] if r.get("status") in ("failed", "skipped")]
+                if problems:
+                    st.dataframe(
+                        {
+                            "File": [r["file"] for r in problems],
+                            "Status": [r["status"] for r in problems],
+                            "Error": [r.get("error", "") for r in problems]
+                        },
+                        use_container_width=True
+                    )
@@ -1,6 +1,10 @@
 import streamlit as st
 from datetime import datetime
-from typing import List
+from typing import List, Optional
+import time
+
+
+JOB_TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
 
 
 class RAGConfigurationTab:
@@ -15,6 +19,8 @@ class RAGConfigurationTab:
         """Render UI cho RAG Configuration tab"""
         st.header("RAG Configuration")
 
+        self._render_active_job()
+
         config_col1, config_col2 = st.columns([2, 1])
 
         with config_col1:
@@ -71,8 +77,27 @@ class RAGConfigurationTab:
         col1, col2 = st.columns(2)
 
         with col1:
+            text_splitter = st.selectbox(
+                "Text Splitter",
+                options=["recursive", "token"],
+                format_func=lambda x: "Characters (recursive)" if x == "recursive" else "Tokens",
+                help="Tokens: chunk size and overlap are counted in tokens, matching the prompt's token budget"
+            )
+            token_encoding = None
+            if text_splitter == "token":
+                token_encoding = st.text_input(
+                    "Token Encoding",
+                    value="",
+                    help="tiktoken encoding name (e.g. cl100k_base) or server path of the embedding model's "
+                         "tokenizer.json. Empty uses the server default"
+                ).strip() or None
             chunk_size = st.slider("Chunk Size", 100, 2000, 1000, 100)
             chunk_overlap = st.slider("Chunk Overlap", 0, 500, 200, 50)
+            dedupe_chunks = st.checkbox(
+                "Remove repeated headers/footers and duplicate chunks",
+                value=False,
+                help="Smaller index and faster embedding for PDFs with a lot of boilerplate"
+            )
 
         with col2:
             search_type = st.selectbox(
@@ -81,6 +106,36 @@ class RAGConfigurationTab:
                 format_func=lambda x: "Similarity" if x == "similarity" else "Maximum Marginal Relevance"
             )
             k_value = st.slider("K Value (Number of chunks)", 1, 10, 3)
+            vector_storage = st.selectbox(
+                "Vector Storage",
+                options=["float32", "float16", "int8"],
+                format_func=lambda x: {
+                    "float32": "float32 (full precision)",
+                    "float16": "float16 (1/2 memory)",
+                    "int8": "int8 (1/4 memory)"
+                }[x],
+                help="Compressed vectors are used to find candidates, which are then rescored at full precision"
+            )
+            vector_backend = st.selectbox(
+                "Search Backend",
+                options=["chroma", "numpy"],
+                format_func=lambda x: "Chroma (HNSW)" if x == "chroma" else "NumPy mmap (flat / IVF)",
+                help="NumPy index is memory-mapped and shared by all server workers"
+            )
+
+        with st.expander("HNSW Index Tuning"):
+            hnsw_cols = st.columns(4)
+            hnsw_space = hnsw_cols[0].selectbox("Space", options=["l2", "cosine", "ip"])
+            hnsw_m = hnsw_cols[1].number_input("M", min_value=2, max_value=128, value=16)
+            hnsw_construction_ef = hnsw_cols[2].number_input("Construction ef", min_value=1, max_value=4096, value=100)
+            hnsw_search_ef = hnsw_cols[3].number_input("Search ef", min_value=1, max_value=4096, value=10,
+                                                       help="Higher = better recall, slower search")
+        hnsw_params = {
+            "hnsw_space": hnsw_space,
+            "hnsw_m": int(hnsw_m),
+            "hnsw_construction_ef": int(hnsw_construction_ef),
+            "hnsw_search_ef": int(hnsw_search_ef)
+        }
 
         # Prompt Template
         st.subheader("Prompt Template")
@@ -110,11 +165,16 @@ class RAGConfigurationTab:
         # Save button
         if st.button("Save Configuration", key="save_config_btn"):
             self._save_config(config_name, llm_id, embedding_id, chunk_size,
-                            chunk_overlap, search_type, k_value, prompt_template, selected_docs)
+                            chunk_overlap, search_type, k_value, prompt_template, selected_docs,
+                            vector_storage, vector_backend, hnsw_params, dedupe_chunks, text_splitter,
+                            token_encoding)
 
     def _save_config(self, name: str, llm_id: int, emb_id: int, chunk_size: int,
                      chunk_overlap: int, search_type: str, k_value: int,
-                     prompt_template: str, selected_docs: List[int]):
+                     prompt_template: str, selected_docs: List[int], vector_storage: str = "float32",
+                     vector_backend: str = "chroma", hnsw_params: Optional[dict] = None,
+                     dedupe_chunks: bool = False, text_splitter: str = "recursive",
+                     token_encoding: Optional[str] = None):
         """Lưu RAG configuration vào backend"""
         if not name:
             st.error("Please provide a configuration name!")
@@ -130,9 +190,15 @@ class RAGConfigurationTab:
             "embedding_model_id": emb_id,
             "chunk_size": chunk_size,
             "chunk_overlap": chunk_overlap,
+            "text_splitter": text_splitter,
+            "token_encoding": token_encoding,
             "search_type": search_type,
             "k_value": k_value,
-            "prompt_template": prompt_template
+            "prompt_template": prompt_template,
+            "vector_storage": vector_storage,
+            "vector_backend": vector_backend,
+            "dedupe_chunks": dedupe_chunks,
+            **(hnsw_params or {})
         }
 
         # Gọi API backend
@@ -145,9 +211,8 @@ class RAGConfigurationTab:
             saved_config = result["data"]
             config_id = saved_config["id"]
 
-            # Lưu document associations và trigger RAG processing
-            with st.spinner("Đang xử lý documents và tạo embeddings... (có thể mất vài phút)"):
-                doc_result = self.rag_service.add_documents_to_config(config_id, selected_docs, token)
+            # Lưu document associations và tạo indexing job (chạy ở background trên server)
+            doc_result = self.rag_service.add_documents_to_config(config_id, selected_docs, token)
 
             if doc_result["success"]:
                 # Lưu vào session_state để hiển thị (sync với backend)
@@ -168,13 +233,12 @@ class RAGConfigurationTab:
                 # Hiển thị thông tin RAG processing
                 st.success(f"RAG Configuration '{name}' và {len(selected_docs)} documents đã được lưu thành công!")
 
-                if "rag_processing" in doc_result:
-                    rag_info = doc_result["rag_processing"]
-                    st.info(
-                        f"📊 RAG Processing: Đã tạo {rag_info.get('num_chunks', 0)} text chunks "
-                        f"từ {rag_info.get('num_documents', 0)} documents\n\n"
-                        f"💾 Vector store: `{rag_info.get('vector_store_path', 'N/A')}`"
-                    )
+                # Theo dõi tiến độ indexing job ở đầu tab
+                job = doc_result["data"].get("job")
+                if job:
+                    st.session_state.active_index_job = job["id"]
+                else:
+                    st.warning(doc_result["data"].get("message", "RAG processing unavailable"))
 
                 st.rerun()
             else:
@@ -187,6 +251,85 @@ class RAGConfigurationTab:
         else:
             st.error(f"Failed to save configuration: {result.get('error', 'Unknown error')}")
 
+    def _render_active_job(self):
+        """Hiển thị tiến độ live của indexing job vừa tạo (poll server mỗi giây)"""
+        job_id = st.session_state.get("active_index_job")
+        if not job_id:
+            return
+
+        token = st.session_state.get("token", "")
+        st.subheader(f"Indexing Job #{job_id}")
+
+        # Click nút sẽ rerun script → vòng poll cũ dừng, request cancel được gửi ở lần chạy này
+        if st.button("Cancel indexing", key=f"cancel_index_job_{job_id}"):
+            cancel_result = self.rag_service.cancel_job(job_id, token)
+            if not cancel_result["success"]:
+                st.error(f"Failed to cancel job: {cancel_result.get('error', 'Unknown error')}")
+
+        progress_bar = st.progress(0.0)
+        status_box = st.empty()
+
+        while True:
+            result = self.rag_service.get_job(job_id, token)
+            if not result["success"]:
+                st.error(f"Failed to load job status: {result.get('error', 'Unknown error')}")
+                st.session_state.active_index_job = None
+                return
+
+            job = result["data"]
+            total = job["documents_total"] or 1
+            progress_bar.progress(
+                min(job["documents_done"] / total, 1.0),
+                text=f"{job['status']} · {job.get('stage') or 'queued'} · "
+                     f"{job['documents_done']}/{job['documents_total']} documents"
+            )
+            status_box.markdown(
+                f"📄 Pages parsed: **{job['pages_parsed']}** · "
+                f"🧩 Chunks embedded: **{job['chunks_embedded']}** · "
+                f"🔁 Attempt {job['attempts']}/{job['max_attempts']}"
+                + (f"\n\n{job['message']}" if job.get("message") else "")
+            )
+
+            if job["status"] in JOB_TERMINAL_STATUSES:
+                st.session_state.active_index_job = None
+                if job["status"] == "succeeded":
+                    rag_info = job.get("result") or {}
+                    st.success(
+                        f"📊 RAG Processing: {rag_info.get('num_chunks', 0)} text chunks "
+                        f"từ {rag_info.get('num_documents', 0)} documents\n\n"
+                        f"💾 Vector store: `{rag_info.get('vector_store_path', 'N/A')}`"
+                    )
+                elif job["status"] == "failed":
+                    st.error(f"Indexing failed: {job.get('message', 'Unknown error')}")
+                else:
+                    st.warning("Indexing cancelled")
+                return
+
+            time.sleep(1)
+
+    def _render_job_status(self, job: dict, token: str):
+        """Trạng thái job gần nhất của một config (với nút retry nếu lỗi)"""
+        icon = {"succeeded": "✅", "failed": "❌", "cancelled": "⏹️", "running": "⏳", "queued": "🕒"}.get(job["status"], "")
+        st.markdown(
+            f"**Last indexing job:** {icon} #{job['id']} {job['status']} "
+            f"({job['documents_done']}/{job['documents_total']} documents, "
+            f"{job['chunks_embedded']} chunks)"
+        )
+        if job["status"] in ("queued", "running"):
+            if st.button("Show progress", key=f"show_job_{job['id']}"):
+                st.session_state.active_index_job = job["id"]
+                st.rerun()
+        elif job["status"] in ("failed", "cancelled"):
+            if job.get("message"):
+                st.caption(job["message"])
+            if st.button("Retry indexing", key=f"retry_job_{job['id']}"):
+                result = self.rag_service.retry_job(job["id"], token)
+                if result["success"]:
+                    st.session_state.active_index_job = job["id"]
+                    st.rerun()
+                else:
+                    st.error(f"Failed to retry job: {result.get('error', 'Unknown error')}")
+
     def _render_existing_configs(self):
         """Hiển thị các config đã có"""
         st.subheader("Existing Configurations")
@@ -199,6 +342,13 @@ class RAGConfigurationTab:
             if models_result["success"] and models_result["data"]:
                 all_models = models_result["data"]
 
+            # Job gần nhất của mỗi config (list trả về theo id giảm dần)
+            jobs_result = self.rag_service.list_jobs(token, limit=100)
+            latest_jobs = {}
+            if jobs_result["success"]:
+                for job in jobs_result["data"]:
+                    latest_jobs.setdefault(job["rag_config_id"], job)
+
             for config in st.session_state.rag_configs:
                 with st.expander(f"{config['config_name']} (ID: {config['id']})"):
                     llm_name = next((f"{model['model_name']} ({model['provider']})"
@@ -211,8 +361,22 @@ class RAGConfigurationTab:
 
                     st.markdown(f"**LLM:** {llm_name}")
                     st.markdown(f"**Embedding:** {emb_name}")
-                    st.markdown(f"**Chunk Size:** {config['chunk_size']}")
+                    unit = "tokens" if config.get("text_splitter") == "token" else "characters"
+                    st.markdown(f"**Chunk Size:** {config['chunk_size']} {unit}")
+                    if config.get("text_splitter") == "token":
+                        st.markdown(f"**Token Encoding:** {config.get('token_encoding') or 'server default'}")
+                    if config.get("dedupe_chunks"):
+                        st.markdown("**Dedupe:** headers/footers and duplicate chunks removed")
                     st.markdown(f"**K Value:** {config['k_value']}")
+                    st.markdown(f"**Vector Storage:** {config.get('vector_storage', 'float32')}")
+                    st.markdown(f"**Search Backend:** {config.get('vector_backend', 'chroma')}")
+                    if config.get("hnsw_m"):
+                        st.markdown(f"**HNSW:** {config.get('hnsw_space') or 'l2'}, M={config['hnsw_m']}, "
+                                    f"construction_ef={config.get('hnsw_construction_ef')}, "
+                                    f"search_ef={config.get('hnsw_search_ef')}")
                     st.markdown(f"**Created:** {config['created_at']}")
+
+                    if config["id"] in latest_jobs:
+                        self._render_job_status(latest_jobs[config["id"]], token)
         else:
             st.info("No configurations found. Create your first one!")
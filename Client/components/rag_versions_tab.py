@@ -1,12 +1,14 @@
 import streamlit as st
+import json
 from typing import Dict
 
 
 class RAGVersionsTab:
     """Tab xem các phiên bản RAG"""
 
-    def __init__(self, model_service):
+    def __init__(self, model_service, rag_service=None):
         self.model_service = model_service
+        self.rag_service = rag_service
 
     def render(self):
         """Render UI cho RAG Versions tab"""
@@ -25,6 +27,9 @@ class RAGVersionsTab:
 
             # Compare versions
             self._render_version_comparison()
+
+            # Benchmark results
+            self._render_benchmarks()
         else:
             st.info("No RAG versions found. Create a new RAG configuration first!")
 
@@ -103,3 +108,45 @@ class RAGVersionsTab:
                     st.info("This would show a detailed comparison of the selected versions.")
         else:
             st.info("Need at least 2 RAG configurations to compare.")
+
+    def _render_benchmarks(self):
+        """Bảng so sánh benchmark (recall@k, MRR, context tokens, latency)"""
+        if self.rag_service is None:
+            return
+
+        st.subheader("Retrieval Benchmarks")
+        token = st.session_state.get("token", "")
+
+        with st.expander("Run Benchmark", expanded=False):
+            config_ids = st.multiselect(
+                "Configurations",
+                options=[config["id"] for config in st.session_state.rag_configs],
+                format_func=lambda x: next((config["config_name"] for config in st.session_state.rag_configs if config["id"] == x), ""),
+                key="benchmark_config_ids"
+            )
+            query_file = st.file_uploader("Labeled query set (.json / .jsonl)", type=["json", "jsonl"], key="benchmark_queries")
+            k = st.number_input("k (0 = use config k_value)", min_value=0, max_value=50, value=0, key="benchmark_k")
+
+            if st.button("Run Benchmark", key="run_benchmark_btn"):
+                if not config_ids or query_file is None:
+                    st.warning("Please select configurations and a query set.")
+                else:
+                    raw = query_file.read().decode("utf-8")
+                    if query_file.name.endswith(".jsonl"):
+                        queries = [json.loads(line) for line in raw.splitlines() if line.strip()]
+                    else:
+                        queries = json.loads(raw)
+
+                    with st.spinner(f"Running {len(queries)} queries on {len(config_ids)} configurations..."):
+                        result = self.rag_service.run_benchmark(config_ids, queries, token, k=k or None)
+
+                    if result["success"]:
+                        st.success(f"Benchmark run {result['data']['run_id']} completed")
+                    else:
+                        st.error(f"Benchmark failed: {result.get('error', 'Unknown error')}")
+
+        result = self.rag_service.list_benchmarks(token)
+        if result["success"] and result["data"]["table"]:
+            st.dataframe(result["data"]["table"], use_container_width=True)
+        else:
+            st.info("No benchmark results yet.")
@@ -46,7 +46,7 @@ class AdminDashboardApp:
         self.user_tab = UserManagementTab(self.auth_service)
         self.document_tab = DocumentManagementTab(self.document_service)
         self.rag_config_tab = RAGConfigurationTab(self.rag_service, self.document_service, self.model_service)
-        self.rag_versions_tab = RAGVersionsTab(self.model_service)
+        self.rag_versions_tab = RAGVersionsTab(self.model_service, self.rag_service)
         self.analytics_tab = AnalyticsTab()
 
         # Initialize session state and check auth
@@ -1,5 +1,6 @@
 import requests
-from typing import Generator, Dict, Any
+import json
+from typing import Generator, Dict, Any, List, Optional
 
 
 class ChatService:
@@ -50,6 +51,38 @@ class ChatService:
         except Exception as e:
             return {"success": False, "message": str(e)}
 
+    def test_search_batch(
+        self,
+        queries: List[str],
+        k: int,
+        token: str,
+        config_ids: Optional[List[int]] = None
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Batch test search - nhận kết quả streaming (NDJSON), mỗi dòng một query"""
+        try:
+            payload = {"queries": queries, "k": k}
+            if config_ids:
+                payload["config_ids"] = config_ids
+
+            response = requests.post(
+                f"{self.base_url}/chat/test-search/batch",
+                json=payload,
+                headers={"Authorization": f"Bearer {token}"},
+                stream=True
+            )
+            response.raise_for_status()
+
+            if "application/x-ndjson" not in response.headers.get("content-type", ""):
+                # Lỗi validate trả về JSON thường
+                yield response.json()
+                return
+
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+        except Exception as e:
+            yield {"success": False, "message": str(e)}
+
     def get_vector_store_status(self, token: str) -> Dict[str, Any]:
         """Lấy trạng thái vector store"""
         try:
@@ -1,5 +1,5 @@
 import requests
-from typing import Dict, Any, Optional
+from typing import BinaryIO, Dict, Any, List, Optional, Union
 
 
 class DocumentService:
@@ -24,18 +24,22 @@ class DocumentService:
 
     def upload_document(
         self,
-        file_data: bytes,
+        file_data: Union[bytes, BinaryIO],
         filename: str,
         title: Optional[str],
         author: Optional[str],
         total_pages: Optional[int],
         creation_date: Optional[str],
-        token: str
+        token: str,
+        cache_pages: bool = True
     ) -> Dict[str, Any]:
-        """Upload document lên server"""
+        """
+        Upload document lên server (file_data: bytes hoặc file object).
+        Metadata không gửi (số trang, title, author, creation date) được server đọc từ PDF.
+        """
         try:
             files = {"file": (filename, file_data, "application/pdf")}
-            data = {}
+            data = {"cache_pages": str(cache_pages).lower()}
             if title:
                 data["title"] = title
             if author:
@@ -56,6 +60,38 @@ class DocumentService:
         except requests.exceptions.RequestException as e:
             return {"success": False, "error": str(e)}
 
+    def bulk_upload_documents(
+        self,
+        files: List[Any],
+        token: str,
+        rag_config_id: Optional[int] = None,
+        cache_pages: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Upload nhiều PDFs và/hoặc ZIP archives trong một request (files: file objects có .name).
+        rag_config_id: thêm documents vào config và queue index job.
+        """
+        try:
+            multipart = []
+            for file in files:
+                file.seek(0)
+                content_type = "application/zip" if file.name.lower().endswith(".zip") else "application/pdf"
+                multipart.append(("files", (file.name, file, content_type)))
+            data = {"cache_pages": str(cache_pages).lower()}
+            if rag_config_id is not None:
+                data["rag_config_id"] = rag_config_id
+
+            response = requests.post(
+                f"{self.base_url}/rag-configs/documents/bulk-upload",
+                files=multipart,
+                data=data,
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            return {"success": False, "error": str(e)}
+
     def delete_document(self, doc_id: int, token: str) -> Dict[str, Any]:
         """Xóa document"""
         try:
@@ -69,3 +69,84 @@ class RAGService:
             return {"success": True, "data": response.json()}
         except requests.exceptions.RequestException as e:
             return {"success": False, "error": str(e)}
+
+    def get_job(self, job_id: int, token: str) -> Dict[str, Any]:
+        """Lấy trạng thái và tiến độ của index job"""
+        try:
+            response = requests.get(
+                f"{self.base_url}/rag-configs/jobs/{job_id}",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            return {"success": False, "error": str(e)}
+
+    def list_jobs(self, token: str, config_id: int = None, limit: int = 20) -> Dict[str, Any]:
+        """Lấy các index jobs gần nhất"""
+        try:
+            params = {"limit": limit}
+            if config_id is not None:
+                params["config_id"] = config_id
+            response = requests.get(
+                f"{self.base_url}/rag-configs/jobs/",
+                params=params,
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            return {"success": False, "error": str(e)}
+
+    def cancel_job(self, job_id: int, token: str) -> Dict[str, Any]:
+        """Hủy index job"""
+        try:
+            response = requests.post(
+                f"{self.base_url}/rag-configs/jobs/{job_id}/cancel",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            return {"success": False, "error": str(e)}
+
+    def retry_job(self, job_id: int, token: str) -> Dict[str, Any]:
+        """Chạy lại index job failed/cancelled"""
+        try:
+            response = requests.post(
+                f"{self.base_url}/rag-configs/jobs/{job_id}/retry",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            return {"success": False, "error": str(e)}
+
+    def run_benchmark(self, config_ids: List[int], queries: List[Dict[str, Any]], token: str, k: int = None) -> Dict[str, Any]:
+        """Chạy benchmark retrieval trên các RAG configurations"""
+        try:
+            payload = {"config_ids": config_ids, "queries": queries}
+            if k:
+                payload["k"] = k
+            response = requests.post(
+                f"{self.base_url}/rag-configs/benchmarks/",
+                json=payload,
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            return {"success": False, "error": str(e)}
+
+    def list_benchmarks(self, token: str, limit: int = 20) -> Dict[str, Any]:
+        """Lấy bảng so sánh benchmark gần nhất"""
+        try:
+            response = requests.get(
+                f"{self.base_url}/rag-configs/benchmarks/",
+                params={"limit": limit},
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            return {"success": False, "error": str(e)}
@@ -0,0 +1,47 @@
+"""
+Script để benchmark retrieval quality và latency của các RAG configurations
+Chạy: python benchmark_rag.py --config-id 1 --config-id 2 --queries benchmarks/query_sets/example_queries.json
+"""
+import argparse
+
+from database.connection import SessionLocal
+from services.rag_benchmark import benchmark_configs, load_query_set, save_benchmark_run
+
+
+def print_table(rows):
+    """In bảng so sánh ra console"""
+    header = f"{'Config':<30} {'k':>3} {'Recall@k':>9} {'MRR':>7} {'Ctx tok':>8} {'p50 ms':>9} {'p95 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        if not row.get("success"):
+            print(f"{str(row.get('config_name', row['config_id'])):<30} ERROR: {row.get('message')}")
+            continue
+        print(
+            f"{row['config_name'][:30]:<30} {row['k']:>3} {row['recall_at_k']:>9.3f} {row['mrr']:>7.3f} "
+            f"{row['avg_context_tokens']:>8.1f} {row['p50_latency_ms']:>9.1f} {row['p95_latency_ms']:>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG configurations on a labeled query set")
+    parser.add_argument("--config-id", type=int, action="append", required=True, help="RAG config id (repeatable)")
+    parser.add_argument("--queries", required=True, help="Labeled query set (.json or .jsonl)")
+    parser.add_argument("--k", type=int, default=None, help="Override k (default: k_value of each config)")
+    args = parser.parse_args()
+
+    queries = load_query_set(args.queries)
+
+    db = SessionLocal()
+    try:
+        run = benchmark_configs(db, args.config_id, queries, k=args.k)
+    finally:
+        db.close()
+
+    path = save_benchmark_run(run)
+    print_table(run["rows"])
+    print(f"\n✓ Saved results to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark peak memory của ingestion pipeline theo kích thước corpus và batch size
+Chạy: python benchmarks/bench_ingest_memory.py --corpus uploads/documents --copies 1 4 16 --batch-sizes 64 256
+
+Mỗi lần đo chạy trong một subprocess riêng (ru_maxrss không reset được), embeddings
+lấy từ fake Ollama server (loadtest/fake_ollama.py) nên không cần GPU/model thật.
+Pipeline streaming → peak memory gần như không đổi khi tăng --copies, chỉ tăng theo batch size.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _rss_mb() -> float:
+    # Linux: ru_maxrss tính bằng KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_corpus(source_dir: str, copies: int, out_dir: Path) -> list:
+    """Nhân bản corpus; mỗi bản sao thêm trailer khác nhau sau %%EOF để có content hash khác"""
+    paths = []
+    for pdf in sorted(Path(source_dir).glob("*.pdf")):
+        data = pdf.read_bytes()
+        for i in range(copies):
+            target = out_dir / f"{pdf.stem}_{i}.pdf"
+            target.write_bytes(data + f"\n%bench-copy-{i}\n".encode())
+            paths.append(str(target))
+    return paths
+
+
+def run_one(args) -> dict:
+    """Index corpus một lần trong process hiện tại, trả về số đo memory"""
+    import services.rag_processor as rag_processor
+    from services.rag_processor import RAGProcessor
+
+    rag_processor.UPSERT_BATCH_SIZE = args.batch_size
+    workdir = Path(tempfile.mkdtemp(prefix="bench_ingest_"))
+    try:
+        (workdir / "pdfs").mkdir()
+        paths = make_corpus(args.corpus, args.copies[0], workdir / "pdfs")
+        os.chdir(workdir)
+
+        processor = RAGProcessor(ollama_base_url=args.ollama_url, pdf_workers=args.workers,
+                                 use_embedding_cache=False, use_page_cache=False)
+        baseline_rss = _rss_mb()
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = processor.process_rag_config(
+            config_name="bench_ingest",
+            embedding_model_name="fake-embed",
+            document_file_paths=paths,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap
+        )
+        elapsed = time.perf_counter() - started
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "copies": args.copies[0],
+            "batch_size": args.batch_size,
+            "files": len(paths),
+            "pages": result.get("num_pages_loaded", 0),
+            "chunks": result.get("num_added_chunks", 0),
+            "success": result["success"],
+            "seconds": round(elapsed, 2),
+            "python_peak_mb": round(traced_peak / 1024 / 1024, 1),
+            "rss_growth_mb": round(_rss_mb() - baseline_rss, 1)
+        }
+    finally:
+        os.chdir(Path(__file__).parent.parent)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion peak-memory benchmark")
+    parser.add_argument("--corpus", default="uploads/documents", help="Directory with sample PDFs")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 4, 16],
+                        help="Corpus multipliers to compare")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[256], help="Upsert batch sizes to compare")
+    parser.add_argument("--workers", type=int, default=2, help="PDF parsing worker processes")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--embedding-dim", type=int, default=768)
+    parser.add_argument("--ollama-url", default=None, help="Use an existing (fake) Ollama instead of starting one")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--batch-size", type=int, default=256, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.corpus = str(Path(args.corpus).resolve())
+
+    if args.run_one:
+        print(json.dumps(run_one(args)))
+        return
+
+    if not list(Path(args.corpus).glob("*.pdf")):
+        print(f"No PDFs found in {args.corpus}")
+        return
+
+    server = None
+    if not args.ollama_url:
+        from loadtest.fake_ollama import make_server, FakeOllamaConfig
+        server = make_server("127.0.0.1", 0, FakeOllamaConfig(
+            embedding_dim=args.embedding_dim, embed_latency_ms=0, embed_per_input_ms=0, jitter=0
+        ))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        args.ollama_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{'copies':>7} {'batch':>6} {'files':>6} {'pages':>7} {'chunks':>8} {'seconds':>8} "
+          f"{'py peak MB':>11} {'RSS +MB':>8}")
+    try:
+        for batch_size in args.batch_sizes:
+            for copies in args.copies:
+                cmd = [sys.executable, __file__, "--run-one", "--corpus", args.corpus,
+                       "--copies", str(copies), "--batch-size", str(batch_size),
+                       "--workers", str(args.workers), "--chunk-size", str(args.chunk_size),
+                       "--chunk-overlap", str(args.chunk_overlap), "--ollama-url", args.ollama_url]
+                proc = subprocess.run(cmd, capture_output=True, text=True)
+                lines = proc.stdout.strip().splitlines()
+                if proc.returncode != 0 or not lines:
+                    print(f"Run failed (copies={copies}, batch={batch_size}):\n{proc.stderr[-2000:]}")
+                    continue
+                r = json.loads(lines[-1])
+                print(f"{r['copies']:>7} {r['batch_size']:>6} {r['files']:>6} {r['pages']:>7} {r['chunks']:>8} "
+                      f"{r['seconds']:>8.2f} {r['python_peak_mb']:>11.1f} {r['rss_growth_mb']:>8.1f}")
+    finally:
+        if server:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
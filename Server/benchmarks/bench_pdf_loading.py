@@ -0,0 +1,79 @@
+"""
+Benchmark tốc độ parse PDF (pages/second): tuần tự vs process pool
+Chạy: python benchmarks/bench_pdf_loading.py --corpus uploads/documents --workers 0 2 4 8 --copies 4
+
+Đo đúng đường parse của indexing (iter_extract_pdfs: parse trong worker, ghi text từng trang
+ra gzip JSONL). --copies nhân bản corpus ra các file riêng trong thư mục tạm.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.pdf_loader import iter_extract_pdfs
+
+
+def make_corpus(source_dir: str, copies: int, out_dir: Path) -> list:
+    """Copy corpus ra out_dir, mỗi bản sao một đường dẫn riêng"""
+    paths = []
+    for pdf in sorted(Path(source_dir).glob("*.pdf")):
+        for i in range(copies):
+            target = out_dir / f"{pdf.stem}_{i}.pdf"
+            shutil.copyfile(pdf, target)
+            paths.append(str(target))
+    return paths
+
+
+def run(paths, pages_dir: Path, workers: int, timeout: float) -> dict:
+    pages_paths = {path: str(pages_dir / f"{i}.pages.jsonl.gz") for i, path in enumerate(paths)}
+    started = time.perf_counter()
+    pages = 0
+    errors = 0
+    for result in iter_extract_pdfs(pages_paths, max_workers=workers, timeout=timeout):
+        if result["error"]:
+            errors += 1
+        pages += result["num_pages"]
+    elapsed = time.perf_counter() - started
+    return {"workers": workers, "files": len(paths), "pages": pages, "errors": errors,
+            "seconds": elapsed, "pages_per_sec": pages / elapsed if elapsed else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF parsing throughput benchmark")
+    parser.add_argument("--corpus", default="uploads/documents", help="Directory with sample PDFs")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4],
+                        help="Worker counts to compare (0 = sequential in-process)")
+    parser.add_argument("--copies", type=int, default=1, help="Copy the corpus N times to enlarge it")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-file timeout (seconds)")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_pdf_"))
+    try:
+        (workdir / "pdfs").mkdir()
+        paths = make_corpus(args.corpus, args.copies, workdir / "pdfs")
+        if not paths:
+            print(f"No PDFs found in {args.corpus}")
+            return
+
+        print(f"Corpus: {len(paths)} files from {args.corpus}")
+        print(f"{'workers':>8} {'files':>6} {'pages':>7} {'errors':>7} {'seconds':>9} {'pages/s':>9}")
+        baseline = None
+        for workers in args.workers:
+            pages_dir = workdir / f"pages_{workers}"
+            pages_dir.mkdir()
+            r = run(paths, pages_dir, workers, args.timeout)
+            shutil.rmtree(pages_dir)
+            baseline = baseline or r["pages_per_sec"]
+            speedup = r["pages_per_sec"] / baseline if baseline else 0.0
+            print(f"{r['workers']:>8} {r['files']:>6} {r['pages']:>7} {r['errors']:>7} "
+                  f"{r['seconds']:>9.2f} {r['pages_per_sec']:>9.1f}  (x{speedup:.2f})")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark text splitters: RecursiveCharacterTextSplitter (ký tự) vs TokenTextSplitter (tokens)
+Chạy: python benchmarks/bench_text_splitters.py --pages-dir page_cache --chunk-tokens 256 --overlap-tokens 32
+      python benchmarks/bench_text_splitters.py --synthetic 20000
+      python benchmarks/bench_text_splitters.py --encoding tokenizers/nomic-embed-text/tokenizer.json
+
+Corpus là text các trang đã parse trong page cache (hoặc text tổng hợp). Recursive splitter
+dùng chunk_size = chunk_tokens x (ký tự/token trung bình của corpus) để hai splitters có
+cùng budget. Đo throughput (MB/s) và phân bố số tokens mỗi chunk (độ lệch, tỉ lệ vượt budget).
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.token_splitter import TokenTextSplitter, load_tokenizer, TOKEN_ENCODING
+
+
+def load_pages(pages_dir: str, limit: int):
+    pages = []
+    for path in sorted(Path(pages_dir).glob("*/*.pages.jsonl.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                pages.append(json.loads(line)["page_content"])
+                if len(pages) >= limit:
+                    return pages
+    return pages
+
+
+def synthetic_pages(num_pages: int, seed: int):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+             for _ in range(5000)]
+    pages = []
+    for _ in range(num_pages):
+        paragraphs = []
+        for _ in range(rng.randint(2, 8)):
+            sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(4, 30))).capitalize() + "."
+                         for _ in range(rng.randint(1, 8))]
+            paragraphs.append(" ".join(sentences))
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+
+def run(name: str, splitter, pages, tokenizer, budget: int) -> dict:
+    started = time.perf_counter()
+    chunks = [chunk for page in pages for chunk in splitter.split_text(page)]
+    elapsed = time.perf_counter() - started
+    sizes = np.array(tokenizer.count(chunks))
+    megabytes = sum(len(page.encode("utf-8")) for page in pages) / 1024 / 1024
+    return {
+        "splitter": name,
+        "seconds": elapsed,
+        "mb_per_sec": megabytes / elapsed if elapsed else 0.0,
+        "chunks": len(chunks),
+        "mean": sizes.mean(),
+        "std": sizes.std(),
+        "cv": sizes.std() / sizes.mean() if sizes.mean() else 0.0,
+        "p5": np.percentile(sizes, 5),
+        "p95": np.percentile(sizes, 95),
+        "over": float((sizes > budget).mean())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text splitter throughput and chunk-size variance benchmark")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--pages-dir", default="page_cache", help="Page cache directory (parsed PDF pages)")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic pages instead of the page cache")
+    parser.add_argument("--max-pages", type=int, default=50000)
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--overlap-tokens", type=int, default=32)
+    parser.add_argument("--encoding", default=TOKEN_ENCODING, help="tiktoken encoding name or tokenizer.json path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    pages = synthetic_pages(args.synthetic, args.seed) if args.synthetic else load_pages(args.pages_dir, args.max_pages)
+    if not pages:
+        print(f"No parsed pages found in {args.pages_dir} (index some documents first, or use --synthetic)")
+        return
+
+    tokenizer = load_tokenizer(args.encoding)
+    sample = pages[:2000]
+    chars_per_token = sum(len(p) for p in sample) / max(1, sum(tokenizer.count(sample)))
+    chunk_chars = int(args.chunk_tokens * chars_per_token)
+    overlap_chars = int(args.overlap_tokens * chars_per_token)
+
+    total_mb = sum(len(p.encode("utf-8")) for p in pages) / 1024 / 1024
+    print(f"Corpus: {len(pages)} pages, {total_mb:.1f} MB, {chars_per_token:.2f} chars/token ({args.encoding})")
+    print(f"Budget: {args.chunk_tokens} tokens (overlap {args.overlap_tokens}) "
+          f"= {chunk_chars} chars (overlap {overlap_chars}) for the recursive splitter")
+
+    splitters = [
+        ("recursive", RecursiveCharacterTextSplitter(chunk_size=chunk_chars, chunk_overlap=overlap_chars)),
+        ("token", TokenTextSplitter(args.chunk_tokens, args.overlap_tokens, tokenizer=tokenizer))
+    ]
+    header = (f"{'splitter':>10} {'seconds':>8} {'MB/s':>7} {'chunks':>8} {'mean':>7} {'std':>7} "
+              f"{'CV':>6} {'p5':>6} {'p95':>6} {'>budget':>8}")
+    print(header)
+    print("-" * len(header))
+    for name, splitter in splitters:
+        r = run(name, splitter, pages, tokenizer, args.chunk_tokens)
+        print(f"{r['splitter']:>10} {r['seconds']:>8.2f} {r['mb_per_sec']:>7.2f} {r['chunks']:>8} "
+              f"{r['mean']:>7.1f} {r['std']:>7.1f} {r['cv']:>6.3f} {r['p5']:>6.0f} {r['p95']:>6.0f} "
+              f"{r['over']:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
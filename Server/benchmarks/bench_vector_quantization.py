@@ -0,0 +1,161 @@
+"""
+Benchmark vector storage float32 / float16 / int8: memory, disk, recall@k và latency
+Chạy: python benchmarks/bench_vector_quantization.py --config my_config --k 3 5 10
+      python benchmarks/bench_vector_quantization.py --synthetic 50000 --dim 1024
+
+Baseline là exact search trên float32. Với mỗi kiểu nén đo recall@k khi chỉ dùng
+index nén và khi rescore top candidates bằng float32 (cách chat_service search).
+--config đọc embeddings từ version hiện tại của vector store (cần chromadb);
+--synthetic sinh vectors theo cụm (chỉ cần numpy). Queries là các vectors đã lưu cộng nhiễu.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.quantized_index import QuantizedIndex, distances, rescore, RESCORE_FACTOR, RESCORE_MIN
+from services.vector_store_versions import VectorStoreVersions, store_root, dir_size
+
+
+class ArrayCollection:
+    """Đủ API của Chroma collection (count/get/metadata) cho QuantizedIndex.build và rescore"""
+
+    def __init__(self, vectors: np.ndarray, space: str = "l2"):
+        self.vectors = vectors
+        self.ids = [f"chunk-{i:08d}" for i in range(len(vectors))]
+        self.rows = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self.metadata = {"hnsw:space": space}
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def get(self, ids=None, include=None, limit=None, offset=0):
+        rows = [self.rows[i] for i in ids if i in self.rows] if ids is not None \
+            else range(offset, min(offset + limit, len(self.ids)))
+        rows = list(rows)
+        return {"ids": [self.ids[r] for r in rows], "embeddings": self.vectors[rows],
+                "documents": [""] * len(rows), "metadatas": [{}] * len(rows)}
+
+
+def load_config_vectors(config_name: str):
+    """Embeddings + distance space của version hiện tại, và dung lượng thư mục Chroma"""
+    import chromadb
+
+    versions = VectorStoreVersions(store_root(config_name))
+    path = versions.current_path()
+    if path is None:
+        raise SystemExit(f"No vector store for config '{config_name}'")
+    client = chromadb.PersistentClient(path=str(path))
+    collection = client.get_collection("langchain")
+    vectors, offset = [], 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=5000, offset=offset)
+        if not page["ids"]:
+            break
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    chroma_bytes = dir_size(path) - (dir_size(path / "quantized") if (path / "quantized").exists() else 0)
+    return np.concatenate(vectors), space, chroma_bytes
+
+
+def synthetic_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    """Vectors chuẩn hóa, phân bố theo cụm (giống embeddings thật hơn gaussian thuần)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, count // 200), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(vectors: np.ndarray, n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    picked = vectors[rng.choice(len(vectors), size=min(n, len(vectors)), replace=False)]
+    noise = rng.standard_normal(picked.shape).astype(np.float32) * float(np.abs(vectors).mean())
+    return picked + noise
+
+
+def recall(found, truth) -> float:
+    return len(set(found) & set(truth)) / len(truth) if truth else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized vector storage benchmark")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--config", help="RAG config name (reads its current vector store)")
+    source.add_argument("--synthetic", type=int, default=20000, help="Number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=1024, help="Synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--rescore-factor", type=int, default=RESCORE_FACTOR)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.config:
+        vectors, space, chroma_bytes = load_config_vectors(args.config)
+        print(f"Config {args.config}: {len(vectors)} vectors x {vectors.shape[1]}d, space={space}, "
+              f"Chroma dir {chroma_bytes / 1024 / 1024:.1f} MB")
+    else:
+        vectors, space = synthetic_vectors(args.synthetic, args.dim, args.seed), "l2"
+        print(f"Synthetic: {len(vectors)} vectors x {vectors.shape[1]}d, space={space}")
+
+    collection = ArrayCollection(vectors, space)
+    queries = make_queries(vectors, args.queries, args.seed)
+    max_k = max(args.k)
+    sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+    truth = [np.argsort(distances(vectors, q, space, sq_norms))[:max_k] for q in queries]
+    truth = [[collection.ids[i] for i in rows] for rows in truth]
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_quant_"))
+    try:
+        np.save(workdir / "float32.npy", vectors)
+        float32_bytes = vectors.nbytes
+        float32_disk = (workdir / "float32.npy").stat().st_size
+
+        header = f"{'storage':>8} {'memory MB':>10} {'disk MB':>8} {'p50 ms':>7}"
+        for k in args.k:
+            header += f" {f'R@{k}':>7} {f'R@{k}+rs':>8}"
+        print(header)
+        print("-" * len(header))
+
+        row = f"{'float32':>8} {float32_bytes / 1024 / 1024:>10.1f} {float32_disk / 1024 / 1024:>8.1f} {'-':>7}"
+        row += "".join(f" {1.0:>7.3f} {'-':>8}" for _ in args.k)
+        print(row)
+
+        for storage in ("float16", "int8"):
+            version_dir = workdir / storage
+            version_dir.mkdir()
+            QuantizedIndex.build(version_dir, collection, storage)
+            index = QuantizedIndex(version_dir)
+            sizes = index.nbytes()
+
+            plain = {k: [] for k in args.k}
+            rescored = {k: [] for k in args.k}
+            latencies = []
+            for q, expected in zip(queries, truth):
+                started = time.perf_counter()
+                candidates = index.candidates(q, max(max_k * args.rescore_factor, RESCORE_MIN))
+                rows = rescore(collection, q, [c for c, _ in candidates], max_k, space)
+                latencies.append((time.perf_counter() - started) * 1000)
+                for k in args.k:
+                    plain[k].append(recall([c for c, _ in candidates[:k]], expected[:k]))
+                    rescored[k].append(recall([r["id"] for r in rows[:k]], expected[:k]))
+
+            row = (f"{storage:>8} {sizes['codes'] / 1024 / 1024:>10.1f} "
+                   f"{dir_size(index.dir) / 1024 / 1024:>8.1f} {float(np.median(latencies)):>7.1f}")
+            row += "".join(f" {np.mean(plain[k]):>7.3f} {np.mean(rescored[k]):>8.3f}" for k in args.k)
+            print(row)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\nmemory = vectors kept for candidate search; R@k+rs = recall after float32 rescoring "
+          f"of top max(k*{args.rescore_factor}, {RESCORE_MIN}) candidates")
+
+
+if __name__ == "__main__":
+    main()
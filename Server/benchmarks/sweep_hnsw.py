@@ -0,0 +1,109 @@
+"""
+Sweep tham số HNSW (M, construction_ef, search_ef): build time, latency và recall@k
+Chạy: python benchmarks/sweep_hnsw.py --config my_config --m 8 16 32 --construction-ef 100 200 --search-ef 10 50 100
+      python benchmarks/sweep_hnsw.py --synthetic 20000 --dim 768
+
+Mỗi (M, construction_ef) build một Chroma collection tạm từ embeddings của version hiện tại
+(hoặc vectors tổng hợp), rồi đo từng search_ef. Recall so với exact search (numpy).
+Queries là các vectors đã lưu cộng nhiễu. Kết quả dùng để chọn hnsw_* cho RAG config.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_vector_quantization import load_config_vectors, synthetic_vectors, make_queries
+from services.hnsw_config import hnsw_metadata, apply_search_ef, HNSW_SPACES
+from services.numpy_index import block_distances
+
+_ADD_BATCH = 5000
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, space: str, k: int) -> np.ndarray:
+    top = []
+    for start in range(0, len(queries), 64):
+        dist = block_distances(vectors, queries[start:start + 64], space)
+        top.append(np.argsort(dist, axis=0)[:k].T)
+    return np.concatenate(top)
+
+
+def build_collection(client, vectors: np.ndarray, name: str, metadata: dict):
+    collection = client.create_collection(name, metadata=metadata)
+    ids = [str(i) for i in range(len(vectors))]
+    for start in range(0, len(vectors), _ADD_BATCH):
+        collection.add(ids=ids[start:start + _ADD_BATCH], embeddings=vectors[start:start + _ADD_BATCH].tolist())
+    return collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW parameter sweep (latency vs recall)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--config", help="RAG config name (reads embeddings of its current vector store)")
+    source.add_argument("--synthetic", type=int, default=20000, help="Number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic vector dimension")
+    parser.add_argument("--space", choices=HNSW_SPACES, default=None,
+                        help="Distance space (default: the store's space, l2 for synthetic)")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import chromadb
+
+    if args.config:
+        vectors, space, _ = load_config_vectors(args.config)
+    else:
+        vectors, space = synthetic_vectors(args.synthetic, args.dim, args.seed), "l2"
+    space = args.space or space
+    queries = make_queries(vectors, args.queries, args.seed)
+    truth = exact_top_k(vectors, queries, space, args.k)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]}d, space={space}, {len(queries)} queries, k={args.k}")
+
+    header = f"{'M':>4} {'constr_ef':>9} {'build s':>8} {'search_ef':>9} {'p50 ms':>7} {'p95 ms':>7} {f'R@{args.k}':>7}"
+    print(header)
+    print("-" * len(header))
+
+    workdir = Path(tempfile.mkdtemp(prefix="sweep_hnsw_"))
+    try:
+        client = chromadb.PersistentClient(path=str(workdir))
+        for m in args.m:
+            for construction_ef in args.construction_ef:
+                name = f"sweep_m{m}_ef{construction_ef}"
+                metadata = hnsw_metadata(space=space, m=m, construction_ef=construction_ef,
+                                         search_ef=args.search_ef[0])
+                started = time.perf_counter()
+                collection = build_collection(client, vectors, name, metadata)
+                build_s = time.perf_counter() - started
+
+                for search_ef in args.search_ef:
+                    if not apply_search_ef(collection, search_ef):
+                        # Chroma cũ không sửa được ef_search → build lại với search_ef này
+                        client.delete_collection(name)
+                        collection = build_collection(client, vectors, name, hnsw_metadata(
+                            space=space, m=m, construction_ef=construction_ef, search_ef=search_ef))
+                    latencies, recalls = [], []
+                    for q, expected in zip(queries, truth):
+                        started = time.perf_counter()
+                        found = collection.query(query_embeddings=[q.tolist()], n_results=args.k, include=[])
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        found_ids = {int(i) for i in found["ids"][0]}
+                        recalls.append(len(found_ids & set(expected.tolist())) / args.k)
+                    print(f"{m:>4} {construction_ef:>9} {build_s:>8.1f} {search_ef:>9} "
+                          f"{np.percentile(latencies, 50):>7.2f} {np.percentile(latencies, 95):>7.2f} "
+                          f"{np.mean(recalls):>7.3f}")
+                client.delete_collection(name)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Script để build (hoặc rebuild) vector stores ngoài API process, vd. từ cron ngoài giờ
+Chạy: python build_index.py --all --jobs 2 --ollama-concurrency 4
+      python build_index.py --config-id 1 --config-id 3 --dry-run
+      python build_index.py --manifest indexes.yaml --jobs 3
+
+Indexing là incremental: documents đã có trong version hiện tại không bị embed lại,
+build bị gián đoạn chạy tiếp từ checkpoint ở lần chạy sau.
+"""
+import argparse
+import os
+import sys
+import time
+
+from services.bulk_index import plan_from_db, load_manifest, inspect_build, run_builds
+
+
+def print_plan(specs):
+    header = f"{'Config':<30} {'Model':<22} {'Docs':>5} {'Indexed':>8} {'To build':>9} {'Remove':>7} {'Missing':>8}"
+    print(header)
+    print("-" * len(header))
+    for spec in specs:
+        info = inspect_build(spec)
+        indexed = "?" if info["indexed"] is None else info["indexed"]
+        to_remove = "?" if info["to_remove"] is None else info["to_remove"]
+        print(f"{info['config_name'][:30]:<30} {info['embedding_model'][:22]:<22} {info['documents']:>5} "
+              f"{indexed:>8} {len(info['to_build']):>9} {to_remove:>7} {len(info['missing']):>8}")
+        if info["building_version"]:
+            print(f"  interrupted build {info['building_version']} will be resumed")
+        if not info["manifest_known"] and info["current_version"]:
+            print(f"  version {info['current_version']} has no chunk manifest: unchanged documents are "
+                  f"detected while building")
+        for path in info["missing"]:
+            print(f"  missing file: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build RAG vector stores from the database or a YAML manifest")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--config-id", type=int, action="append", help="RAG config id (repeatable)")
+    source.add_argument("--all", action="store_true", help="All RAG configs with documents")
+    source.add_argument("--manifest", help="YAML manifest describing the indexes (no database needed)")
+    parser.add_argument("--jobs", type=int, default=1, help="Indexes built in parallel")
+    parser.add_argument("--cpu-workers", type=int, default=os.cpu_count() or 1,
+                        help="Total PDF parsing processes, split across parallel builds")
+    parser.add_argument("--ollama-concurrency", type=int, default=2,
+                        help="Total concurrent embedding requests to Ollama, split across parallel builds")
+    parser.add_argument("--embed-batch-size", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would be built")
+    parser.add_argument("--force", action="store_true", help="Build even if the API has a job queued/running")
+    parser.add_argument("--quiet", action="store_true", help="No per-build progress lines")
+    args = parser.parse_args()
+
+    if args.manifest:
+        specs = load_manifest(args.manifest)
+    else:
+        from database.connection import SessionLocal
+
+        db = SessionLocal()
+        try:
+            specs = plan_from_db(db, None if args.all else args.config_id)
+        finally:
+            db.close()
+
+    if not specs:
+        print("Nothing to build")
+        return
+
+    print_plan(specs)
+    if args.dry_run:
+        return
+    print()
+
+    def on_result(spec, result):
+        status = "✓" if result["success"] else ("-" if result.get("skipped") else "✗")
+        detail = (f"{result.get('num_chunks')} chunks, +{result.get('num_added_chunks')} added"
+                  if result["success"] else result["message"])
+        print(f"{status} {spec['config_name']} ({result['seconds']:.1f}s): {detail}", flush=True)
+
+    started = time.monotonic()
+    results = run_builds(
+        specs,
+        jobs=args.jobs,
+        cpu_workers=args.cpu_workers,
+        ollama_concurrency=args.ollama_concurrency,
+        embed_batch_size=args.embed_batch_size,
+        force=args.force,
+        progress=not args.quiet,
+        on_result=on_result
+    )
+
+    failed = [r for r in results if not r["success"] and not r.get("skipped")]
+    skipped = [r for r in results if r.get("skipped")]
+    print(f"\nBuilt {len(results) - len(failed) - len(skipped)}/{len(results)} indexes "
+          f"in {time.monotonic() - started:.1f}s ({len(failed)} failed, {len(skipped)} skipped)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
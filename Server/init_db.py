@@ -2,6 +2,9 @@
 Script để tạo tất cả tables trong database
 Chạy: python init_db.py
 """
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
 from database.connection import engine, Base
 
 # Import tất cả models để SQLAlchemy biết cần tạo tables nào
@@ -12,12 +15,33 @@ from models.rag_config import RAGConfig
 from models.document import Document
 from models.rag_document import RagDocument
 from models.model import Model
+from models.index_job import IndexJob
+
+
+def add_missing_columns():
+    """
+    create_all không sửa tables đã có → thêm các columns mới của models
+    (vd. ragconfig.vector_storage) vào tables cũ bằng ALTER TABLE
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                print(f"  + {table.name}.{column.name}")
 
 
 def init_database():
     """Tạo tất cả tables trong database"""
     print("Đang tạo tables trong database...")
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
     print("✓ Hoàn thành! Tất cả tables đã được tạo.")
 
 
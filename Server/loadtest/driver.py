@@ -0,0 +1,244 @@
+"""
+Load test driver: replay N concurrent chat sessions against /chat/stream và history endpoints
+Chạy: python loadtest/driver.py loadtest/scenarios/smoke.json
+
+Mỗi virtual user: register/login → tạo chat session → gửi các turns tới /chat/stream
+(đo time to first byte và tổng thời gian) → touch và list chat sessions.
+Chỉ dùng stdlib (http.client) để chạy được trên một máy Linux không có network.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from typing import Dict, List, Optional
+import argparse
+import http.client
+import json
+import threading
+import time
+import uuid
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentile với nội suy tuyến tính (pct trong khoảng 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class Recorder:
+    """Thu thập latency theo endpoint (thread-safe)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.ttfb: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.stream_bytes = 0
+
+    def record(self, name: str, latency_ms: float) -> None:
+        with self.lock:
+            self.samples.setdefault(name, []).append(latency_ms)
+
+    def record_ttfb(self, ttfb_ms: float) -> None:
+        with self.lock:
+            self.ttfb.append(ttfb_ms)
+
+    def record_error(self, name: str) -> None:
+        with self.lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def add_stream_bytes(self, n: int) -> None:
+        with self.lock:
+            self.stream_bytes += n
+
+    def summary(self, elapsed_s: float) -> dict:
+        def stats(values: List[float]) -> dict:
+            return {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50) or 0, 1),
+                "p95_ms": round(percentile(values, 95) or 0, 1),
+                "p99_ms": round(percentile(values, 99) or 0, 1),
+                "max_ms": round(max(values), 1) if values else 0
+            }
+
+        total_requests = sum(len(v) for v in self.samples.values())
+        streams = len(self.samples.get("chat_stream", []))
+        return {
+            "elapsed_s": round(elapsed_s, 2),
+            "total_requests": total_requests,
+            "throughput_rps": round(total_requests / elapsed_s, 2) if elapsed_s else 0,
+            "stream_throughput_per_s": round(streams / elapsed_s, 2) if elapsed_s else 0,
+            "stream_bytes_per_s": round(self.stream_bytes / elapsed_s, 1) if elapsed_s else 0,
+            "time_to_first_byte": stats(self.ttfb),
+            "endpoints": {name: stats(values) for name, values in sorted(self.samples.items())},
+            "errors": dict(self.errors)
+        }
+
+
+class VirtualUser:
+    """Một session chat, dùng một keep-alive connection riêng"""
+
+    def __init__(self, index: int, scenario: dict, recorder: Recorder):
+        self.index = index
+        self.scenario = scenario
+        self.recorder = recorder
+        url = urlparse(scenario.get("base_url", "http://127.0.0.1:8000"))
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = scenario.get("timeout_s", 120)
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        self.token = None
+
+    def _request(self, name: str, method: str, path: str, body: Optional[dict] = None, auth: bool = True):
+        headers = {"Content-Type": "application/json"}
+        if auth and self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self.recorder.record_error(name)
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            return None, None
+        self.recorder.record(name, (time.perf_counter() - started) * 1000)
+
+        if response.status >= 400:
+            self.recorder.record_error(f"{name}_{response.status}")
+        return response.status, data
+
+    def login(self) -> bool:
+        user = self.scenario.get("user", {})
+        username = f"{user.get('username_prefix', 'loadtest_user')}_{self.index}"
+        password = user.get("password", "loadtest_password")
+
+        # Register lần đầu; 400 = đã tồn tại
+        self._request("register", "POST", "/users/register",
+                      {"username": username, "password": password}, auth=False)
+        status, data = self._request("login", "POST", "/users/login",
+                                     {"username": username, "password": password}, auth=False)
+        if status != 200:
+            return False
+        self.token = json.loads(data)["access_token"]
+        return True
+
+    def chat_turn(self, session_id: str, message: str) -> None:
+        body = json.dumps({"message": message, "session_id": session_id}).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.token}"}
+
+        started = time.perf_counter()
+        try:
+            self.conn.request("POST", "/chat/stream", body=body, headers=headers)
+            response = self.conn.getresponse()
+            first = response.read1(65536) if hasattr(response, "read1") else response.read(1)
+            self.recorder.record_ttfb((time.perf_counter() - started) * 1000)
+            rest = response.read()
+        except (http.client.HTTPException, OSError):
+            self.recorder.record_error("chat_stream")
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            return
+
+        self.recorder.record("chat_stream", (time.perf_counter() - started) * 1000)
+        self.recorder.add_stream_bytes(len(first) + len(rest))
+        if response.status >= 400:
+            self.recorder.record_error(f"chat_stream_{response.status}")
+
+    def run(self) -> None:
+        if not self.login():
+            self.recorder.record_error("login_failed")
+            return
+
+        session_id = str(uuid.uuid4())
+        self._request("create_session", "POST", "/history/chat-sessions/",
+                      {"session_id": session_id, "session_name": f"loadtest {self.index}"})
+
+        messages = self.scenario.get("messages", ["Xin chào"])
+        think_time_s = self.scenario.get("think_time_ms", 0) / 1000
+
+        for turn in range(self.scenario.get("turns_per_session", 1)):
+            self.chat_turn(session_id, messages[(self.index + turn) % len(messages)])
+
+            if self.scenario.get("history_checks", True):
+                self._request("touch_session", "POST", f"/history/chat-sessions/{session_id}/touch")
+                self._request("list_sessions", "GET", "/history/chat-sessions/")
+
+            if think_time_s:
+                time.sleep(think_time_s)
+
+        if self.scenario.get("cleanup", True):
+            self._request("delete_session", "DELETE", f"/history/chat-sessions/{session_id}")
+        self.conn.close()
+
+
+def run_scenario(scenario: dict) -> dict:
+    """Chạy một scenario, trả về summary"""
+    recorder = Recorder()
+    sessions = scenario.get("sessions", 1)
+    ramp_up_s = scenario.get("ramp_up_s", 0)
+
+    def start_user(index: int) -> None:
+        if ramp_up_s:
+            time.sleep(ramp_up_s * index / sessions)
+        VirtualUser(index, scenario, recorder).run()
+
+    print(f"[LoadTest] Scenario '{scenario.get('name', 'unnamed')}': {sessions} sessions x "
+          f"{scenario.get('turns_per_session', 1)} turns against {scenario.get('base_url')}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        list(executor.map(start_user, range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    summary = recorder.summary(elapsed)
+    summary["scenario"] = scenario.get("name", "unnamed")
+    summary["sessions"] = sessions
+    return summary
+
+
+def print_summary(summary: dict) -> None:
+    print(f"\n=== {summary['scenario']} ({summary['sessions']} sessions, {summary['elapsed_s']}s) ===")
+    print(f"Throughput: {summary['throughput_rps']} req/s, {summary['stream_throughput_per_s']} streams/s, "
+          f"{summary['stream_bytes_per_s']} stream bytes/s")
+    ttfb = summary["time_to_first_byte"]
+    print(f"TTFB /chat/stream: p50={ttfb['p50_ms']}ms p95={ttfb['p95_ms']}ms p99={ttfb['p99_ms']}ms max={ttfb['max_ms']}ms")
+    print(f"{'Endpoint':<18} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, s in summary["endpoints"].items():
+        print(f"{name:<18} {s['count']:>6} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} {s['max_ms']:>9}")
+    if summary["errors"]:
+        print(f"Errors: {summary['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay concurrent chat sessions against the API")
+    parser.add_argument("scenario", help="Scenario JSON file (see loadtest/scenarios/)")
+    parser.add_argument("--base-url", default=None, help="Override base_url of the scenario")
+    parser.add_argument("--sessions", type=int, default=None, help="Override number of concurrent sessions")
+    parser.add_argument("--output", default=None, help="Write JSON summary to this file")
+    args = parser.parse_args()
+
+    with open(args.scenario, encoding="utf-8") as f:
+        scenario = json.load(f)
+    if args.base_url:
+        scenario["base_url"] = args.base_url
+    if args.sessions:
+        scenario["sessions"] = args.sessions
+
+    summary = run_scenario(scenario)
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n✓ Saved summary to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
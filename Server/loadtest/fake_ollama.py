@@ -0,0 +1,252 @@
+"""
+Fake Ollama server cho load test (không cần GPU, không cần network)
+Hỗ trợ: /api/chat (stream và non-stream), /api/generate, /api/embed, /api/embeddings, /api/tags
+
+Chạy: python loadtest/fake_ollama.py --port 11435 --token-rate 50 --first-token-latency-ms 300
+Sau đó start server với OLLAMA_BASE_URL=http://localhost:11435 và OLLAMA_HOST=http://localhost:11435
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+import argparse
+import hashlib
+import json
+import math
+import random
+import time
+
+
+LOREM = (
+    "Cảm ơn bạn đã chia sẻ. Mình hiểu rằng điều này không dễ dàng với bạn. "
+    "Hãy thử dành một chút thời gian để hít thở sâu và ghi lại những cảm xúc của mình. "
+    "Nếu cảm giác này kéo dài, bạn nên trò chuyện với người thân hoặc chuyên gia tâm lý."
+).split()
+
+
+class FakeOllamaConfig:
+    """Tham số giả lập: tốc độ sinh token và latency"""
+
+    def __init__(
+        self,
+        token_rate: float = 50.0,
+        first_token_latency_ms: float = 200.0,
+        response_tokens: int = 120,
+        embedding_dim: int = 1024,
+        embed_latency_ms: float = 20.0,
+        embed_per_input_ms: float = 2.0,
+        jitter: float = 0.1,
+        seed: int = 42
+    ):
+        self.token_rate = token_rate
+        self.first_token_latency_ms = first_token_latency_ms
+        self.response_tokens = response_tokens
+        self.embedding_dim = embedding_dim
+        self.embed_latency_ms = embed_latency_ms
+        self.embed_per_input_ms = embed_per_input_ms
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+
+    def sleep_ms(self, ms: float) -> None:
+        if ms <= 0:
+            return
+        factor = 1 + self.rng.uniform(-self.jitter, self.jitter)
+        time.sleep(ms * factor / 1000)
+
+
+def fake_embedding(text: str, dim: int) -> list:
+    """Embedding deterministic từ hash của text (cùng text → cùng vector, đã normalize)"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: FakeOllamaConfig = FakeOllamaConfig()
+
+    def log_message(self, format, *args):
+        # Tắt access log để không ảnh hưởng throughput
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        return json.loads(raw or b"{}")
+
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, payload: dict) -> None:
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "fake:latest", "model": "fake:latest", "size": 0}]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        elif self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+        except json.JSONDecodeError:
+            self._send_json({"error": "invalid json"}, status=400)
+            return
+
+        if self.path == "/api/chat":
+            self._generate(request, chat=True)
+        elif self.path == "/api/generate":
+            self._generate(request, chat=False)
+        elif self.path == "/api/embed":
+            self._embed(request)
+        elif self.path == "/api/embeddings":
+            self._embeddings_legacy(request)
+        elif self.path == "/api/show":
+            self._send_json({"modelfile": "", "parameters": "", "template": "", "details": {}})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _generate(self, request: dict, chat: bool) -> None:
+        cfg = self.config
+        model = request.get("model", "fake")
+        num_tokens = int(request.get("options", {}).get("num_predict") or cfg.response_tokens)
+        if num_tokens <= 0:
+            num_tokens = cfg.response_tokens
+        tokens = [LOREM[i % len(LOREM)] + " " for i in range(num_tokens)]
+        started = time.perf_counter()
+
+        cfg.sleep_ms(cfg.first_token_latency_ms)
+
+        def piece(text: str, done: bool) -> dict:
+            payload = {"model": model, "created_at": _now(), "done": done}
+            if chat:
+                payload["message"] = {"role": "assistant", "content": text}
+            else:
+                payload["response"] = text
+            return payload
+
+        def final() -> dict:
+            payload = piece("", True)
+            elapsed_ns = int((time.perf_counter() - started) * 1e9)
+            payload.update({
+                "done_reason": "stop",
+                "total_duration": elapsed_ns,
+                "load_duration": 0,
+                "prompt_eval_count": 10,
+                "prompt_eval_duration": 0,
+                "eval_count": num_tokens,
+                "eval_duration": elapsed_ns
+            })
+            return payload
+
+        # Ollama stream mặc định = true
+        if request.get("stream", True):
+            self._start_stream()
+            for token in tokens:
+                self._write_chunk(piece(token, False))
+                cfg.sleep_ms(1000 / cfg.token_rate if cfg.token_rate > 0 else 0)
+            self._write_chunk(final())
+            self._end_stream()
+        else:
+            cfg.sleep_ms(1000 * num_tokens / cfg.token_rate if cfg.token_rate > 0 else 0)
+            payload = final()
+            text = "".join(tokens)
+            if chat:
+                payload["message"] = {"role": "assistant", "content": text}
+            else:
+                payload["response"] = text
+            self._send_json(payload)
+
+    def _embed(self, request: dict) -> None:
+        cfg = self.config
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        cfg.sleep_ms(cfg.embed_latency_ms + cfg.embed_per_input_ms * len(inputs))
+        self._send_json({
+            "model": request.get("model", "fake"),
+            "embeddings": [fake_embedding(text, cfg.embedding_dim) for text in inputs],
+            "total_duration": 0,
+            "load_duration": 0,
+            "prompt_eval_count": len(inputs)
+        })
+
+    def _embeddings_legacy(self, request: dict) -> None:
+        cfg = self.config
+        cfg.sleep_ms(cfg.embed_latency_ms + cfg.embed_per_input_ms)
+        self._send_json({"embedding": fake_embedding(request.get("prompt", ""), cfg.embedding_dim)})
+
+
+def make_server(host: str, port: int, config: FakeOllamaConfig) -> ThreadingHTTPServer:
+    """Tạo fake Ollama server (dùng được trong script khác hoặc test)"""
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama-compatible fake server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Tokens per second per stream")
+    parser.add_argument("--first-token-latency-ms", type=float, default=200.0)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0, help="Fixed latency per embed request")
+    parser.add_argument("--embed-per-input-ms", type=float, default=2.0, help="Extra latency per input text")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative random jitter on every delay")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        token_rate=args.token_rate,
+        first_token_latency_ms=args.first_token_latency_ms,
+        response_tokens=args.response_tokens,
+        embedding_dim=args.embedding_dim,
+        embed_latency_ms=args.embed_latency_ms,
+        embed_per_input_ms=args.embed_per_input_ms,
+        jitter=args.jitter
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"[FakeOllama] Listening on http://{args.host}:{args.port} "
+          f"(token_rate={args.token_rate}/s, first_token={args.first_token_latency_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from services import user_service, chat_service, rag_service, history_service
+from services import index_jobs
 
 app = FastAPI(title="Backend API")
 
@@ -9,6 +10,15 @@ app.include_router(chat_service.router)
 app.include_router(rag_service.router)
 app.include_router(history_service.router)
 
+@app.on_event("startup")
+def start_index_workers():
+    # Background workers cho RAG indexing jobs
+    index_jobs.start_workers()
+
+@app.on_event("shutdown")
+def stop_index_workers():
+    index_jobs.stop_workers()
+
 @app.get("/status")
 def get_status():
     return {"status": "ok", "message": "Backend is running!"}
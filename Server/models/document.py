@@ -11,6 +11,8 @@ class Document(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     file_name = Column(String(255), nullable=False)
     file_path = Column(String(255), nullable=False, unique=True)
+    # SHA-256 nội dung file (tính lúc upload) → upload trùng nội dung dùng lại document đã có
+    content_hash = Column(String(64), nullable=True, index=True)
     title = Column(String(255), nullable=True)
     author = Column(String(255), nullable=True)
     total_pages = Column(Integer, nullable=True)
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from datetime import datetime
+from database.connection import Base
+
+
+class IndexJob(Base):
+    """Model cho background indexing job (load, split, embed, store)"""
+    __tablename__ = "index_job"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    rag_config_id = Column(Integer, ForeignKey("ragconfig.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued/running/succeeded/failed/cancelled
+    document_ids = Column(Text, nullable=False)  # JSON list
+    sweep_config_ids = Column(Text, nullable=True)  # JSON list: sweep build nhiều configs (rag_config_id là config đầu tiên)
+    documents_total = Column(Integer, nullable=False, default=0)
+    documents_done = Column(Integer, nullable=False, default=0)
+    pages_parsed = Column(Integer, nullable=False, default=0)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    stage = Column(String(50), nullable=True)
+    message = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)  # JSON kết quả của RAGProcessor
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=1)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    worker_id = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<IndexJob(id={self.id}, rag_config_id={self.rag_config_id}, status={self.status})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean
 from datetime import datetime
 from database.connection import Base
 
@@ -12,7 +12,22 @@ class RAGConfig(Base):
     embedding_model_id = Column(Integer, nullable=False)
     chunk_size = Column(Integer, nullable=False, default=1000)
     chunk_overlap = Column(Integer, nullable=False, default=200)
+    # Splitter: recursive (chunk_size/chunk_overlap tính bằng ký tự) | token (tính bằng tokens)
+    text_splitter = Column(String(20), nullable=False, default="recursive", server_default="recursive")
+    # Encoding của token splitter: tên tiktoken hoặc đường dẫn tokenizer.json (NULL → RAG_TOKEN_ENCODING)
+    token_encoding = Column(String(255), nullable=True)
     search_type = Column(String(50), nullable=False, default="similarity")
     k_value = Column(Integer, nullable=False, default=3)
     prompt_template = Column(Text, nullable=False)
+    # Kiểu lưu vectors của index: float32 | float16 | int8 (nén, rescore bằng float32)
+    vector_storage = Column(String(20), nullable=False, default="float32", server_default="float32")
+    # Backend phục vụ search: chroma | numpy (mmap flat/IVF index)
+    vector_backend = Column(String(20), nullable=False, default="chroma", server_default="chroma")
+    # HNSW của Chroma collection (NULL → mặc định của Chroma: l2, M=16, construction_ef=100, search_ef=10)
+    hnsw_space = Column(String(20), nullable=True)
+    hnsw_m = Column(Integer, nullable=True)
+    hnsw_construction_ef = Column(Integer, nullable=True)
+    hnsw_search_ef = Column(Integer, nullable=True)
+    # Bỏ header/footer lặp lại và chunks trùng/gần trùng trước khi embed
+    dedupe_chunks = Column(Boolean, nullable=False, default=False, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
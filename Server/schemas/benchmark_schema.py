@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class LabeledRelevant(BaseModel):
+    """Một label: tên file nguồn và (optional) số trang"""
+    source: Optional[str] = None
+    page: Optional[int] = None
+
+
+class LabeledQuery(BaseModel):
+    """Query đã gán nhãn cho benchmark"""
+    query: str
+    relevant: List[LabeledRelevant] = []
+    answer_contains: List[str] = []
+
+
+class BenchmarkRequest(BaseModel):
+    """Schema để chạy benchmark trên một hoặc nhiều RAG configs"""
+    config_ids: List[int]
+    queries: List[LabeledQuery]
+    k: Optional[int] = None  # None = dùng k_value của từng config
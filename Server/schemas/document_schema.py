@@ -32,6 +32,7 @@ class DocumentOut(BaseModel):
     author: Optional[str] = None
     total_pages: Optional[int] = None
     creation_date: Optional[datetime] = None
+    content_hash: Optional[str] = None
     uploaded_at: datetime
 
     class Config:
@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+
+class IndexJobOut(BaseModel):
+    """Schema trả về trạng thái indexing job"""
+    id: int
+    rag_config_id: int
+    status: str
+    document_ids: List[int]
+    sweep_config_ids: Optional[List[int]] = None
+    documents_total: int
+    documents_done: int
+    pages_parsed: int
+    chunks_embedded: int
+    stage: Optional[str] = None
+    message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime
+
+
+class SweepBuildRequest(BaseModel):
+    """Schema để build nhiều RAG configs trên cùng documents trong một job"""
+    config_ids: List[int]
+    document_ids: List[int]
@@ -10,9 +10,18 @@ class RAGConfigCreate(BaseModel):
     embedding_model_id: int
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    text_splitter: str = "recursive"  # recursive (ký tự) | token
+    token_encoding: Optional[str] = None  # tiktoken encoding | đường dẫn tokenizer.json
     search_type: str = "similarity"
     k_value: int = 3
     prompt_template: str
+    vector_storage: str = "float32"  # float32 | float16 | int8
+    vector_backend: str = "chroma"  # chroma | numpy
+    hnsw_space: Optional[str] = None  # l2 | cosine | ip
+    hnsw_m: Optional[int] = None
+    hnsw_construction_ef: Optional[int] = None
+    hnsw_search_ef: Optional[int] = None
+    dedupe_chunks: bool = False
 
 
 class RAGConfigUpdate(BaseModel):
@@ -22,9 +31,18 @@ class RAGConfigUpdate(BaseModel):
     embedding_model_id: Optional[int] = None
     chunk_size: Optional[int] = None
     chunk_overlap: Optional[int] = None
+    text_splitter: Optional[str] = None
+    token_encoding: Optional[str] = None
     search_type: Optional[str] = None
     k_value: Optional[int] = None
     prompt_template: Optional[str] = None
+    vector_storage: Optional[str] = None
+    vector_backend: Optional[str] = None
+    hnsw_space: Optional[str] = None
+    hnsw_m: Optional[int] = None
+    hnsw_construction_ef: Optional[int] = None
+    hnsw_search_ef: Optional[int] = None
+    dedupe_chunks: Optional[bool] = None
 
 
 class RAGConfigOut(BaseModel):
@@ -35,9 +53,18 @@ class RAGConfigOut(BaseModel):
     embedding_model_id: int
     chunk_size: int
     chunk_overlap: int
+    text_splitter: str = "recursive"
+    token_encoding: Optional[str] = None
     search_type: str
     k_value: int
     prompt_template: str
+    vector_storage: str = "float32"
+    vector_backend: str = "chroma"
+    hnsw_space: Optional[str] = None
+    hnsw_m: Optional[int] = None
+    hnsw_construction_ef: Optional[int] = None
+    hnsw_search_ef: Optional[int] = None
+    dedupe_chunks: bool = False
     created_at: datetime
 
     class Config:
@@ -0,0 +1,344 @@
+"""
+Bulk Index
+Build nhiều vector stores ngoài API process (build_index.py: cron, rebuild ngoài giờ).
+
+Nguồn:
+- Database: RAG configs (--config-id / --all) với documents đã gán cho từng config;
+  mỗi build được ghi thành một index job (run_inline_job) để API không build trùng
+- YAML manifest: configs mô tả đầy đủ (embedding model theo tên, params, globs của PDFs),
+  không cần database, build thẳng vào chroma_db
+
+Song song: tối đa `jobs` builds cùng lúc (configs cùng vector store luôn tuần tự);
+CPU (parse PDF) và Ollama (embed requests) là tổng cho cả lần chạy, chia đều cho các builds.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import glob
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from models.document import Document
+from models.model import Model
+from models.rag_config import RAGConfig
+from models.rag_document import RagDocument
+from services.hnsw_config import validate_hnsw_params
+from services.index_jobs import active_job_for_config, run_inline_job
+from services.index_stats import read_build_info
+from services.numpy_index import VECTOR_BACKENDS
+from services.page_cache import compute_file_hash
+from services.quantized_index import VECTOR_STORAGE_OPTIONS
+from services.token_splitter import TEXT_SPLITTERS, check_token_encoding
+from services.vector_store_versions import VectorStoreVersions, safe_config_name, store_root
+
+
+# Params của một build trong manifest (giá trị mặc định giống RAGConfig)
+MANIFEST_DEFAULTS = {
+    "chunk_size": 1000,
+    "chunk_overlap": 200,
+    "text_splitter": "recursive",
+    "token_encoding": None,
+    "vector_storage": "float32",
+    "vector_backend": "chroma",
+    "hnsw_space": None,
+    "hnsw_m": None,
+    "hnsw_construction_ef": None,
+    "hnsw_search_ef": None,
+    "dedupe_chunks": False
+}
+_MANIFEST_KEYS = set(MANIFEST_DEFAULTS) | {"config_name", "embedding_model", "documents"}
+
+PROGRESS_INTERVAL_S = 5.0
+
+
+def _spec(config_name: str, embedding_model: str, paths: List[str], params: dict,
+          document_ids: Optional[List[int]] = None, rag_config_id: Optional[int] = None) -> dict:
+    return {
+        "config_name": config_name,
+        "embedding_model": embedding_model,
+        "paths": paths,
+        "document_ids": document_ids,
+        "rag_config_id": rag_config_id,
+        "params": params
+    }
+
+
+def plan_from_db(db: Session, config_ids: Optional[List[int]] = None) -> List[dict]:
+    """Builds của các RAG configs trong database (config_ids None → mọi configs có documents)"""
+    query = db.query(RAGConfig)
+    if config_ids:
+        query = query.filter(RAGConfig.id.in_(config_ids))
+    configs = query.order_by(RAGConfig.id).all()
+    if config_ids and len(configs) != len(set(config_ids)):
+        missing = set(config_ids) - {config.id for config in configs}
+        raise ValueError(f"RAG configs not found: {', '.join(map(str, sorted(missing)))}")
+
+    model_names = dict(db.query(Model.id, Model.model_name).all())
+    specs = []
+    for config in configs:
+        documents = db.query(Document).join(RagDocument, RagDocument.document_id == Document.id) \
+            .filter(RagDocument.rag_config_id == config.id).order_by(Document.id).all()
+        if not documents:
+            if config_ids:
+                print(f"Skipping {config.config_name}: no documents assigned")
+            continue
+        if config.embedding_model_id not in model_names:
+            raise ValueError(f"Embedding model of '{config.config_name}' not found")
+        specs.append(_spec(
+            config.config_name,
+            model_names[config.embedding_model_id],
+            [doc.file_path for doc in documents],
+            {field: getattr(config, field) for field in MANIFEST_DEFAULTS},
+            document_ids=[doc.id for doc in documents],
+            rag_config_id=config.id
+        ))
+    return specs
+
+
+def load_manifest(path) -> List[dict]:
+    """
+    Builds trong YAML manifest:
+
+        defaults:                  # áp dụng cho mọi configs (tùy chọn)
+          embedding_model: nomic-embed-text
+          documents: ["pdfs/**/*.pdf"]
+        configs:
+          - config_name: small_chunks
+            chunk_size: 500
+            chunk_overlap: 50
+          - config_name: token_256
+            text_splitter: token
+            token_encoding: tokenizers/nomic-embed-text/tokenizer.json
+            chunk_size: 256
+            documents: ["pdfs/reports/*.pdf"]
+
+    Đường dẫn/globs của documents và đường dẫn tokenizer.json của token_encoding tính từ
+    thư mục chứa manifest.
+    """
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("YAML manifests require PyYAML. Please install: pip install pyyaml")
+
+    path = Path(path)
+    data = yaml.safe_load(path.read_text()) or {}
+    defaults = data.get("defaults") or {}
+    entries = data.get("configs") or []
+    if not entries:
+        raise ValueError(f"{path}: no configs defined")
+
+    specs, names = [], set()
+    for i, entry in enumerate(entries):
+        merged = {**MANIFEST_DEFAULTS, **defaults, **(entry or {})}
+        unknown = set(merged) - _MANIFEST_KEYS
+        if unknown:
+            raise ValueError(f"{path}: config #{i + 1} has unknown keys: {', '.join(sorted(unknown))}")
+        for key in ("config_name", "embedding_model", "documents"):
+            if not merged.get(key):
+                raise ValueError(f"{path}: config #{i + 1} is missing '{key}'")
+        if merged["config_name"] in names:
+            raise ValueError(f"{path}: duplicate config_name '{merged['config_name']}'")
+        names.add(merged["config_name"])
+
+        patterns = [merged["documents"]] if isinstance(merged["documents"], str) else merged["documents"]
+        paths = []
+        for pattern in patterns:
+            full = pattern if os.path.isabs(pattern) else str(path.parent / pattern)
+            matches = sorted(glob.glob(full, recursive=True)) if glob.has_magic(full) else [full]
+            paths.extend(match for match in matches if match not in paths)
+        if not paths:
+            raise ValueError(f"{path}: documents of '{merged['config_name']}' match no files")
+
+        params = {key: merged[key] for key in MANIFEST_DEFAULTS}
+        encoding = params["token_encoding"]
+        if encoding and encoding.endswith(".json") and not os.path.isabs(encoding):
+            params["token_encoding"] = str(path.parent / encoding)
+        error = _check_params(params)
+        if error:
+            raise ValueError(f"{path}: {merged['config_name']}: {error}")
+        specs.append(_spec(merged["config_name"], merged["embedding_model"], paths, params))
+    return specs
+
+
+def _check_params(params: dict) -> Optional[str]:
+    if params["text_splitter"] not in TEXT_SPLITTERS:
+        return f"text_splitter must be one of: {', '.join(TEXT_SPLITTERS)}"
+    if params["text_splitter"] == "token":
+        error = check_token_encoding(params["token_encoding"])
+        if error:
+            return error
+    if params["vector_storage"] not in VECTOR_STORAGE_OPTIONS:
+        return f"vector_storage must be one of: {', '.join(VECTOR_STORAGE_OPTIONS)}"
+    if params["vector_backend"] not in VECTOR_BACKENDS:
+        return f"vector_backend must be one of: {', '.join(VECTOR_BACKENDS)}"
+    if params["chunk_overlap"] >= params["chunk_size"]:
+        return "chunk_overlap must be smaller than chunk_size"
+    return validate_hnsw_params(**_hnsw_params(params))
+
+
+def _hnsw_params(params: dict) -> dict:
+    """Tham số HNSW của build (dạng kwargs của hnsw_metadata, như hnsw_params_of)"""
+    return {
+        "space": params["hnsw_space"],
+        "m": params["hnsw_m"],
+        "construction_ef": params["hnsw_construction_ef"],
+        "search_ef": params["hnsw_search_ef"]
+    }
+
+
+def inspect_build(spec: dict) -> dict:
+    """
+    Dry run: documents thiếu file, documents đã có trong version hiện tại (theo chunk manifest
+    BUILD.json) và documents sẽ phải parse/embed. Không mở Chroma, không gọi Ollama.
+    """
+    from services.rag_processor import chunking_fingerprint, index_key
+
+    params = spec["params"]
+    fingerprint = chunking_fingerprint(params["chunk_size"], params["chunk_overlap"],
+                                       bool(params["dedupe_chunks"]), params["text_splitter"],
+                                       params["token_encoding"])
+    versions = VectorStoreVersions(store_root(spec["config_name"]))
+    current = versions.current_version()
+    build_info = read_build_info(versions.version_path(current)) if current else None
+    manifest = (build_info or {}).get("manifest")
+
+    missing, indexed, to_build, wanted = [], [], [], set()
+    for path in spec["paths"]:
+        if not os.path.exists(path):
+            missing.append(path)
+            continue
+        key = index_key(compute_file_hash(path), fingerprint, spec["embedding_model"])
+        wanted.add(key)
+        entry = (manifest or {}).get(key)
+        (indexed if entry and not entry.get("error") else to_build).append(path)
+
+    return {
+        "config_name": spec["config_name"],
+        "embedding_model": spec["embedding_model"],
+        "chunking": fingerprint,
+        "current_version": current,
+        "building_version": versions.building_version(),
+        "manifest_known": manifest is not None,
+        "documents": len(spec["paths"]),
+        "missing": missing,
+        "indexed": len(indexed) if manifest is not None else None,
+        "to_build": to_build if manifest is not None else [p for p in spec["paths"] if p not in missing],
+        "to_remove": len(set(manifest) - wanted) if manifest is not None else None
+    }
+
+
+class _ProgressPrinter:
+    """progress_callback in tiến độ của một build ra console (mỗi PROGRESS_INTERVAL_S và khi đổi stage)"""
+
+    _lock = threading.Lock()
+
+    def __init__(self, label: str, interval: float = PROGRESS_INTERVAL_S):
+        self.label = label
+        self.interval = interval
+        self._last = 0.0
+        self._stage = None
+
+    def __call__(self, progress: dict) -> None:
+        now = time.monotonic()
+        if progress.get("stage") == self._stage and now - self._last < self.interval:
+            return
+        self._last, self._stage = now, progress.get("stage")
+        with self._lock:
+            print(f"[{self.label}] {progress.get('stage')}: documents {progress.get('documents_done', 0)}/"
+                  f"{progress.get('documents_total', 0)}, pages {progress.get('pages_parsed', 0)}, "
+                  f"chunks embedded {progress.get('chunks_embedded', 0)}", flush=True)
+
+
+def run_builds(
+    specs: List[dict],
+    jobs: int = 1,
+    cpu_workers: Optional[int] = None,
+    ollama_concurrency: int = 2,
+    embed_batch_size: Optional[int] = None,
+    force: bool = False,
+    progress: bool = True,
+    on_result: Optional[Callable[[dict, dict], None]] = None
+) -> List[dict]:
+    """
+    Chạy các builds, tối đa `jobs` cùng lúc. cpu_workers (processes parse PDF) và
+    ollama_concurrency (embed requests đồng thời) là tổng, chia đều cho các builds đang chạy.
+    force=False: bỏ qua configs đang có index job queued/running trong database.
+
+    Returns:
+        [{config_name, success, message, seconds, ...kết quả process_rag_config}] theo thứ tự specs
+    """
+    from database.connection import SessionLocal
+    from services.rag_processor import RAGProcessor
+
+    jobs = max(1, min(jobs, len(specs)))
+    cpu_workers = cpu_workers or os.cpu_count() or 1
+    processor_options = {
+        "pdf_workers": max(1, cpu_workers // jobs),
+        "embed_concurrency": max(1, ollama_concurrency // jobs)
+    }
+    if embed_batch_size:
+        processor_options["embed_batch_size"] = embed_batch_size
+
+    # Configs cùng vector store (cùng tên sau khi chuẩn hóa) build tuần tự trong một nhóm
+    groups: Dict[str, List[int]] = {}
+    for i, spec in enumerate(specs):
+        groups.setdefault(safe_config_name(spec["config_name"]), []).append(i)
+
+    results: List[Optional[dict]] = [None] * len(specs)
+
+    def build(spec: dict) -> dict:
+        callback = _ProgressPrinter(spec["config_name"]) if progress else None
+        processor = RAGProcessor(**processor_options)
+        if spec["rag_config_id"] is not None:
+            if not force:
+                db = SessionLocal()
+                try:
+                    job = active_job_for_config(db, spec["rag_config_id"])
+                finally:
+                    db.close()
+                if job:
+                    return {"success": False, "skipped": True,
+                            "message": f"Index job {job.id} is {job.status} for this config (use --force to build anyway)"}
+            return run_inline_job(spec["rag_config_id"], spec["document_ids"], processor, callback)
+
+        params = spec["params"]
+        return processor.process_rag_config(
+            config_name=spec["config_name"],
+            embedding_model_name=spec["embedding_model"],
+            document_file_paths=spec["paths"],
+            chunk_size=params["chunk_size"],
+            chunk_overlap=params["chunk_overlap"],
+            progress_callback=callback,
+            vector_storage=params["vector_storage"],
+            vector_backend=params["vector_backend"],
+            hnsw_params=_hnsw_params(params),
+            dedupe_chunks=bool(params["dedupe_chunks"]),
+            text_splitter=params["text_splitter"],
+            token_encoding=params["token_encoding"]
+        )
+
+    def run_group(indexes: List[int]) -> None:
+        for i in indexes:
+            spec = specs[i]
+            started = time.monotonic()
+            try:
+                result = build(spec)
+            except Exception as e:
+                result = {"success": False, "message": f"{type(e).__name__}: {str(e)}"}
+            results[i] = {"config_name": spec["config_name"], **result,
+                          "seconds": round(time.monotonic() - started, 2)}
+            if on_result:
+                on_result(spec, results[i])
+
+    print(f"Building {len(specs)} indexes, {jobs} at a time "
+          f"(per build: {processor_options['pdf_workers']} PDF workers, "
+          f"{processor_options['embed_concurrency']} concurrent embed requests)")
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="bulk-index") as executor:
+        futures = [executor.submit(run_group, indexes) for indexes in groups.values()]
+        for future in as_completed(futures):
+            future.result()
+    return results
@@ -5,7 +5,6 @@ from pydantic import BaseModel
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_ollama import ChatOllama, OllamaEmbeddings
-from langchain_chroma import Chroma
 from langchain_community.chat_message_histories import SQLChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 import ollama
@@ -15,13 +14,22 @@ from sqlalchemy.orm import Session
 from database.connection import get_db
 from models.rag_config import RAGConfig
 from models.model import Model
+from services.vector_store_versions import VectorStoreVersions, store_root
+from services.vector_backends import open_vector_store, exports_of, export_stamp, count_vectors
+from services.index_stats import (
+    collect_index_stats, check_integrity, export_meta, store_memory, process_rss, LENGTH_SAMPLE
+)
 from cachetools import TTLCache
-from pathlib import Path
 from typing import Optional, Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
 
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
+# Ollama server (override để trỏ tới fake server khi load test)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
 
 # --- Session History Management (like Chatbot.py line 42-43) ---
 def get_session_history(session_id: str):
@@ -43,6 +51,11 @@ class TestSearchRequest(BaseModel):
     query: str
     k: Optional[int] = 10
 
+class BatchTestSearchRequest(BaseModel):
+    queries: List[str]
+    k: Optional[int] = 10
+    config_ids: Optional[List[int]] = None  # None = latest RAG config
+
 class DebugInfo(BaseModel):
     query: str
     num_docs_retrieved: int
@@ -59,9 +72,92 @@ class DebugInfo(BaseModel):
 rag_config_cache = TTLCache(maxsize=1, ttl=86400)  # 1 day = 86400 seconds
 CACHE_KEY = "latest_rag_config"
 
+# --- Cache for RAG configs loaded by id (batch test search) ---
+rag_config_by_id_cache = TTLCache(maxsize=16, ttl=86400)
+
+# --- Batch test search limits ---
+MAX_BATCH_QUERIES = 1000
+BATCH_SEARCH_WORKERS = int(os.getenv("BATCH_SEARCH_WORKERS", "8"))
+
 # --- Store debug info per session (in-memory) ---
 debug_info_store: Dict[str, Dict] = {}
 
+def _build_rag_data(db: Session, rag_config: RAGConfig) -> Optional[dict]:
+    """
+    Load models, vector store and retriever for a RAG configuration.
+
+    Returns:
+        dict with keys: config, llm_model, embedding_model, embeddings, vector_store, retriever,
+        vector_store_version, vector_store_path, export_stamp
+        or None if something is missing
+    """
+    # Get embedding model info
+    embedding_model = db.query(Model).filter(Model.id == rag_config.embedding_model_id).first()
+
+    if not embedding_model:
+        print(f"Embedding model {rag_config.embedding_model_id} not found")
+        return None
+
+    # Get LLM model info
+    llm_model = db.query(Model).filter(Model.id == rag_config.llm_id).first()
+
+    if not llm_model:
+        print(f"LLM model {rag_config.llm_id} not found")
+        return None
+
+    # Version hiện tại của vector store (giữ lease để GC không xóa khi đang dùng)
+    versions = VectorStoreVersions(store_root(rag_config.config_name))
+    version, lease = versions.acquire_current()
+
+    if version is None:
+        print(f"Vector store not found at {versions.root}")
+        return None
+    vector_store_path = versions.version_path(version)
+
+    # Load vector store
+    embeddings = OllamaEmbeddings(
+        base_url=OLLAMA_BASE_URL,
+        model=embedding_model.model_name
+    )
+
+    try:
+        # Chroma, Chroma + index nén, hoặc NumpyIndex mmap — theo backend đã export cho version
+        vector_store = open_vector_store(vector_store_path, embeddings, search_ef=rag_config.hnsw_search_ef)
+    except Exception:
+        versions.release(lease)
+        raise
+    # Lease được trả khi entry bị xóa khỏi cache và vector_store bị garbage collect
+    versions.hold(vector_store, lease)
+
+    # Create retriever
+    retriever = vector_store.as_retriever(
+        search_type=rag_config.search_type,
+        search_kwargs={"k": rag_config.k_value}
+    )
+
+    return {
+        "config": rag_config,
+        "llm_model": llm_model,
+        "embedding_model": embedding_model,
+        "embeddings": embeddings,
+        "vector_store": vector_store,
+        "retriever": retriever,
+        "vector_store_version": version,
+        "vector_store_path": str(vector_store_path),
+        "export_stamp": export_stamp(vector_store_path)
+    }
+
+
+def _is_current(rag_data: dict) -> bool:
+    """
+    Cache entry vẫn trỏ tới version hiện tại của vector store (chưa có reindex mới)
+    và index phục vụ search chưa bị ghi lại (vd. sau khi xóa document)
+    """
+    versions = VectorStoreVersions(store_root(rag_data["config"].config_name))
+    return (versions.current_version() == rag_data["vector_store_version"]
+            and export_stamp(rag_data["vector_store_path"]) == rag_data["export_stamp"])
+
+
 def load_latest_rag_config(db: Session) -> Optional[dict]:
     """
     Load latest RAG configuration from database with 1-day caching.
@@ -71,9 +167,13 @@ def load_latest_rag_config(db: Session) -> Optional[dict]:
         or None if no config found
     """
     # Check cache first
-    if CACHE_KEY in rag_config_cache:
-        print(f"[Cache HIT] Using cached RAG config")
-        return rag_config_cache[CACHE_KEY]
+    cached = rag_config_cache.get(CACHE_KEY)
+    if cached:
+        if _is_current(cached):
+            print(f"[Cache HIT] Using cached RAG config")
+            return cached
+        print(f"[Cache STALE] New vector store version published, reloading")
+        rag_config_cache.pop(CACHE_KEY, None)
 
     print(f"[Cache MISS] Loading RAG config from database")
 
@@ -85,53 +185,10 @@ def load_latest_rag_config(db: Session) -> Optional[dict]:
             print("No RAG configuration found in database")
             return None
 
-        # Get embedding model info
-        embedding_model = db.query(Model).filter(Model.id == latest_config.embedding_model_id).first()
-
-        if not embedding_model:
-            print(f"Embedding model {latest_config.embedding_model_id} not found")
-            return None
-
-        # Get LLM model info
-        llm_model = db.query(Model).filter(Model.id == latest_config.llm_id).first()
-
-        if not llm_model:
-            print(f"LLM model {latest_config.llm_id} not found")
-            return None
-
-        # Generate vector store path
-        safe_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in latest_config.config_name)
-        vector_store_path = Path(f"chroma_db/chroma_langchain_db_{safe_name}")
-
-        if not vector_store_path.exists():
-            print(f"Vector store not found at {vector_store_path}")
+        result = _build_rag_data(db, latest_config)
+        if not result:
             return None
 
-        # Load vector store
-        embeddings = OllamaEmbeddings(
-            base_url="http://localhost:11434",
-            model=embedding_model.model_name
-        )
-
-        vector_store = Chroma(
-            persist_directory=str(vector_store_path),
-            embedding_function=embeddings
-        )
-
-        # Create retriever
-        retriever = vector_store.as_retriever(
-            search_type=latest_config.search_type,
-            search_kwargs={"k": latest_config.k_value}
-        )
-
-        result = {
-            "config": latest_config,
-            "llm_model": llm_model,
-            "embedding_model": embedding_model,
-            "vector_store": vector_store,
-            "retriever": retriever
-        }
-
         # Cache the result
         rag_config_cache[CACHE_KEY] = result
         print(f"[Cache STORED] RAG config cached for 1 day")
@@ -145,9 +202,37 @@ def load_latest_rag_config(db: Session) -> Optional[dict]:
         return None
 
 
+def load_rag_config_by_id(db: Session, config_id: int) -> Optional[dict]:
+    """
+    Load a specific RAG configuration (used by batch test search).
+    Cached per config id with the same 1-day TTL.
+    """
+    cached = rag_config_by_id_cache.get(config_id)
+    if cached:
+        if _is_current(cached):
+            return cached
+        rag_config_by_id_cache.pop(config_id, None)
+
+    try:
+        rag_config = db.query(RAGConfig).filter(RAGConfig.id == config_id).first()
+
+        if not rag_config:
+            print(f"RAG configuration {config_id} not found")
+            return None
+
+        result = _build_rag_data(db, rag_config)
+        if result:
+            rag_config_by_id_cache[config_id] = result
+        return result
+
+    except Exception as e:
+        print(f"Error loading RAG config {config_id}: {str(e)}")
+        return None
+
+
 # --- Init LLM (will be overridden by RAG config if available) ---
 default_llm = ChatOllama(
-    base_url="http://localhost:11434",
+    base_url=OLLAMA_BASE_URL,
     model="gpt-oss:20b-cloud",
     temperature=0.5,
     max_tokens=250
@@ -177,7 +262,7 @@ def chat_stream(req: ChatRequest, db: Session = Depends(get_db)):
 
             # Initialize LLM with model from config
             llm = ChatOllama(
-                base_url="http://localhost:11434",
+                base_url=OLLAMA_BASE_URL,
                 model=llm_model.model_name,
                 temperature=0.5,
                 max_tokens=250
@@ -200,7 +285,6 @@ def chat_stream(req: ChatRequest, db: Session = Depends(get_db)):
                 print(f"[RAG] Retrieved {len(retrieved_docs)} documents, context length: {len(context_text)} chars")
 
                 # Store debug info (like Chatbot.py)
-                safe_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in config.config_name)
                 debug_info_store[req.session_id] = {
                     "query": req.message,
                     "num_docs_retrieved": len(retrieved_docs),
@@ -217,7 +301,7 @@ def chat_stream(req: ChatRequest, db: Session = Depends(get_db)):
                     "rag_config_name": config.config_name,
                     "llm_model_name": llm_model.model_name,
                     "embedding_model_name": rag_data["embedding_model"].model_name,
-                    "vector_store_path": f"chroma_db/chroma_langchain_db_{safe_name}"
+                    "vector_store_path": rag_data["vector_store_path"]
                 }
                 print(f"[DEBUG] Stored debug info for session: {req.session_id}")
 
@@ -473,6 +557,151 @@ def test_search(req: TestSearchRequest, db: Session = Depends(get_db)):
         }
 
 
+def _search_result_line(results_with_scores, latency_ms: float) -> dict:
+    return {
+        "success": True,
+        "num_results": len(results_with_scores),
+        "latency_ms": round(latency_ms, 2),
+        "results": [
+            {
+                "page_content": doc.page_content,
+                "metadata": doc.metadata if hasattr(doc, 'metadata') else {},
+                "similarity_score": float(score)
+            }
+            for doc, score in results_with_scores
+        ]
+    }
+
+
+def _search_by_vector_with_score(vector_store, query_vector: List[float], k: int):
+    """
+    Search theo vector, score là distance (thấp hơn = giống hơn) như similarity_search_with_score
+    của /test-search. Chroma của LangChain không có similarity_search_by_vector_with_score;
+    similarity_search_by_vector_with_relevance_scores của nó trả về distance (không đổi sang relevance).
+    """
+    search = getattr(vector_store, "similarity_search_by_vector_with_score", None)
+    if search is None:
+        search = vector_store.similarity_search_by_vector_with_relevance_scores
+    return search(query_vector, k=k)
+
+
+@router.post("/test-search/batch")
+def test_search_batch(req: BatchTestSearchRequest, db: Session = Depends(get_db)):
+    """
+    Batch test search on one or more vector stores.
+
+    All queries are embedded in a single call per embedding model, then the
+    vector searches run concurrently. Results are streamed back as NDJSON,
+    one line per (config, query) as soon as each search finishes.
+    """
+    queries = [q for q in req.queries if q and q.strip()]
+
+    if not queries:
+        return {"success": False, "message": "No queries provided"}
+
+    if len(queries) > MAX_BATCH_QUERIES:
+        return {"success": False, "message": f"Too many queries (max {MAX_BATCH_QUERIES})"}
+
+    # Resolve target configs before streaming (db session is request-scoped)
+    targets = []
+    errors = []
+    if req.config_ids:
+        for config_id in req.config_ids:
+            rag_data = load_rag_config_by_id(db, config_id)
+            if rag_data:
+                targets.append(rag_data)
+            else:
+                errors.append({"success": False, "config_id": config_id, "message": "RAG configuration or vector store not found"})
+    else:
+        rag_data = load_latest_rag_config(db)
+        if rag_data:
+            targets.append(rag_data)
+
+    if not targets and not errors:
+        return {"success": False, "message": "No RAG configuration found"}
+
+    def search_one(vector_store, query_vector: List[float]):
+        started = time.perf_counter()
+        results_with_scores = _search_by_vector_with_score(vector_store, query_vector, req.k)
+        return results_with_scores, (time.perf_counter() - started) * 1000
+
+    def result_generator():
+        for error in errors:
+            yield json.dumps(error, ensure_ascii=False) + "\n"
+
+        # Query vectors are shared by configs using the same embedding model
+        query_vectors_by_model: Dict[str, List[List[float]]] = {}
+
+        for rag_data in targets:
+            config = rag_data["config"]
+            model_name = rag_data["embedding_model"].model_name
+
+            try:
+                if model_name not in query_vectors_by_model:
+                    started = time.perf_counter()
+                    query_vectors_by_model[model_name] = rag_data["embeddings"].embed_documents(queries)
+                    print(f"[Batch Search] Embedded {len(queries)} queries with {model_name} "
+                          f"in {time.perf_counter() - started:.2f}s")
+                query_vectors = query_vectors_by_model[model_name]
+            except Exception as e:
+                yield json.dumps({
+                    "success": False,
+                    "config_id": config.id,
+                    "rag_config_name": config.config_name,
+                    "message": f"Embedding error: {str(e)}"
+                }, ensure_ascii=False) + "\n"
+                continue
+
+            # NumpyIndex: mọi queries trong một batched matrix multiply
+            batch_search = getattr(rag_data["vector_store"], "similarity_search_by_vectors_with_score", None)
+            if batch_search:
+                try:
+                    started = time.perf_counter()
+                    all_results = batch_search(query_vectors, k=req.k)
+                    latency_ms = (time.perf_counter() - started) * 1000 / len(queries)
+                except Exception as e:
+                    all_results, latency_ms = None, 0.0
+                    error = f"Search error: {str(e)}"
+                for i, query in enumerate(queries):
+                    line = {
+                        "config_id": config.id,
+                        "rag_config_name": config.config_name,
+                        "query_index": i,
+                        "query": query
+                    }
+                    if all_results is None:
+                        line.update({"success": False, "message": error})
+                    else:
+                        line.update(_search_result_line(all_results[i], latency_ms))
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+                continue
+
+            workers = max(1, min(BATCH_SEARCH_WORKERS, len(queries)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(search_one, rag_data["vector_store"], query_vectors[i]): i
+                    for i in range(len(queries))
+                }
+
+                for future in as_completed(futures):
+                    i = futures[future]
+                    line = {
+                        "config_id": config.id,
+                        "rag_config_name": config.config_name,
+                        "query_index": i,
+                        "query": queries[i]
+                    }
+                    try:
+                        results_with_scores, latency_ms = future.result()
+                        line.update(_search_result_line(results_with_scores, latency_ms))
+                    except Exception as e:
+                        line.update({"success": False, "message": f"Search error: {str(e)}"})
+
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(result_generator(), media_type="application/x-ndjson")
+
+
 @router.get("/vector-store-status")
 def get_vector_store_status(db: Session = Depends(get_db)):
     """
@@ -493,24 +722,28 @@ def get_vector_store_status(db: Session = Depends(get_db)):
 
         # Try to get document count
         try:
-            total_docs = vector_store._collection.count()
+            total_docs = count_vectors(vector_store)
         except:
             total_docs = "Unknown"
-
-        safe_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in config.config_name)
+        integrity = check_integrity(rag_data["vector_store_path"], total_docs) if isinstance(total_docs, int) else None
 
         return {
             "success": True,
+            "rag_config_id": config.id,
             "rag_config_name": config.config_name,
             "llm_model": rag_data["llm_model"].model_name,
             "embedding_model": rag_data["embedding_model"].model_name,
-            "vector_store_path": f"chroma_db/chroma_langchain_db_{safe_name}",
+            "vector_store_path": rag_data["vector_store_path"],
+            "vector_store_version": rag_data["vector_store_version"],
+            "vector_storage": exports_of(rag_data["vector_store_path"]).get("storage"),
+            "vector_backend": exports_of(rag_data["vector_store_path"]).get("backend"),
             "total_documents": total_docs,
             "search_type": config.search_type,
             "k_value": config.k_value,
             "chunk_size": config.chunk_size,
             "chunk_overlap": config.chunk_overlap,
-            "cached": CACHE_KEY in rag_config_cache
+            "cached": CACHE_KEY in rag_config_cache,
+            "integrity": integrity
         }
 
     except Exception as e:
@@ -520,6 +753,65 @@ def get_vector_store_status(db: Session = Depends(get_db)):
         }
 
 
+def _loaded_rag_data(config_id: int) -> Optional[dict]:
+    """Entry trong cache chat (nếu store của config đang được load trong process này)"""
+    for cached in list(rag_config_by_id_cache.values()) + list(rag_config_cache.values()):
+        if cached["config"].id == config_id:
+            return cached
+    return None
+
+
+@router.get("/index-stats/{config_id}")
+def get_index_stats(config_id: int, quick: bool = False, length_sample: int = LENGTH_SAMPLE,
+                    db: Session = Depends(get_db)):
+    """
+    Stats và health của vector store hiện tại của một RAG config: số chunks từng document,
+    phân bố độ dài chunk, dimension, dung lượng disk, memory của store đang load,
+    thời gian/throughput của lần build cuối và integrity check với chunk manifest.
+    quick=true chỉ so sánh số vectors với manifest (không quét metadata).
+    """
+    from langchain_chroma import Chroma
+
+    config = db.query(RAGConfig).filter(RAGConfig.id == config_id).first()
+    if not config:
+        return {"success": False, "message": "RAG configuration not found"}
+
+    versions = VectorStoreVersions(store_root(config.config_name))
+    version, lease = versions.acquire_current()
+    if version is None:
+        return {"success": False, "message": f"Vector store of '{config.config_name}' has not been built"}
+
+    try:
+        version_dir = versions.version_path(version)
+        collection = Chroma(persist_directory=str(version_dir))._collection
+        if quick:
+            stats = {"vector_count": collection.count(), "dimension": (export_meta(version_dir) or {}).get("dim")}
+            stats["integrity"] = check_integrity(version_dir, stats["vector_count"])
+        else:
+            stats = collect_index_stats(version_dir, collection, length_sample=max(0, length_sample))
+    except Exception as e:
+        return {"success": False, "message": f"Error: {str(e)}"}
+    finally:
+        versions.release(lease)
+
+    loaded = _loaded_rag_data(config_id)
+    memory = {"process_rss": process_rss(), "loaded": loaded is not None}
+    if loaded:
+        memory["loaded_version"] = loaded["vector_store_version"]
+        memory["store"] = store_memory(loaded["vector_store"], stats["vector_count"],
+                                       stats.get("dimension") or 0, config.hnsw_m)
+
+    return {
+        "success": True,
+        "rag_config_id": config.id,
+        "rag_config_name": config.config_name,
+        "vector_store_version": version,
+        "exports": exports_of(version_dir),
+        "memory": memory,
+        **stats
+    }
+
+
 @router.get("/test-rag")
 def test_rag(db: Session = Depends(get_db)):
     """
@@ -0,0 +1,128 @@
+"""
+Chunk Dedup
+Bỏ nội dung lặp lại trước khi embed, trong phạm vi từng document:
+
+- Page furniture: dòng ở đầu/cuối trang (header, footer, số trang) lặp lại trên nhiều trang
+- Chunks trùng hoàn toàn (sau khi chuẩn hóa khoảng trắng/chữ hoa)
+- Chunks gần trùng: MinHash trên word shingles + LSH banding, Jaccard ước lượng >= threshold
+
+Mọi hash đều deterministic (crc32, hệ số cố định) → cùng document + cùng params luôn
+cho cùng các chunks, nên chunk ids / resume theo checkpoint vẫn đúng.
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+
+# Tăng khi thuật toán thay đổi (nằm trong chunking fingerprint)
+DEDUP_VERSION = 1
+
+FURNITURE_EDGE_LINES = 3      # số dòng đầu/cuối trang được xét
+FURNITURE_MIN_PAGES = 3       # dòng phải lặp trên ít nhất ngần này trang
+FURNITURE_MIN_RATIO = 0.3     # ... và trên ít nhất tỉ lệ này của document
+
+NEAR_DUP_THRESHOLD = 0.85     # Jaccard (ước lượng bằng MinHash) để coi là gần trùng
+SHINGLE_WORDS = 3
+NUM_PERM = 64
+NUM_BANDS = 16                # 16 bands x 4 rows: candidate khi Jaccard ~>= 0.5, rồi kiểm tra lại
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"\s+")
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_line(line: str) -> str:
+    """Dòng dùng để so sánh furniture: số → #, gộp khoảng trắng, chữ thường"""
+    return _SPACES.sub(" ", _DIGITS.sub("#", line)).strip().lower()
+
+
+def _edge_lines(text: str, edge_lines: int = FURNITURE_EDGE_LINES) -> List[Tuple[int, str]]:
+    lines = text.split("\n")
+    # Trang ngắn: chỉ xét tối đa 1/3 số dòng ở mỗi đầu để không coi nội dung là header/footer
+    edge_lines = min(edge_lines, max(1, len(lines) // 3))
+    edges = set(range(min(edge_lines, len(lines)))) | set(range(max(0, len(lines) - edge_lines), len(lines)))
+    return [(i, lines[i]) for i in sorted(edges)]
+
+
+def find_page_furniture(pages: Iterable[str], edge_lines: int = FURNITURE_EDGE_LINES,
+                        min_pages: int = FURNITURE_MIN_PAGES, min_ratio: float = FURNITURE_MIN_RATIO) -> Set[str]:
+    """Các dòng (đã chuẩn hóa) ở đầu/cuối trang lặp lại trên nhiều trang của document"""
+    counts: Counter = Counter()
+    num_pages = 0
+    for text in pages:
+        num_pages += 1
+        counts.update({normalize_line(line) for _, line in _edge_lines(text, edge_lines)} - {""})
+    needed = max(min_pages, min_ratio * num_pages)
+    return {line for line, count in counts.items() if count >= needed}
+
+
+def strip_page_furniture(text: str, furniture: Set[str], edge_lines: int = FURNITURE_EDGE_LINES) -> Tuple[str, int]:
+    """Bỏ các dòng furniture ở đầu/cuối trang, trả về (text, số dòng đã bỏ)"""
+    if not furniture:
+        return text, 0
+    drop = {i for i, line in _edge_lines(text, edge_lines) if normalize_line(line) in furniture}
+    if not drop:
+        return text, 0
+    lines = text.split("\n")
+    return "\n".join(line for i, line in enumerate(lines) if i not in drop), len(drop)
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash (NUM_PERM giá trị) trên word shingles; None nếu text quá ngắn"""
+    words = _WORDS.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a*x + b) mod p: a, b < 2^31 và x < 2^32 → không tràn uint64
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+class NearDuplicateFilter:
+    """
+    Nhận chunks theo thứ tự, trả về True cho chunk trùng/gần trùng với một chunk đã giữ.
+    Chunk đầu tiên của mỗi nhóm trùng được giữ lại.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, num_bands: int = NUM_BANDS):
+        self.threshold = threshold
+        self.num_bands = num_bands
+        self._exact: Set[bytes] = set()
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._signatures: List[np.ndarray] = []
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def is_duplicate(self, text: str) -> bool:
+        normalized = _SPACES.sub(" ", text).strip().lower()
+        digest = hashlib.sha1(normalized.encode("utf-8")).digest()
+        if digest in self._exact:
+            self.exact_duplicates += 1
+            return True
+        self._exact.add(digest)
+
+        signature = minhash_signature(normalized)
+        if signature is None:
+            return False
+        bands = [(b, band.tobytes()) for b, band in enumerate(np.array_split(signature, self.num_bands))]
+        candidates = {i for band in bands for i in self._buckets.get(band, ())}
+        for i in candidates:
+            if np.mean(self._signatures[i] == signature) >= self.threshold:
+                self.near_duplicates += 1
+                return True
+
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for band in bands:
+            self._buckets.setdefault(band, []).append(index)
+        return False
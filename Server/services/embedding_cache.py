@@ -0,0 +1,175 @@
+"""
+Embedding Cache Service
+Cache embeddings trên disk, key = (embedding model, SHA-256 của chunk text),
+dùng chung cho mọi RAG configs → index lại cùng nội dung gần như không tốn gì.
+
+- Lưu trong SQLite, vector là BLOB float16 (1/2 float32, nhỏ hơn nhiều so với JSON)
+- Giới hạn dung lượng, vượt quá thì xóa theo LRU (last_access cũ nhất trước)
+"""
+
+from pathlib import Path
+from typing import List, Optional
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+EMBEDDING_CACHE_ENABLED = os.getenv("RAG_EMBEDDING_CACHE", "1") != "0"
+EMBEDDING_CACHE_PATH = os.getenv("RAG_EMBEDDING_CACHE_PATH", "embedding_cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_BYTES = int(float(os.getenv("RAG_EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+
+# SQLite giới hạn số tham số mỗi câu lệnh
+_QUERY_BATCH = 500
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Disk-backed LRU cache cho embeddings (thread-safe)"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Trả về vector (float32 list) cho mỗi text, None nếu chưa có trong cache"""
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+        now = time.time()
+
+        with self._lock:
+            for start in range(0, len(hashes), _QUERY_BATCH):
+                batch = list(set(hashes[start:start + _QUERY_BATCH]))
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self._conn.commit()
+
+        results = []
+        for h in hashes:
+            blob = found.get(h)
+            results.append(np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist() if blob else None)
+
+        hits = sum(1 for r in results if r is not None)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """Lưu embeddings (float16) rồi evict LRU nếu vượt max_bytes"""
+        now = time.time()
+        rows = [
+            (model, text_hash(t), np.asarray(v, dtype=np.float16).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            hashes = list({row[1] for row in rows})
+            replaced = 0
+            for start in range(0, len(hashes), _QUERY_BATCH):
+                batch = hashes[start:start + _QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchone()[0]
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            unique = {row[1]: len(row[2]) for row in rows}
+            self._total_bytes += sum(unique.values()) - replaced
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Xóa entries ít dùng nhất cho tới khi còn 90% max_bytes (gọi khi đang giữ lock)"""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_access LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            to_delete = []
+            for model, h, size in rows:
+                to_delete.append((model, h))
+                self._total_bytes -= size
+                if self._total_bytes <= target:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", to_delete)
+            evicted += len(to_delete)
+        print(f"[EmbeddingCache] Evicted {evicted} entries, size now {self._total_bytes / 1024 / 1024:.1f} MB")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "path": self.path,
+            "entries": entries,
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Cache dùng chung trong process (None nếu RAG_EMBEDDING_CACHE=0)"""
+    global _shared_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
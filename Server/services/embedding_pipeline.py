@@ -0,0 +1,150 @@
+"""
+Embedding Pipeline Service
+Embed chunks theo batch với số batch chạy song song có giới hạn.
+
+- batch_size và max_concurrency cấu hình được
+- Batch lỗi được retry với exponential backoff
+- Batch size tự điều chỉnh theo latency quan sát được (hướng tới target_latency mỗi batch)
+- Báo cáo tiến độ (chunks/sec) trong khi chạy
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List, Optional
+import os
+import random
+import threading
+import time
+
+
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", "2"))
+EMBED_MAX_RETRIES = int(os.getenv("RAG_EMBED_MAX_RETRIES", "3"))
+EMBED_TARGET_LATENCY_S = float(os.getenv("RAG_EMBED_TARGET_LATENCY", "2.0"))
+
+
+class BatchEmbedder:
+    """Embed list texts bằng một LangChain Embeddings (vd. OllamaEmbeddings) theo batch song song"""
+
+    def __init__(
+        self,
+        embeddings,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_concurrency: int = EMBED_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        backoff_base: float = 1.0,
+        autotune: bool = True,
+        target_latency: float = EMBED_TARGET_LATENCY_S,
+        min_batch_size: int = 1,
+        max_batch_size: int = 512,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        log_every: float = 5.0
+    ):
+        self.embeddings = embeddings
+        self.batch_size = max(min_batch_size, min(batch_size, max_batch_size))
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.autotune = autotune
+        self.target_latency = target_latency
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.progress_callback = progress_callback
+        self.log_every = log_every
+
+        self._lock = threading.Lock()
+        self.chunks_embedded = 0
+        self.batches = 0
+        self.retries = 0
+        self._started = None
+        self._last_log = 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        if not self._started:
+            return 0.0
+        elapsed = time.monotonic() - self._started
+        return self.chunks_embedded / elapsed if elapsed > 0 else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "chunks_embedded": self.chunks_embedded,
+            "batches": self.batches,
+            "retries": self.retries,
+            "batch_size": self.batch_size,
+            "chunks_per_sec": round(self.chunks_per_sec, 2)
+        }
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, giữ nguyên thứ tự. Raise nếu một batch vẫn lỗi sau max_retries."""
+        if self._started is None:
+            self._started = time.monotonic()
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        next_index = 0
+        in_flight = {}  # future -> (start, size)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            try:
+                while next_index < len(texts) or in_flight:
+                    # Batch size đọc lại mỗi lần submit để áp dụng autotune ngay
+                    while next_index < len(texts) and len(in_flight) < self.max_concurrency:
+                        batch = texts[next_index:next_index + self.batch_size]
+                        in_flight[executor.submit(self._embed_with_retry, batch)] = (next_index, len(batch))
+                        next_index += len(batch)
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start, size = in_flight.pop(future)
+                        batch_vectors, latency = future.result()
+                        vectors[start:start + size] = batch_vectors
+                        self._tune(size, latency)
+                        self._report(size)
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                raise
+
+        return vectors
+
+    def _embed_with_retry(self, batch: List[str]):
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                batch_vectors = self.embeddings.embed_documents(batch)
+                if len(batch_vectors) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(batch_vectors)}")
+                return batch_vectors, time.monotonic() - started
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_base * (2 ** attempt) * (1 + random.random() * 0.25)
+                with self._lock:
+                    self.retries += 1
+                    # Lỗi thường do batch quá lớn (timeout) → giảm batch size cho các batch sau
+                    self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+                print(f"[Embedder] Batch of {len(batch)} failed ({str(e)}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _tune(self, size: int, latency: float) -> None:
+        """Điều chỉnh batch size để latency mỗi batch gần target_latency (smoothed)"""
+        if not self.autotune or latency <= 0:
+            return
+        ideal = self.target_latency * size / latency
+        with self._lock:
+            tuned = int(0.5 * self.batch_size + 0.5 * ideal)
+            self.batch_size = max(self.min_batch_size, min(self.max_batch_size, tuned))
+
+    def _report(self, size: int) -> None:
+        with self._lock:
+            self.chunks_embedded += size
+            self.batches += 1
+            now = time.monotonic()
+            should_log = now - self._last_log >= self.log_every
+            if should_log:
+                self._last_log = now
+
+        if should_log:
+            print(f"[Embedder] {self.chunks_embedded} chunks embedded, "
+                  f"{self.chunks_per_sec:.1f} chunks/s, batch_size={self.batch_size}")
+        if self.progress_callback:
+            self.progress_callback(self.stats())
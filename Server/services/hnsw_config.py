@@ -0,0 +1,74 @@
+"""
+HNSW Config
+Tham số HNSW của Chroma collection theo từng RAG config:
+- space, M, construction_ef: cố định khi tạo collection (đổi → build collection mới,
+  vectors copy từ version cũ, không embed lại)
+- search_ef: áp dụng lúc query (chat mở store), đổi được không cần index lại
+"""
+
+from typing import Optional
+
+
+HNSW_SPACES = ("l2", "cosine", "ip")
+
+# Giá trị mặc định của Chroma (collection tạo trước đây không ghi metadata)
+HNSW_DEFAULTS = {"space": "l2", "M": 16, "construction_ef": 100, "search_ef": 10}
+
+_BUILD_KEYS = ("space", "M", "construction_ef")
+
+
+def hnsw_metadata(space: Optional[str] = None, m: Optional[int] = None,
+                  construction_ef: Optional[int] = None, search_ef: Optional[int] = None) -> dict:
+    """collection_metadata cho Chroma (None → mặc định của Chroma)"""
+    values = {"space": space, "M": m, "construction_ef": construction_ef, "search_ef": search_ef}
+    return {f"hnsw:{key}": HNSW_DEFAULTS[key] if value is None else value for key, value in values.items()}
+
+
+def hnsw_params_of(config) -> dict:
+    """Tham số HNSW của RAGConfig (dạng kwargs của hnsw_metadata)"""
+    return {
+        "space": getattr(config, "hnsw_space", None),
+        "m": getattr(config, "hnsw_m", None),
+        "construction_ef": getattr(config, "hnsw_construction_ef", None),
+        "search_ef": getattr(config, "hnsw_search_ef", None)
+    }
+
+
+def hnsw_build_matches(collection_metadata: Optional[dict], wanted: dict) -> bool:
+    """Collection đã có được build với cùng space/M/construction_ef"""
+    collection_metadata = collection_metadata or {}
+    for key in _BUILD_KEYS:
+        name = f"hnsw:{key}"
+        if collection_metadata.get(name, HNSW_DEFAULTS[key]) != wanted.get(name, HNSW_DEFAULTS[key]):
+            return False
+    return True
+
+
+def validate_hnsw_params(space: Optional[str] = None, m: Optional[int] = None,
+                         construction_ef: Optional[int] = None, search_ef: Optional[int] = None) -> Optional[str]:
+    """Thông báo lỗi nếu tham số không hợp lệ, None nếu hợp lệ"""
+    if space is not None and space not in HNSW_SPACES:
+        return f"hnsw_space must be one of: {', '.join(HNSW_SPACES)}"
+    if m is not None and not 2 <= m <= 128:
+        return "hnsw_m must be between 2 and 128"
+    for name, value in (("hnsw_construction_ef", construction_ef), ("hnsw_search_ef", search_ef)):
+        if value is not None and not 1 <= value <= 4096:
+            return f"{name} must be between 1 and 4096"
+    return None
+
+
+def apply_search_ef(collection, search_ef: Optional[int]) -> bool:
+    """
+    Đặt search_ef cho collection đã có (Chroma >= 1.0 cho phép sửa ef_search).
+    Trả về False nếu phiên bản Chroma không hỗ trợ — khi đó search_ef lúc build được dùng.
+    """
+    if search_ef is None:
+        return True
+    try:
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+        return True
+    except Exception as e:
+        if (collection.metadata or {}).get("hnsw:search_ef") == search_ef:
+            return True
+        print(f"[HNSW] Could not set search_ef={search_ef} on {collection.name}: {str(e)}")
+        return False
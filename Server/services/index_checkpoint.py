@@ -0,0 +1,111 @@
+"""
+Index Checkpoint Service
+Staging store cho indexing đang dở: lưu text đã parse của từng document và số
+chunks đã commit vào vector store → job bị gián đoạn (server restart, Ollama lỗi)
+chạy tiếp từ batch cuối cùng đã commit thay vì parse + embed lại từ đầu.
+
+Layout (mỗi vector store một thư mục staging):
+    <index_key>.pages.jsonl.gz    text từng trang (ghi bởi pdf_loader.extract_pdf_pages)
+    <index_key>.progress.json     {"committed": số chunks đầu tiên đã upsert}
+    finished.jsonl                {"key", "chunk_count"} mỗi dòng: documents đã index đủ trong
+                                  version đang build (manifest chỉ được ghi khi publish)
+
+Split là deterministic nên khi resume chỉ cần stream lại các trang, split và
+bỏ qua các chunks đã commit.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import json
+import os
+import shutil
+
+
+FINISHED_FILE = "finished.jsonl"
+
+
+class IndexCheckpoint:
+    """Checkpoint của một vector store (một thư mục staging)"""
+
+    def __init__(self, staging_dir: str):
+        self.dir = Path(staging_dir)
+
+    def pages_path(self, key: str) -> str:
+        """Nơi worker ghi text đã parse của document"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        return str(self.dir / f"{key}.pages.jsonl.gz")
+
+    def _progress_path(self, key: str) -> Path:
+        return self.dir / f"{key}.progress.json"
+
+    def keys(self) -> List[str]:
+        if not self.dir.exists():
+            return []
+        return sorted({p.name.split(".", 1)[0] for p in self.dir.iterdir() if p.name != FINISHED_FILE})
+
+    def has_pages(self, key: str) -> bool:
+        """Document đã được parse xong (file chỉ xuất hiện khi ghi xong)"""
+        return (self.dir / f"{key}.pages.jsonl.gz").exists()
+
+    def committed(self, key: str) -> int:
+        """Số chunks đầu tiên đã được upsert vào vector store"""
+        try:
+            return int(json.loads(self._progress_path(key).read_text())["committed"])
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def mark_committed(self, key: str, committed: int) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self._progress_path(key)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps({"committed": committed}))
+        os.replace(tmp, path)
+
+    def finish(self, key: str, chunk_count: Optional[int] = None) -> None:
+        """
+        Document đã index xong (hoặc bị bỏ) → xóa staging của nó.
+        chunk_count: document đã có đủ chừng này chunks trong version đang build
+        """
+        if chunk_count is not None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with open(self.dir / FINISHED_FILE, "a") as f:
+                f.write(json.dumps({"key": key, "chunk_count": chunk_count}) + "\n")
+        if not self.dir.exists():
+            return
+        for path in self.dir.glob(f"{key}.*"):
+            path.unlink(missing_ok=True)
+
+    def finished(self) -> Dict[str, int]:
+        """{index_key: chunk_count} của các documents đã index xong trong version đang build"""
+        counts = {}
+        try:
+            with open(self.dir / FINISHED_FILE) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # dòng cuối ghi dở (process bị kill)
+                    counts[record["key"]] = record["chunk_count"]
+        except OSError:
+            pass
+        return counts
+
+    def clear_finished(self) -> None:
+        """Version đang build đã publish (manifest có đủ counts) hoặc bị bỏ"""
+        (self.dir / FINISHED_FILE).unlink(missing_ok=True)
+
+    def discard_except(self, keep: Iterable[str]) -> int:
+        """Xóa staging của các documents không còn cần index"""
+        keep = set(keep)
+        removed = 0
+        for key in self.keys():
+            if key not in keep:
+                self.finish(key)
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def summary(self) -> Dict[str, int]:
+        return {key: self.committed(key) for key in self.keys()}
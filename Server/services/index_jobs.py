@@ -0,0 +1,518 @@
+"""
+Index Jobs Service
+Chạy RAG indexing (load, split, embed, store) trong background worker threads
+thay vì trên request thread.
+
+- Jobs lưu trong bảng index_job: id, trạng thái, tiến độ (pages parsed, chunks embedded)
+- Cancel: job đang chờ bị hủy ngay; job đang chạy dừng ở lần báo tiến độ tiếp theo
+- Retry: job lỗi tự chạy lại tới max_attempts, job failed/cancelled có thể retry thủ công
+- Jobs của cùng một RAG config chạy tuần tự (không ghi cùng lúc vào một vector store)
+- Sweep job build nhiều configs cùng lúc, dùng chung parse/split/embed (services/sweep_builder.py)
+- Job "running" của process đã chết được đưa lại vào hàng đợi
+- build_index.py build ngay trong process của nó (run_inline_job), job vẫn được ghi vào bảng
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import json
+import os
+import socket
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from database.connection import SessionLocal
+from models.index_job import IndexJob
+from models.rag_config import RAGConfig
+from models.document import Document
+from models.model import Model
+from services.hnsw_config import hnsw_params_of
+
+
+INDEX_WORKERS = int(os.getenv("RAG_INDEX_WORKERS", "1"))
+INDEX_MAX_ATTEMPTS = int(os.getenv("RAG_INDEX_MAX_ATTEMPTS", "2"))
+# Job "running" không cập nhật tiến độ lâu hơn ngưỡng này coi như worker đã chết
+# (chỉ dùng khi không kiểm tra được worker còn sống hay không, vd. worker ở host khác)
+INDEX_STALE_S = float(os.getenv("RAG_INDEX_STALE_S", "900"))
+
+PROGRESS_FLUSH_S = 1.0
+POLL_INTERVAL_S = 5.0
+
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled"}
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def job_to_dict(job: IndexJob) -> dict:
+    """Serialize job (parse các cột JSON)"""
+    return {
+        "id": job.id,
+        "rag_config_id": job.rag_config_id,
+        "status": job.status,
+        "document_ids": json.loads(job.document_ids or "[]"),
+        "sweep_config_ids": json.loads(job.sweep_config_ids) if job.sweep_config_ids else None,
+        "documents_total": job.documents_total,
+        "documents_done": job.documents_done,
+        "pages_parsed": job.pages_parsed,
+        "chunks_embedded": job.chunks_embedded,
+        "stage": job.stage,
+        "message": job.message,
+        "result": json.loads(job.result) if job.result else None,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "cancel_requested": job.cancel_requested,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "updated_at": job.updated_at
+    }
+
+
+def job_config_ids(job: IndexJob) -> List[int]:
+    """Các RAG configs mà job ghi vào"""
+    if job.sweep_config_ids:
+        return json.loads(job.sweep_config_ids)
+    return [job.rag_config_id]
+
+
+def active_job_for_config(db: Session, rag_config_id: int) -> Optional[IndexJob]:
+    """Job queued/running đang (hoặc sắp) ghi vào vector store của config, None nếu không có"""
+    for job in db.query(IndexJob).filter(~IndexJob.status.in_(TERMINAL_STATUSES)).all():
+        if rag_config_id in job_config_ids(job):
+            return job
+    return None
+
+
+def enqueue_job(db: Session, rag_config_id: int, document_ids: List[int],
+                max_attempts: int = INDEX_MAX_ATTEMPTS,
+                sweep_config_ids: Optional[List[int]] = None) -> IndexJob:
+    """Tạo job mới ở trạng thái queued và đánh thức workers (sweep_config_ids: sweep build)"""
+    job = IndexJob(
+        rag_config_id=rag_config_id,
+        status="queued",
+        document_ids=json.dumps(list(document_ids)),
+        sweep_config_ids=json.dumps(list(sweep_config_ids)) if sweep_config_ids else None,
+        documents_total=len(document_ids),
+        max_attempts=max(1, max_attempts)
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _wake.set()
+    return job
+
+
+def request_cancel(db: Session, job: IndexJob) -> IndexJob:
+    """Hủy job: queued → cancelled ngay, running → đánh dấu cancel_requested"""
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.message = "Cancelled before start"
+        job.finished_at = datetime.utcnow()
+    elif job.status == "running":
+        job.cancel_requested = True
+        _cancelled_ids.add(job.id)
+    else:
+        raise ValueError(f"Job is already {job.status}")
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def retry_job(db: Session, job: IndexJob) -> IndexJob:
+    """Đưa job failed/cancelled trở lại hàng đợi (reset tiến độ)"""
+    if job.status not in ("failed", "cancelled"):
+        raise ValueError(f"Only failed or cancelled jobs can be retried (job is {job.status})")
+    job.status = "queued"
+    job.cancel_requested = False
+    job.attempts = 0
+    job.documents_done = 0
+    job.pages_parsed = 0
+    job.chunks_embedded = 0
+    job.stage = None
+    job.message = None
+    job.result = None
+    job.started_at = None
+    job.finished_at = None
+    db.commit()
+    db.refresh(job)
+    _cancelled_ids.discard(job.id)
+    _wake.set()
+    return job
+
+
+class _ProgressTracker:
+    """progress_callback cho RAGProcessor: ghi tiến độ vào DB (throttled) và kiểm tra cancel"""
+
+    def __init__(self, db: Session, job_id: int, cancelled_exc):
+        self.db = db
+        self.job_id = job_id
+        self.cancelled_exc = cancelled_exc
+        self.latest = {}
+        self._last_flush = 0.0
+
+    def __call__(self, progress: dict) -> None:
+        self.latest = progress
+        if self.job_id in _cancelled_ids:
+            raise self.cancelled_exc(f"Job {self.job_id} cancelled")
+
+        now = time.monotonic()
+        if now - self._last_flush < PROGRESS_FLUSH_S and progress.get("stage") != "done":
+            return
+        self._last_flush = now
+        self.flush()
+
+        # Cancel có thể được gửi tới một process khác (nhiều uvicorn workers);
+        # job bị xóa (RAG config bị xóa) cũng coi như cancel
+        cancel_requested = self.db.query(IndexJob.cancel_requested).filter(IndexJob.id == self.job_id).scalar()
+        if cancel_requested is None or cancel_requested:
+            raise self.cancelled_exc(f"Job {self.job_id} cancelled")
+
+    def flush(self) -> None:
+        progress = self.latest
+        self.db.query(IndexJob).filter(IndexJob.id == self.job_id).update({
+            "stage": progress.get("stage"),
+            "documents_total": progress.get("documents_total", 0),
+            "documents_done": progress.get("documents_done", 0),
+            "pages_parsed": progress.get("pages_parsed", 0),
+            "chunks_embedded": progress.get("chunks_embedded", 0),
+            "updated_at": datetime.utcnow()
+        }, synchronize_session=False)
+        self.db.commit()
+
+
+class IndexWorkerPool:
+    """Worker threads lấy jobs từ bảng index_job và chạy RAGProcessor"""
+
+    def __init__(self, num_workers: int = INDEX_WORKERS):
+        self.num_workers = max(1, num_workers)
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._claim_lock = threading.Lock()
+        # job_id → config ids của các jobs đang chạy trong process này
+        self._active_configs: Dict[int, List[int]] = {}
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._run, name=f"index-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[IndexJobs] Started {self.num_workers} index workers ({WORKER_ID})")
+        _wake.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        _wake.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            job_id = None
+            _wake.clear()
+            try:
+                job_id = self._claim_next()
+            except Exception as e:
+                print(f"[IndexJobs] Error claiming job: {str(e)}")
+
+            if job_id is None:
+                _wake.wait(timeout=POLL_INTERVAL_S)
+                continue
+
+            try:
+                self._execute(job_id)
+            except Exception as e:
+                # Lỗi DB khi ghi kết quả...: giữ thread sống để hàng đợi không dừng hẳn
+                print(f"[IndexJobs] Error executing job {job_id}: {str(e)}")
+            finally:
+                _cancelled_ids.discard(job_id)
+
+    def _claim_next(self) -> Optional[int]:
+        """Chọn job queued cũ nhất mà các configs của nó chưa có job đang chạy, chuyển sang running"""
+        with self._claim_lock:
+            db = SessionLocal()
+            try:
+                self._recover_stale(db)
+
+                running_configs = {config_id for ids in self._active_configs.values() for config_id in ids}
+                for running in db.query(IndexJob).filter(IndexJob.status == "running").all():
+                    running_configs.update(job_config_ids(running))
+                query = db.query(IndexJob).filter(IndexJob.status == "queued")
+                if running_configs:
+                    query = query.filter(~IndexJob.rag_config_id.in_(running_configs))
+                job = next(
+                    (queued for queued in query.order_by(IndexJob.id).all()
+                     if running_configs.isdisjoint(job_config_ids(queued))),
+                    None
+                )
+                if job is None:
+                    return None
+
+                # Update có điều kiện → an toàn khi nhiều processes cùng poll
+                claimed = db.query(IndexJob).filter(
+                    IndexJob.id == job.id, IndexJob.status == "queued"
+                ).update({
+                    "status": "running",
+                    "worker_id": WORKER_ID,
+                    "attempts": IndexJob.attempts + 1,
+                    "started_at": datetime.utcnow(),
+                    "updated_at": datetime.utcnow(),
+                    "message": None
+                }, synchronize_session=False)
+                db.commit()
+                if not claimed:
+                    return None
+                self._active_configs[job.id] = job_config_ids(job)
+                return job.id
+            finally:
+                db.close()
+
+    def _recover_stale(self, db: Session) -> None:
+        """Đưa lại vào hàng đợi các jobs running của workers đã chết"""
+        stale_before = datetime.utcnow() - timedelta(seconds=INDEX_STALE_S)
+        for job in db.query(IndexJob).filter(IndexJob.status == "running").all():
+            if job.worker_id == WORKER_ID:
+                continue
+            # Worker còn sống thì không requeue dù lâu không có tiến độ (copytree, export... dài)
+            alive = _worker_alive(job.worker_id)
+            if alive is False or (alive is None and job.updated_at < stale_before):
+                print(f"[IndexJobs] Requeueing job {job.id} abandoned by worker {job.worker_id}")
+                job.status = "queued"
+                job.worker_id = None
+                job.message = "Requeued after worker stopped"
+        db.commit()
+
+    def _execute(self, job_id: int) -> None:
+        from services.rag_processor import RAGProcessor, IndexingCancelled
+
+        db = None
+        try:
+            db = SessionLocal()
+            tracker = _ProgressTracker(db, job_id, IndexingCancelled)
+            job = db.query(IndexJob).filter(IndexJob.id == job_id).first()
+            if job is None:
+                # Config bị xóa giữa lúc claim và lúc chạy (job bị xóa theo CASCADE)
+                print(f"[IndexJobs] Job {job_id} no longer exists, skipping")
+                return
+
+            if job.sweep_config_ids:
+                result = self._execute_sweep(db, job, tracker)
+                if not result["success"]:
+                    raise RuntimeError(result["message"])
+                tracker.latest = {**tracker.latest, "stage": "done"}
+                tracker.flush()
+                self._finish(db, job_id, "succeeded", result["message"], result)
+                return
+
+            result = _build_config(db, job, RAGProcessor(), tracker)
+            tracker.latest = {**tracker.latest, "stage": "done"}
+            tracker.flush()
+            self._finish(db, job_id, "succeeded", result["message"], result)
+
+        except IndexingCancelled:
+            db.rollback()
+            tracker.flush()
+            self._finish(db, job_id, "cancelled", "Cancelled by user")
+
+        except Exception as e:
+            print(f"[IndexJobs] Job {job_id} failed: {str(e)}")
+            if db is None:
+                return
+            db.rollback()
+            job = db.query(IndexJob).filter(IndexJob.id == job_id).first()
+            if job is None:
+                pass
+            elif job.attempts < job.max_attempts and not job.cancel_requested:
+                # Indexing là incremental nên chạy lại chỉ làm phần còn thiếu
+                job.status = "queued"
+                job.worker_id = None
+                job.message = f"Attempt {job.attempts} failed: {str(e)}; retrying"
+                db.commit()
+            else:
+                self._finish(db, job_id, "failed", str(e))
+
+        finally:
+            self._active_configs.pop(job_id, None)
+            if db is not None:
+                db.close()
+            _wake.set()
+
+    def _execute_sweep(self, db: Session, job: IndexJob, tracker: _ProgressTracker) -> dict:
+        """Sweep job: build mọi configs trên cùng documents, dùng chung parse/split/embed"""
+        from services.rag_processor import RAGProcessor
+        from services.sweep_builder import run_sweep
+
+        config_ids = job_config_ids(job)
+        configs = db.query(RAGConfig).filter(RAGConfig.id.in_(config_ids)).all()
+        # Giữ thứ tự của request (config đầu tiên mỗi nhóm chunking là config được embed)
+        configs.sort(key=lambda c: config_ids.index(c.id))
+        if not configs:
+            raise ValueError("RAG configurations not found")
+
+        model_ids = {config.embedding_model_id for config in configs}
+        model_names = {
+            model.id: model.model_name for model in db.query(Model).filter(Model.id.in_(model_ids)).all()
+        }
+        missing = [config.config_name for config in configs if config.embedding_model_id not in model_names]
+        if missing:
+            raise ValueError(f"Embedding model not found for: {', '.join(missing)}")
+
+        document_ids = json.loads(job.document_ids)
+        documents = db.query(Document).filter(Document.id.in_(document_ids)).all()
+        if not documents:
+            raise ValueError("No documents found for job")
+
+        print(f"[IndexJobs] Job {job.id}: sweep build of {len(configs)} configs over {len(documents)} documents")
+        return run_sweep(
+            RAGProcessor(),
+            configs,
+            model_names,
+            document_file_paths=[doc.file_path for doc in documents],
+            document_ids=[doc.id for doc in documents],
+            progress_callback=tracker
+        )
+
+    def _finish(self, db: Session, job_id: int, status: str, message: str, result: Optional[dict] = None) -> None:
+        _finish_job(db, job_id, status, message, result)
+
+
+def _finish_job(db: Session, job_id: int, status: str, message: str, result: Optional[dict] = None) -> None:
+    job = db.query(IndexJob).filter(IndexJob.id == job_id).first()
+    if job is None:
+        return
+    job.status = status
+    job.message = message
+    job.result = json.dumps(result, default=str) if result is not None else None
+    job.finished_at = datetime.utcnow()
+    db.commit()
+    print(f"[IndexJobs] Job {job_id} {status}: {message}")
+
+
+def _build_config(db: Session, job: IndexJob, processor, progress_callback) -> dict:
+    """Build index của một config cho job (không phải sweep), raise nếu build lỗi"""
+    config = db.query(RAGConfig).filter(RAGConfig.id == job.rag_config_id).first()
+    if not config:
+        raise ValueError("RAG configuration not found")
+
+    embedding_model = db.query(Model).filter(Model.id == config.embedding_model_id).first()
+    if not embedding_model:
+        raise ValueError("Embedding model not found")
+
+    document_ids = json.loads(job.document_ids)
+    documents = db.query(Document).filter(Document.id.in_(document_ids)).all()
+    if not documents:
+        raise ValueError("No documents found for job")
+
+    print(f"[IndexJobs] Job {job.id}: indexing {len(documents)} documents into {config.config_name}")
+    result = processor.process_rag_config(
+        config_name=config.config_name,
+        embedding_model_name=embedding_model.model_name,
+        document_file_paths=[doc.file_path for doc in documents],
+        chunk_size=config.chunk_size,
+        chunk_overlap=config.chunk_overlap,
+        document_ids=[doc.id for doc in documents],
+        progress_callback=progress_callback,
+        vector_storage=config.vector_storage or "float32",
+        vector_backend=config.vector_backend or "chroma",
+        hnsw_params=hnsw_params_of(config),
+        dedupe_chunks=bool(config.dedupe_chunks),
+        text_splitter=config.text_splitter or "recursive",
+        token_encoding=config.token_encoding
+    )
+    if not result["success"]:
+        raise RuntimeError(result["message"])
+    return result
+
+
+def run_inline_job(rag_config_id: int, document_ids: List[int], processor,
+                   progress_callback: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Build index của config ngay trong process/thread hiện tại (build_index.py), không qua hàng đợi.
+    Job được ghi ở trạng thái running (worker_id của process này) nên workers của API bỏ qua
+    config trong lúc build, tiến độ/cancel hiển thị như job thường.
+
+    Returns:
+        kết quả của process_rag_config (success False nếu lỗi/bị hủy) + job_id
+    """
+    from services.rag_processor import IndexingCancelled
+
+    db = SessionLocal()
+    try:
+        job = IndexJob(
+            rag_config_id=rag_config_id,
+            status="running",
+            document_ids=json.dumps(document_ids),
+            documents_total=len(document_ids),
+            attempts=1,
+            max_attempts=1,
+            worker_id=WORKER_ID,
+            started_at=datetime.utcnow(),
+            message="Started by build_index.py"
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        tracker = _ProgressTracker(db, job.id, IndexingCancelled)
+
+        def report(progress: dict) -> None:
+            if progress_callback:
+                progress_callback(progress)
+            tracker(progress)
+
+        try:
+            result = _build_config(db, job, processor, report)
+            tracker.latest = {**tracker.latest, "stage": "done"}
+            tracker.flush()
+            _finish_job(db, job.id, "succeeded", result["message"], result)
+        except IndexingCancelled:
+            db.rollback()
+            _finish_job(db, job.id, "cancelled", "Cancelled by user")
+            result = {"success": False, "message": "Cancelled by user"}
+        except Exception as e:
+            db.rollback()
+            _finish_job(db, job.id, "failed", str(e))
+            result = {"success": False, "message": str(e)}
+        return {**result, "job_id": job.id}
+    finally:
+        db.close()
+
+
+def _worker_alive(worker_id: Optional[str]) -> Optional[bool]:
+    """True/False nếu worker chạy trên máy này, None nếu không xác định được"""
+    if not worker_id or ":" not in worker_id:
+        return None
+    host, _, pid = worker_id.rpartition(":")
+    if host != socket.gethostname():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return None
+    return True
+
+
+_wake = threading.Event()
+_cancelled_ids = set()
+_pool: Optional[IndexWorkerPool] = None
+
+
+def start_workers(num_workers: int = INDEX_WORKERS) -> IndexWorkerPool:
+    """Khởi động worker pool của process (gọi lúc startup)"""
+    global _pool
+    if _pool is None:
+        _pool = IndexWorkerPool(num_workers)
+    _pool.start()
+    return _pool
+
+
+def stop_workers() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
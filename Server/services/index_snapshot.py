@@ -0,0 +1,413 @@
+"""
+Index Snapshot
+Đóng gói version hiện tại của một vector store thành một file .tar.gz để build index trên
+máy khác rồi import vào server mà không phải embed lại:
+
+    snapshot.json   format, config params, embedding model, chunking fingerprint, HNSW,
+                    số vectors/dimension, documents (doc_hash → chunks) và sha256 từng file
+    vectors.npy     float32 (N, dim), cùng thứ tự với chunks.jsonl
+    chunks.jsonl    {"id", "document", "metadata"} mỗi dòng
+    BUILD.json      build stats + chunk manifest của version gốc (nếu có)
+
+Không copy thư mục Chroma (sqlite + HNSW phụ thuộc version của chromadb): import tạo
+collection mới từ vectors, build lại index phục vụ search rồi publish như một lần build.
+Documents được map sang database đích theo hash nội dung file.
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import shutil
+import socket
+import tarfile
+import uuid
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models.document import Document
+from models.model import Model
+from models.rag_config import RAGConfig
+from models.rag_document import RagDocument
+from services.hnsw_config import hnsw_metadata, hnsw_params_of
+from services.index_jobs import active_job_for_config
+from services.index_stats import read_build_info, write_build_info, BUILD_INFO_FILE
+from services.page_cache import compute_file_hash
+from services.vector_backends import export_indexes
+from services.vector_store_versions import VectorStoreVersions, CHROMA_BASE_DIR, store_root
+
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILE = "snapshot.json"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.jsonl"
+
+SNAPSHOT_DIR = CHROMA_BASE_DIR / "snapshots"
+
+# Params của RAG config được đóng gói (id/embedding_model_id/llm_id phụ thuộc database → theo tên)
+CONFIG_FIELDS = ("chunk_size", "chunk_overlap", "text_splitter", "token_encoding", "search_type", "k_value",
+                 "prompt_template", "vector_storage", "vector_backend", "hnsw_space", "hnsw_m",
+                 "hnsw_construction_ef", "hnsw_search_ef", "dedupe_chunks")
+
+_PAGE_SIZE = 5000
+# Chroma giới hạn số records mỗi lần add
+_ADD_BATCH_SIZE = 256
+
+
+class SnapshotError(Exception):
+    """Snapshot không hợp lệ hoặc không import được vào database này"""
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _open_collection(version_dir, collection_metadata: Optional[dict] = None):
+    from langchain_chroma import Chroma
+
+    return Chroma(persist_directory=str(version_dir), collection_metadata=collection_metadata)._collection
+
+
+def _work_dir() -> Path:
+    path = SNAPSHOT_DIR / f"work-{uuid.uuid4().hex}"
+    path.mkdir(parents=True)
+    return path
+
+
+# ========================= EXPORT =========================
+
+def export_snapshot(db: Session, config: RAGConfig, out_path, compresslevel: int = 6) -> dict:
+    """
+    Ghi snapshot của version hiện tại của config vào out_path (.tar.gz).
+
+    Returns:
+        manifest (nội dung snapshot.json) + path, archive_bytes
+    """
+    versions = VectorStoreVersions(store_root(config.config_name))
+    version, lease = versions.acquire_current()
+    if version is None:
+        raise SnapshotError(f"Vector store of '{config.config_name}' has not been built")
+
+    work = _work_dir()
+    tmp = None
+    try:
+        version_dir = versions.version_path(version)
+        collection = _open_collection(version_dir)
+        count = collection.count()
+        if count == 0:
+            raise SnapshotError(f"Vector store of '{config.config_name}' is empty")
+
+        # Chunks + vectors theo trang, vectors ghi thẳng vào .npy (không giữ cả index trong RAM)
+        vectors = None
+        documents: Dict[str, dict] = {}
+        written = 0
+        with open(work / CHUNKS_FILE, "w", encoding="utf-8") as chunks_file:
+            while written < count:
+                page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                      limit=_PAGE_SIZE, offset=written)
+                ids = page.get("ids") or []
+                if not ids:
+                    break
+                embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+                if vectors is None:
+                    vectors = np.lib.format.open_memmap(work / VECTORS_FILE, mode="w+", dtype=np.float32,
+                                                        shape=(count, embeddings.shape[1]))
+                vectors[written:written + len(ids)] = embeddings
+                for chunk_id_, text, metadata in zip(ids, page["documents"], page["metadatas"]):
+                    metadata = metadata or {}
+                    chunks_file.write(json.dumps({"id": chunk_id_, "document": text, "metadata": metadata},
+                                                 ensure_ascii=False) + "\n")
+                    doc_hash = metadata.get("doc_hash", "")
+                    entry = documents.setdefault(doc_hash, {
+                        "doc_hash": doc_hash,
+                        "document_id": metadata.get("document_id"),
+                        "source": Path(metadata["source"]).name if metadata.get("source") else None,
+                        "chunks": 0
+                    })
+                    entry["chunks"] += 1
+                written += len(ids)
+        if written != count:
+            raise SnapshotError(f"Store changed while exporting ({written}/{count} chunks read)")
+        dimension = vectors.shape[1]
+        vectors.flush()
+        del vectors
+
+        # Tên file gốc để map documents ở server đích (file_name của upload, không phải path trên disk)
+        document_ids = [d["document_id"] for d in documents.values() if d["document_id"] is not None]
+        file_names = dict(db.query(Document.id, Document.file_name).filter(Document.id.in_(document_ids)).all()) \
+            if document_ids else {}
+        for entry in documents.values():
+            entry["file_name"] = file_names.get(entry["document_id"], entry["source"])
+
+        build_info = read_build_info(version_dir)
+        if build_info:
+            shutil.copy2(Path(version_dir) / BUILD_INFO_FILE, work / BUILD_INFO_FILE)
+
+        embedding_model = db.query(Model).filter(Model.id == config.embedding_model_id).first()
+        llm = db.query(Model).filter(Model.id == config.llm_id).first()
+        files = [CHUNKS_FILE, VECTORS_FILE] + ([BUILD_INFO_FILE] if build_info else [])
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "created_at": datetime.utcnow().isoformat(),
+            "source_host": socket.gethostname(),
+            "config_name": config.config_name,
+            "source_version": version,
+            "config": {field: getattr(config, field) for field in CONFIG_FIELDS},
+            "embedding_model": {"model_name": embedding_model.model_name, "provider": embedding_model.provider}
+            if embedding_model else None,
+            "llm": {"model_name": llm.model_name, "provider": llm.provider} if llm else None,
+            "chunking": ((build_info or {}).get("stats") or {}).get("chunking"),
+            "collection_metadata": collection.metadata or {},
+            "vector_count": count,
+            "dimension": dimension,
+            "documents": sorted(documents.values(), key=lambda d: d["doc_hash"]),
+            "files": {name: {"sha256": _sha256(work / name), "bytes": (work / name).stat().st_size}
+                      for name in files}
+        }
+        (work / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2, default=str))
+
+        # snapshot.json đầu tiên → đọc được manifest mà không phải giải nén cả archive
+        out_path = Path(out_path)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out_path.with_name(f"{out_path.name}.{uuid.uuid4().hex}.tmp")
+        with tarfile.open(tmp, "w:gz", compresslevel=compresslevel) as archive:
+            for name in [MANIFEST_FILE] + files:
+                archive.add(work / name, arcname=name)
+        os.replace(tmp, out_path)
+    finally:
+        versions.release(lease)
+        shutil.rmtree(work, ignore_errors=True)
+        if tmp:
+            tmp.unlink(missing_ok=True)
+
+    print(f"[Snapshot] Exported '{config.config_name}' version {version}: {count} chunks, dim {dimension} "
+          f"→ {out_path} ({out_path.stat().st_size / 1024 / 1024:.1f} MB)")
+    return {**manifest, "path": str(out_path), "archive_bytes": out_path.stat().st_size}
+
+
+# ========================= IMPORT =========================
+
+def read_snapshot_manifest(archive_path) -> dict:
+    """snapshot.json của archive (không giải nén phần còn lại)"""
+    try:
+        with tarfile.open(archive_path, "r:gz") as archive:
+            member = archive.next()
+            if member is None or member.name != MANIFEST_FILE:
+                raise SnapshotError(f"Not an index snapshot: first member must be {MANIFEST_FILE}")
+            manifest = json.loads(archive.extractfile(member).read())
+    except (tarfile.TarError, OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot read snapshot: {str(e)}")
+    if manifest.get("format", 0) > SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Snapshot format {manifest.get('format')} is newer than supported ({SNAPSHOT_FORMAT})")
+    return manifest
+
+
+def _extract_verified(archive_path, manifest: dict, work: Path) -> None:
+    """Giải nén đúng các files trong manifest (bỏ qua mọi member khác) và kiểm tra sha256"""
+    expected = manifest.get("files") or {}
+    if CHUNKS_FILE not in expected or VECTORS_FILE not in expected:
+        raise SnapshotError("Snapshot manifest does not list chunks and vectors")
+    found = set()
+    with tarfile.open(archive_path, "r:gz") as archive:
+        for member in archive:
+            if member.name not in expected or not member.isfile():
+                continue
+            digest = hashlib.sha256()
+            with archive.extractfile(member) as src, open(work / member.name, "wb") as dst:
+                for block in iter(lambda: src.read(1024 * 1024), b""):
+                    digest.update(block)
+                    dst.write(block)
+            if digest.hexdigest() != expected[member.name]["sha256"]:
+                raise SnapshotError(f"Checksum mismatch for {member.name}, archive is corrupted")
+            found.add(member.name)
+    missing = set(expected) - found
+    if missing:
+        raise SnapshotError(f"Snapshot is missing files: {', '.join(sorted(missing))}")
+
+
+def _resolve_model(db: Session, info: Optional[dict], model_type: str) -> Model:
+    if not info:
+        raise SnapshotError(f"Snapshot does not record its {model_type} model")
+    model = db.query(Model).filter(Model.model_name == info["model_name"], Model.model_type == model_type).first()
+    if not model:
+        raise SnapshotError(f"{model_type.capitalize()} model '{info['model_name']}' does not exist on this server, "
+                            f"add it first")
+    return model
+
+
+def _map_documents(db: Session, manifest: dict) -> Dict[str, Document]:
+    """
+    doc_hash của snapshot → Document cùng nội dung trong database này (theo content_hash;
+    documents chưa có content_hash: so tên file trước, rồi hash file)
+    """
+    wanted = {d["doc_hash"]: d for d in manifest.get("documents") or [] if d.get("doc_hash")}
+    mapped: Dict[str, Document] = {}
+    if wanted:
+        for document in db.query(Document).filter(Document.content_hash.in_(list(wanted))).all():
+            mapped.setdefault(document.content_hash, document)
+    names = {d.get("file_name") for h, d in wanted.items() if d.get("file_name") and h not in mapped}
+    candidates = db.query(Document).filter(
+        Document.file_name.in_(names), Document.content_hash.is_(None)
+    ).all() if names else []
+    for document in candidates:
+        try:
+            doc_hash = compute_file_hash(document.file_path)
+        except OSError:
+            continue
+        if doc_hash in wanted and doc_hash not in mapped:
+            mapped[doc_hash] = document
+    return mapped
+
+
+def import_snapshot(db: Session, archive_path, config_name: Optional[str] = None, replace: bool = False) -> dict:
+    """
+    Import snapshot thành version mới (published) của config_name (mặc định: tên trong snapshot).
+    Config chưa có → tạo từ params trong snapshot; đã có → cần replace=True (params được ghi đè).
+    Embedding model và LLM phải tồn tại (theo tên) trên server này.
+
+    Returns:
+        dict với keys: success, message, rag_config_id, config_name, vector_store_version,
+        num_chunks, documents_mapped, documents_unmapped
+    """
+    manifest = read_snapshot_manifest(archive_path)
+    config_name = config_name or manifest["config_name"]
+    embedding_model = _resolve_model(db, manifest.get("embedding_model"), "embedding")
+    llm = _resolve_model(db, manifest.get("llm"), "llm")
+
+    config = db.query(RAGConfig).filter(RAGConfig.config_name == config_name).first()
+    if config and not replace:
+        raise SnapshotError(f"RAG config '{config_name}' already exists (use replace to overwrite its index)")
+    job = active_job_for_config(db, config.id) if config else None
+    if job:
+        raise SnapshotError(f"Index job {job.id} is {job.status} for '{config_name}', try again later")
+    versions = VectorStoreVersions(store_root(config_name))
+    if versions.building_version():
+        raise SnapshotError(f"Vector store of '{config_name}' is being built, try again later")
+
+    work = _work_dir()
+    build_version = None
+    try:
+        _extract_verified(archive_path, manifest, work)
+        vectors = np.load(work / VECTORS_FILE, mmap_mode="r")
+        if vectors.shape != (manifest["vector_count"], manifest["dimension"]):
+            raise SnapshotError(f"Vectors have shape {vectors.shape}, manifest says "
+                                f"({manifest['vector_count']}, {manifest['dimension']})")
+
+        params = dict(manifest["config"])
+        if config is None:
+            config = RAGConfig(config_name=config_name)
+            db.add(config)
+        for field, value in params.items():
+            setattr(config, field, value)
+        config.embedding_model_id = embedding_model.id
+        config.llm_id = llm.id
+        db.flush()
+
+        mapped = _map_documents(db, manifest)
+        collection_metadata = hnsw_metadata(**hnsw_params_of(config))
+
+        build_version = versions.begin_build(copy_current=False)
+        version_dir = versions.version_path(build_version)
+        collection = _open_collection(version_dir, collection_metadata)
+
+        chunk_counts: Dict[str, int] = {}
+        sources: Dict[str, dict] = {}
+        batch = {"ids": [], "documents": [], "metadatas": []}
+        start = 0
+
+        def flush_batch():
+            nonlocal start
+            if not batch["ids"]:
+                return
+            end = start + len(batch["ids"])
+            collection.add(embeddings=vectors[start:end].tolist(), **batch)
+            start = end
+            for values in batch.values():
+                values.clear()
+
+        with open(work / CHUNKS_FILE, encoding="utf-8") as chunks_file:
+            for line in chunks_file:
+                chunk = json.loads(line)
+                metadata = chunk["metadata"]
+                document = mapped.get(metadata.get("doc_hash"))
+                if document:
+                    metadata["document_id"] = document.id
+                    metadata["source"] = document.file_path
+                else:
+                    # document_id của server nguồn không có nghĩa ở đây
+                    metadata.pop("document_id", None)
+                key = metadata.get("index_key", "")
+                chunk_counts[key] = chunk_counts.get(key, 0) + 1
+                sources[key] = {"document_id": document.id if document else None, "source": metadata.get("source")}
+                batch["ids"].append(chunk["id"])
+                batch["documents"].append(chunk["document"])
+                batch["metadatas"].append(metadata)
+                if len(batch["ids"]) >= _ADD_BATCH_SIZE:
+                    flush_batch()
+            flush_batch()
+        if start != manifest["vector_count"]:
+            raise SnapshotError(f"chunks.jsonl has {start} chunks, manifest says {manifest['vector_count']}")
+
+        export_indexes(version_dir, collection, config.vector_storage or "float32", config.vector_backend or "chroma")
+
+        # Manifest cho integrity check: số chunks thực tế của từng index_key
+        source_build = {}
+        if (work / BUILD_INFO_FILE).exists():
+            source_build = json.loads((work / BUILD_INFO_FILE).read_text())
+        build_manifest = {key: {**sources[key], "chunk_count": count} for key, count in chunk_counts.items()}
+        for key, entry in (source_build.get("manifest") or {}).items():
+            if entry.get("error") and key not in build_manifest:
+                build_manifest[key] = entry
+        stats = {
+            **(source_build.get("stats") or {}),
+            "version": build_version,
+            "imported_at": datetime.utcnow().isoformat(),
+            "imported_from": {"host": manifest.get("source_host"), "config_name": manifest["config_name"],
+                              "version": manifest.get("source_version"), "created_at": manifest.get("created_at")},
+            "vector_storage": config.vector_storage,
+            "vector_backend": config.vector_backend,
+            "hnsw": collection_metadata
+        }
+        write_build_info(version_dir, stats, build_manifest)
+
+        for document in {d.id: d for d in mapped.values()}.values():
+            linked = db.query(RagDocument).filter(
+                RagDocument.rag_config_id == config.id, RagDocument.document_id == document.id
+            ).first()
+            if not linked:
+                db.add(RagDocument(rag_config_id=config.id, document_id=document.id))
+        db.commit()
+        db.refresh(config)
+
+        versions.publish(build_version)
+        versions.gc()
+    except Exception:
+        db.rollback()
+        if build_version:
+            versions.abandon_build()
+        raise
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    unmapped = [d.get("file_name") or d["doc_hash"] for d in manifest.get("documents") or []
+                if d.get("doc_hash") not in mapped]
+    print(f"[Snapshot] Imported {manifest['vector_count']} chunks into '{config_name}' version {build_version} "
+          f"({len(mapped)} documents mapped, {len(unmapped)} not found on this server)")
+    return {
+        "success": True,
+        "message": f"Imported snapshot of '{manifest['config_name']}' into '{config_name}'",
+        "rag_config_id": config.id,
+        "config_name": config_name,
+        "vector_store_version": build_version,
+        "num_chunks": manifest["vector_count"],
+        "dimension": manifest["dimension"],
+        "documents_mapped": len(mapped),
+        "documents_unmapped": unmapped
+    }
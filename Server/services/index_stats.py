@@ -0,0 +1,283 @@
+"""
+Index Stats
+Thống kê và kiểm tra sức khỏe của một version vector store:
+
+- BUILD.json (ghi lúc build, trong thư mục version): thời gian build, throughput embed
+  và manifest chunks mong đợi {index_key: {document_id, source, chunk_count | error}}
+- Integrity nhanh: số vectors của Chroma (và index nén / numpy) so với tổng chunk_count
+  của manifest → phát hiện build thiếu chunks hoặc document lỗi bị bỏ qua
+- Stats chi tiết: số chunks từng document, phân bố độ dài chunk, dimension, dung lượng
+  disk và memory ước lượng của store đang load
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import json
+import os
+import uuid
+
+import numpy as np
+
+from services.numpy_index import INDEX_DIR_NAME as NUMPY_DIR_NAME
+from services.quantized_index import INDEX_DIR_NAME as QUANTIZED_DIR_NAME
+
+
+BUILD_INFO_FILE = "BUILD.json"
+
+# Số chunks tối đa đọc text để tính phân bố độ dài (metadata luôn đọc hết)
+LENGTH_SAMPLE = 20000
+_PAGE_SIZE = 5000
+
+
+def write_build_info(version_dir, stats: dict, manifest: Dict[str, dict]) -> None:
+    """Ghi BUILD.json (tmp + rename)"""
+    path = Path(version_dir) / BUILD_INFO_FILE
+    tmp = path.with_name(f"{BUILD_INFO_FILE}.{uuid.uuid4().hex}.tmp")
+    tmp.write_text(json.dumps({"stats": stats, "manifest": manifest}, default=str))
+    os.replace(tmp, path)
+
+
+def read_build_info(version_dir) -> Optional[dict]:
+    """BUILD.json của version, None nếu version được build trước khi có file này"""
+    try:
+        return json.loads((Path(version_dir) / BUILD_INFO_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def manifest_chunk_counts(version_dir) -> Dict[str, int]:
+    """
+    {index_key: chunk_count} của các documents đã index xong trong version (theo manifest);
+    số chunks mong đợi không nằm trong metadata chunks (chỉ biết khi split xong document)
+    """
+    manifest = (read_build_info(version_dir) or {}).get("manifest") or {}
+    return {
+        key: entry["chunk_count"] for key, entry in manifest.items()
+        if not entry.get("error") and entry.get("chunk_count") is not None
+    }
+
+
+def manifest_references(entry: dict) -> List[dict]:
+    """
+    Documents dùng chunks của một manifest entry: document gắn trong metadata của chunks
+    trước, sau đó các documents trùng nội dung (cùng index_key, chỉ index một lần)
+    """
+    primary = {"document_id": entry.get("document_id"), "source": entry.get("source")}
+    return [primary] + list(entry.get("duplicates") or [])
+
+
+def release_references(version_dir, document_ids: Iterable[int],
+                       sources: Iterable[str] = ()) -> Tuple[Optional[Set[str]], Dict[str, dict]]:
+    """
+    Bỏ tham chiếu của documents bị xóa khỏi manifest:
+    - entry không còn document nào dùng → bỏ khỏi manifest, key nằm trong tập trả về (xóa chunks)
+    - entry còn documents trùng nội dung → giữ chunks, document còn lại đầu tiên thành document
+      chính; trả về {key: entry mới} cho các entries đổi document chính (cập nhật metadata chunks)
+
+    Returns:
+        (keys cần xóa chunks, entries đổi document chính); keys là None nếu version không có manifest
+    """
+    info = read_build_info(version_dir)
+    if not info:
+        return None, {}
+    document_ids, sources = set(document_ids), set(sources)
+    manifest = info.get("manifest") or {}
+    released, reassigned, changed = set(), {}, False
+    for key, entry in list(manifest.items()):
+        references = manifest_references(entry)
+        remaining = [
+            ref for ref in references
+            if ref.get("document_id") not in document_ids and ref.get("source") not in sources
+        ]
+        if len(remaining) == len(references):
+            continue
+        changed = True
+        if not remaining:
+            released.add(key)
+            del manifest[key]
+            continue
+        entry = {**entry, **remaining[0], "duplicates": remaining[1:]}
+        if not entry["duplicates"]:
+            del entry["duplicates"]
+        if remaining[0] != references[0]:
+            reassigned[key] = entry
+        manifest[key] = entry
+    if changed:
+        write_build_info(version_dir, info.get("stats") or {}, manifest)
+    return released, reassigned
+
+
+def directory_size(path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def disk_usage(version_dir) -> Dict[str, int]:
+    """Bytes trên disk của version: tổng, index nén, numpy index, còn lại là Chroma"""
+    version_dir = Path(version_dir)
+    total = directory_size(version_dir)
+    quantized = directory_size(version_dir / QUANTIZED_DIR_NAME)
+    numpy_index = directory_size(version_dir / NUMPY_DIR_NAME)
+    return {"total": total, "chroma": total - quantized - numpy_index, "quantized": quantized, "numpy": numpy_index}
+
+
+def process_rss() -> Optional[int]:
+    """Resident memory của process (bytes), None nếu không đọc được"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def store_memory(vector_store, count: int, dim: int, hnsw_m: Optional[int] = None) -> dict:
+    """
+    Memory của store đang load: index numpy/nén báo chính xác (arrays + mmap),
+    HNSW của Chroma là ước lượng (vectors float32 + 2*M links mỗi vector)
+    """
+    index = getattr(vector_store, "index", None)
+    if index is not None and hasattr(index, "nbytes"):
+        parts = index.nbytes()
+        return {"kind": type(index).__name__, "bytes": sum(parts.values()), "parts": parts, "estimated": False}
+    links = 2 * (hnsw_m or 16) * 4
+    return {"kind": "chroma_hnsw", "bytes": count * (dim * 4 + links), "estimated": True}
+
+
+def export_meta(version_dir) -> Optional[dict]:
+    """meta.json (count, dim, ...) của index phục vụ search đã export (numpy hoặc nén), None nếu chỉ có Chroma"""
+    for name in (NUMPY_DIR_NAME, QUANTIZED_DIR_NAME):
+        try:
+            return json.loads((Path(version_dir) / name / "meta.json").read_text())
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def check_integrity(version_dir, vector_count: int, build_info: Optional[dict] = None) -> dict:
+    """So sánh số vectors với manifest (chỉ đọc vài file nhỏ, không quét store)"""
+    build_info = build_info if build_info is not None else read_build_info(version_dir)
+    exported = (export_meta(version_dir) or {}).get("count")
+    result = {"vector_count": vector_count, "export_count": exported}
+
+    if not build_info:
+        result.update({"status": "unknown", "message": "Version was built without a chunk manifest"})
+        return result
+
+    manifest = build_info.get("manifest") or {}
+    failed = [entry.get("source") for entry in manifest.values() if entry.get("error")]
+    expected = sum(entry.get("chunk_count") or 0 for entry in manifest.values() if not entry.get("error"))
+    problems = []
+    if vector_count != expected:
+        problems.append(f"{vector_count} vectors stored, manifest expects {expected}")
+    if exported is not None and exported != vector_count:
+        problems.append(f"search index has {exported} vectors, Chroma has {vector_count}")
+    if failed:
+        problems.append(f"{len(failed)} documents failed to index")
+    result.update({
+        "status": "ok" if not problems else "mismatch",
+        "expected_chunks": expected,
+        "documents_expected": len(manifest),
+        "failed_documents": failed,
+        "problems": problems
+    })
+    return result
+
+
+def _distribution(values: List[int]) -> dict:
+    if not values:
+        return {"count": 0}
+    array = np.asarray(values)
+    p5, p50, p95 = np.percentile(array, [5, 50, 95])
+    return {
+        "count": len(values),
+        "min": int(array.min()),
+        "max": int(array.max()),
+        "mean": round(float(array.mean()), 1),
+        "std": round(float(array.std()), 1),
+        "p5": int(p5),
+        "p50": int(p50),
+        "p95": int(p95)
+    }
+
+
+def collect_index_stats(version_dir, collection, length_sample: int = LENGTH_SAMPLE) -> dict:
+    """
+    Stats chi tiết của version: quét metadata của mọi chunks (theo trang) và text của
+    tối đa length_sample chunks. Integrity chi tiết theo từng index_key của manifest.
+    """
+    build_info = read_build_info(version_dir)
+    manifest = (build_info or {}).get("manifest") or {}
+    vector_count = collection.count()
+
+    per_key: Dict[str, dict] = {}
+    lengths: List[int] = []
+    offset = 0
+    while offset < vector_count:
+        include = ["metadatas", "documents"] if len(lengths) < length_sample else ["metadatas"]
+        page = collection.get(include=include, limit=_PAGE_SIZE, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        for metadata in page.get("metadatas") or []:
+            metadata = metadata or {}
+            key = metadata.get("index_key", "")
+            entry = per_key.setdefault(key, {
+                "document_id": metadata.get("document_id"),
+                "source": Path(metadata["source"]).name if metadata.get("source") else None,
+                "chunks": 0,
+                # Store build trước đây ghi chunk_count vào metadata từng chunk
+                "expected": manifest.get(key, {}).get("chunk_count", metadata.get("chunk_count"))
+            })
+            entry["chunks"] += 1
+        if "documents" in include:
+            lengths.extend(len(text or "") for text in (page.get("documents") or [])[:length_sample - len(lengths)])
+        offset += len(ids)
+
+    dim = (export_meta(version_dir) or {}).get("dim")
+    if not dim and vector_count:
+        sample = collection.get(include=["embeddings"], limit=1)
+        embeddings = sample.get("embeddings")
+        dim = len(embeddings[0]) if embeddings is not None and len(embeddings) else None
+
+    integrity = check_integrity(version_dir, vector_count, build_info)
+    if manifest:
+        integrity["missing_documents"] = [
+            entry.get("source") for key, entry in manifest.items()
+            if not entry.get("error") and entry.get("chunk_count") and key not in per_key
+        ]
+        integrity["incomplete_documents"] = [
+            entry.get("source") for key, entry in manifest.items()
+            if key in per_key and per_key[key]["chunks"] != entry.get("chunk_count")
+        ]
+        integrity["unexpected_chunks"] = sum(
+            entry["chunks"] for key, entry in per_key.items() if key not in manifest
+        )
+        if integrity["missing_documents"] or integrity["incomplete_documents"] or integrity["unexpected_chunks"]:
+            integrity["status"] = "mismatch"
+
+    documents = sorted(per_key.values(), key=lambda entry: -entry["chunks"])
+    return {
+        "vector_count": vector_count,
+        "dimension": dim,
+        "documents": documents,
+        "chunks_per_document": _distribution([entry["chunks"] for entry in documents]),
+        "chunk_length_chars": _distribution(lengths),
+        "disk_bytes": disk_usage(version_dir),
+        "build": (build_info or {}).get("stats"),
+        "integrity": integrity,
+        "collected_at": datetime.utcnow().isoformat()
+    }
@@ -0,0 +1,148 @@
+"""
+Ingest Pipeline Service
+Các stage streaming cho indexing: trang → chunks → batches, nối với nhau bằng
+generators và hàng đợi có giới hạn, nên memory tối đa phụ thuộc batch size
+chứ không phụ thuộc số trang/số documents.
+
+    extract (process pool, ghi text ra file)
+      → iter_chunk_batches (thread riêng, stream từng trang, split, dedupe, gom batch)
+      → prefetch queue (tối đa PIPELINE_QUEUE_BATCHES batches)
+      → embed + upsert (thread gọi)
+"""
+
+from queue import Queue, Full
+from typing import Iterable, Iterator, Optional
+import os
+import threading
+
+from services.pdf_loader import iter_pages
+from services.chunk_dedup import find_page_furniture, strip_page_furniture, NearDuplicateFilter
+
+
+PIPELINE_QUEUE_BATCHES = int(os.getenv("RAG_PIPELINE_QUEUE_BATCHES", "2"))
+
+_DONE = object()
+
+
+def prefetch(iterable: Iterable, maxsize: int = PIPELINE_QUEUE_BATCHES) -> Iterator:
+    """
+    Chạy iterable trong background thread, đẩy kết quả qua Queue(maxsize).
+    Producer bị chặn khi queue đầy (backpressure). Exception của producer được raise
+    lại ở consumer; consumer dừng sớm (close/exception) thì producer cũng dừng.
+    """
+    queue: Queue = Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce() -> None:
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((None, item)):
+                    return
+            put((None, _DONE))
+        except BaseException as e:
+            put((e, None))
+        finally:
+            # Đóng iterator trong chính thread đang chạy nó (vd. để kill process pool)
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    thread = threading.Thread(target=produce, name="ingest-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            error, item = queue.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+        # Producer có thể đang chờ một PDF parse xong; nó sẽ tự dừng ở lần put tiếp theo
+        thread.join(timeout=1.0)
+
+
+def iter_chunk_batches(documents: Iterable[dict], text_splitter, batch_size: int,
+                       dedupe: bool = False) -> Iterator[dict]:
+    """
+    Stream trang của từng document, split và gom thành batches (một lượt đọc + split mỗi trang).
+
+    documents: dicts với keys key, path, pages_path, metadata (gắn vào mọi chunk),
+    skip (số chunks đầu đã commit, bỏ qua), error (nếu parse lỗi)
+
+    dedupe: bỏ header/footer lặp lại trên các trang và các chunks trùng/gần trùng
+    trong document (services/chunk_dedup.py) trước khi đánh số chunks; header/footer
+    cần nhìn mọi trang nên text các trang của document được giữ trong memory
+
+    Số chunks của document chỉ biết ở document_end (ghi vào manifest/checkpoint, không nằm
+    trong metadata chunks). document_error có thể đến sau một số batches (file trang hỏng giữa chừng).
+
+    Yields events:
+        {"type": "document_error", key, path, error}
+        {"type": "document_start", key, path, skip}
+        {"type": "batch", key, start, texts, metadatas}
+        {"type": "document_end", key, path, num_pages, chunk_count,
+         furniture_lines, exact_duplicates, near_duplicates}
+    """
+    for doc in documents:
+        if doc.get("error"):
+            yield {"type": "document_error", "key": doc["key"], "path": doc["path"], "error": doc["error"]}
+            continue
+
+        skip = doc.get("skip", 0)
+        yield {"type": "document_start", "key": doc["key"], "path": doc["path"], "skip": skip}
+
+        num_pages = 0
+        chunk_index = 0
+        furniture_lines = 0
+        duplicates = NearDuplicateFilter() if dedupe else None
+        texts, metadatas = [], []
+        batch_start: Optional[int] = None
+        try:
+            pages = iter_pages(doc["pages_path"])
+            furniture = set()
+            if dedupe:
+                pages = list(pages)
+                furniture = find_page_furniture(page.page_content for page in pages)
+            for page in pages:
+                num_pages += 1
+                page.page_content, stripped = strip_page_furniture(page.page_content, furniture)
+                furniture_lines += stripped
+                for split in text_splitter.split_documents([page]):
+                    if duplicates and duplicates.is_duplicate(split.page_content):
+                        continue
+                    if chunk_index >= skip:
+                        if batch_start is None:
+                            batch_start = chunk_index
+                        split.metadata.update(doc.get("metadata") or {})
+                        split.metadata["chunk_index"] = chunk_index
+                        texts.append(split.page_content)
+                        metadatas.append(split.metadata)
+                        if len(texts) >= batch_size:
+                            yield {"type": "batch", "key": doc["key"], "start": batch_start,
+                                   "texts": texts, "metadatas": metadatas}
+                            texts, metadatas, batch_start = [], [], None
+                    chunk_index += 1
+        except (OSError, EOFError, ValueError) as e:
+            yield {"type": "document_error", "key": doc["key"], "path": doc["path"],
+                   "error": f"Unreadable parsed pages: {str(e)}"}
+            continue
+
+        if texts:
+            yield {"type": "batch", "key": doc["key"], "start": batch_start, "texts": texts, "metadatas": metadatas}
+        yield {"type": "document_end", "key": doc["key"], "path": doc["path"],
+               "num_pages": num_pages, "chunk_count": chunk_index,
+               "furniture_lines": furniture_lines,
+               "exact_duplicates": duplicates.exact_duplicates if duplicates else 0,
+               "near_duplicates": duplicates.near_duplicates if duplicates else 0}
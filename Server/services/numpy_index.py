@@ -0,0 +1,339 @@
+"""
+NumPy Index Service
+Vector index dạng file phẳng, mở bằng mmap: không cần SQLite/HNSW khi query, và mọi
+uvicorn workers dùng chung một bản trong page cache của OS.
+
+Layout (trong thư mục version):
+    numpy/meta.json          {"space", "dim", "count", "nlist", "storage"}
+    numpy/vectors.npy        (count, dim) float32 — thứ tự hàng theo IVF list (nếu có)
+    numpy/sq_norms.npy       |x|² của từng hàng
+    numpy/rows.npy           hàng → vị trí trong ids/records (chỉ có khi dùng IVF)
+    numpy/ids.json           chunk ids
+    numpy/records.bin        JSON {"d": text, "m": metadata} của từng chunk, nối liền
+    numpy/offsets.npy        (count + 1) vị trí bắt đầu của từng record
+    numpy/centroids.npy      IVF coarse quantizer (nlist, dim)
+    numpy/list_offsets.npy   (nlist + 1) hàng bắt đầu của từng list
+    numpy/codes.npy          vectors nén float16/int8 (storage != float32), cùng thứ tự hàng
+    numpy/scales.npy         scale của int8
+
+Search: scan (toàn bộ hoặc nprobe lists gần nhất) bằng matrix multiply theo block,
+lấy top-k bằng argpartition; với storage nén, scan trên codes rồi rescore top
+candidates bằng vectors float32.
+"""
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from services.quantized_index import quantize, collection_space, RESCORE_FACTOR, RESCORE_MIN
+
+
+INDEX_DIR_NAME = "numpy"
+
+# Backends phục vụ search của RAG config (xem services/vector_backends.py)
+VECTOR_BACKENDS = ("chroma", "numpy")
+DEFAULT_VECTOR_BACKEND = "chroma"
+
+# Từ số vectors này trở lên thì build IVF (nlist ≈ sqrt(count)), nprobe lists được scan mỗi query
+IVF_MIN_VECTORS = int(os.getenv("RAG_NUMPY_IVF_MIN_VECTORS", "50000"))
+IVF_NPROBE = int(os.getenv("RAG_NUMPY_IVF_NPROBE", "16"))
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+
+_SCAN_BLOCK = 32768
+_READ_PAGE = 1000
+
+
+def block_distances(block: np.ndarray, queries: np.ndarray, space: str,
+                    sq_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """Khoảng cách (rows, queries) giống Chroma: l2 = bình phương Euclid, ip = 1 - dot, cosine = 1 - cos"""
+    dots = block @ queries.T
+    if space == "ip":
+        return 1.0 - dots
+    if sq_norms is None:
+        sq_norms = np.einsum("ij,ij->i", block, block)
+    if space == "cosine":
+        norms = np.sqrt(sq_norms)[:, None] * np.linalg.norm(queries, axis=1)[None, :]
+        return 1.0 - dots / np.maximum(norms, 1e-12)
+    return sq_norms[:, None] - 2.0 * dots + np.einsum("ij,ij->i", queries, queries)[None, :]
+
+
+def _top_k(dist: np.ndarray, k: int) -> np.ndarray:
+    """Chỉ số của k giá trị nhỏ nhất theo từng cột, đã sắp xếp"""
+    if dist.shape[0] > k:
+        top = np.argpartition(dist, k - 1, axis=0)[:k]
+    else:
+        top = np.broadcast_to(np.arange(dist.shape[0])[:, None], dist.shape).copy()
+    order = np.argsort(np.take_along_axis(dist, top, axis=0), axis=0)
+    return np.take_along_axis(top, order, axis=0)
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Lloyd k-means đơn giản (l2) trên một sample"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _top_k(block_distances(centroids, vectors, "l2"), 1)[0]
+        for i in range(nlist):
+            members = vectors[labels == i]
+            # List rỗng → lấy lại một điểm ngẫu nhiên
+            centroids[i] = members.mean(axis=0) if len(members) else vectors[rng.integers(len(vectors))]
+    return centroids
+
+
+class NumpyIndex:
+    """Flat/IVF index của một version vector store"""
+
+    def __init__(self, version_dir, nprobe: int = IVF_NPROBE):
+        self.dir = Path(version_dir) / INDEX_DIR_NAME
+        meta = json.loads((self.dir / "meta.json").read_text())
+        self.space = meta["space"]
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        self.nlist = meta["nlist"]
+        self.storage = meta.get("storage", "float32")
+        self.nprobe = max(1, min(nprobe, self.nlist or 1))
+        self.ids: List[str] = json.loads((self.dir / "ids.json").read_text())
+        self.sq_norms = np.load(self.dir / "sq_norms.npy")
+        self.offsets = np.load(self.dir / "offsets.npy")
+        self.vectors = self.records = None
+        if self.count:
+            self.vectors = np.load(self.dir / "vectors.npy", mmap_mode="r")
+            self.records = np.memmap(self.dir / "records.bin", dtype=np.uint8, mode="r")
+        self.rows = np.load(self.dir / "rows.npy") if (self.dir / "rows.npy").exists() else None
+        self._positions = None
+        self.centroids = np.load(self.dir / "centroids.npy") if self.nlist else None
+        self.list_offsets = np.load(self.dir / "list_offsets.npy") if self.nlist else None
+        self.codes = self.scales = None
+        if self.storage != "float32" and self.count:
+            self.codes = np.load(self.dir / "codes.npy", mmap_mode="r")
+            if self.storage == "int8":
+                self.scales = np.load(self.dir / "scales.npy")
+
+    @staticmethod
+    def exists(version_dir) -> bool:
+        return (Path(version_dir) / INDEX_DIR_NAME / "meta.json").exists()
+
+    @staticmethod
+    def meta_of(version_dir) -> Optional[dict]:
+        try:
+            return json.loads((Path(version_dir) / INDEX_DIR_NAME / "meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def remove(version_dir) -> None:
+        shutil.rmtree(Path(version_dir) / INDEX_DIR_NAME, ignore_errors=True)
+
+    # ----- build -----
+
+    @classmethod
+    def build(cls, version_dir, collection, storage: str = "float32", ivf_min_vectors: int = IVF_MIN_VECTORS) -> dict:
+        """
+        Export Chroma collection (vectors, texts, metadatas) ra thư mục numpy/.
+        Vectors được ghi thẳng vào file mmap nên memory khi build không phụ thuộc số chunks.
+        """
+        target = Path(version_dir) / INDEX_DIR_NAME
+        tmp = target.with_name(f"{INDEX_DIR_NAME}.{uuid.uuid4().hex}.tmp")
+        tmp.mkdir(parents=True)
+        try:
+            meta = cls._write(tmp, collection, storage, ivf_min_vectors)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+        print(f"[NumpyIndex] {meta['count']} vectors ({meta['dim']}d, nlist={meta['nlist']}, "
+              f"{meta['storage']}) at {target}")
+        return meta
+
+    @classmethod
+    def _write(cls, out: Path, collection, storage: str, ivf_min_vectors: int) -> dict:
+        count = collection.count()
+        ids: List[str] = []
+        offsets = [0]
+        raw = None
+        with open(out / "records.bin", "wb") as records:
+            while len(ids) < count:
+                page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                      limit=_READ_PAGE, offset=len(ids))
+                if not page["ids"]:
+                    break
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                if raw is None:
+                    raw = np.lib.format.open_memmap(out / "vectors.raw.npy", mode="w+",
+                                                    dtype=np.float32, shape=(count, vectors.shape[1]))
+                n = min(len(vectors), count - len(ids))
+                raw[len(ids):len(ids) + n] = vectors[:n]
+                for text, metadata in zip(page["documents"][:n], page["metadatas"][:n]):
+                    data = json.dumps({"d": text, "m": metadata or {}}, ensure_ascii=False).encode("utf-8")
+                    records.write(data)
+                    offsets.append(offsets[-1] + len(data))
+                ids.extend(page["ids"][:n])
+
+        count = len(ids)
+        dim = raw.shape[1] if raw is not None else 0
+        nlist = int(np.sqrt(count)) if count >= max(ivf_min_vectors, 1) else 0
+
+        if raw is None:
+            np.save(out / "vectors.npy", np.empty((0, 0), dtype=np.float32))
+            order = None
+        elif nlist:
+            # IVF: k-means trên sample, gán list cho mọi hàng, sắp hàng theo list để mỗi list liền nhau
+            rng = np.random.default_rng(0)
+            sample = raw[np.sort(rng.choice(count, size=min(count, nlist * KMEANS_SAMPLE_PER_LIST), replace=False))]
+            centroids = _kmeans(np.asarray(sample), nlist)
+            labels = np.empty(count, dtype=np.int32)
+            for start in range(0, count, _SCAN_BLOCK):
+                labels[start:start + _SCAN_BLOCK] = _top_k(
+                    block_distances(centroids, np.asarray(raw[start:start + _SCAN_BLOCK]), "l2"), 1
+                )[0]
+            order = np.argsort(labels, kind="stable")
+            list_offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))])
+            np.save(out / "centroids.npy", centroids.astype(np.float32))
+            np.save(out / "list_offsets.npy", list_offsets.astype(np.int64))
+            np.save(out / "rows.npy", order.astype(np.int64))
+        else:
+            order = None
+
+        if raw is not None:
+            if order is None:
+                raw.flush()
+                del raw
+                os.replace(out / "vectors.raw.npy", out / "vectors.npy")
+                source = np.load(out / "vectors.npy", mmap_mode="r")
+            else:
+                source = np.lib.format.open_memmap(out / "vectors.npy", mode="w+", dtype=np.float32, shape=(count, dim))
+                for start in range(0, count, _SCAN_BLOCK):
+                    source[start:start + _SCAN_BLOCK] = raw[np.sort(order[start:start + _SCAN_BLOCK])][
+                        np.argsort(np.argsort(order[start:start + _SCAN_BLOCK]))
+                    ]
+                source.flush()
+                del raw
+                (out / "vectors.raw.npy").unlink()
+
+            sq_norms = np.empty(count, dtype=np.float32)
+            codes = scales = None
+            if storage != "float32":
+                codes = np.lib.format.open_memmap(out / "codes.npy", mode="w+",
+                                                  dtype=np.float16 if storage == "float16" else np.int8,
+                                                  shape=(count, dim))
+                scales = np.empty(count, dtype=np.float32)
+            for start in range(0, count, _SCAN_BLOCK):
+                block = np.asarray(source[start:start + _SCAN_BLOCK])
+                sq_norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+                if codes is not None:
+                    block_codes, block_scales = quantize(block, storage)
+                    codes[start:start + len(block)] = block_codes
+                    if block_scales is not None:
+                        scales[start:start + len(block)] = block_scales
+            if codes is not None:
+                codes.flush()
+                del codes
+                if storage == "int8":
+                    np.save(out / "scales.npy", scales)
+            del source
+        else:
+            sq_norms = np.empty(0, dtype=np.float32)
+
+        np.save(out / "sq_norms.npy", sq_norms)
+        np.save(out / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+        (out / "ids.json").write_text(json.dumps(ids))
+        meta = {"space": collection_space(collection), "dim": dim, "count": count,
+                "nlist": nlist, "storage": storage}
+        (out / "meta.json").write_text(json.dumps(meta))
+        return meta
+
+    # ----- search -----
+
+    def _scan_rows(self, query: np.ndarray) -> List[Tuple[int, int]]:
+        """Các khoảng hàng cần scan cho một query (toàn bộ, hoặc nprobe IVF lists gần nhất)"""
+        if not self.nlist:
+            return [(0, self.count)]
+        nearest = _top_k(block_distances(self.centroids, query[None, :], "l2"), self.nprobe)[:, 0]
+        return [(int(self.list_offsets[i]), int(self.list_offsets[i + 1])) for i in nearest]
+
+    def _scan(self, source, ranges: List[Tuple[int, int]], queries: np.ndarray, k: int):
+        """Top-k (hàng, distance) của từng query trên các khoảng hàng (block matmul)"""
+        best_rows, best_dist = [], []
+        for start, end in ranges:
+            for block_start in range(start, end, _SCAN_BLOCK):
+                block_end = min(end, block_start + _SCAN_BLOCK)
+                block = np.asarray(source[block_start:block_end], dtype=np.float32)
+                if source is self.codes and self.scales is not None:
+                    block *= self.scales[block_start:block_end, None]
+                dist = block_distances(block, queries, self.space, self.sq_norms[block_start:block_end])
+                top = _top_k(dist, k)
+                best_rows.append(top + block_start)
+                best_dist.append(np.take_along_axis(dist, top, axis=0))
+        if not best_rows:
+            empty = np.empty((0, len(queries)))
+            return empty.astype(np.int64), empty
+        rows = np.concatenate(best_rows)
+        dist = np.concatenate(best_dist)
+        order = _top_k(dist, k)
+        return np.take_along_axis(rows, order, axis=0), np.take_along_axis(dist, order, axis=0)
+
+    def _rescore(self, rows: np.ndarray, query: np.ndarray, k: int):
+        """Chấm lại candidates bằng vectors float32 (chỉ đọc các hàng này từ mmap)"""
+        rows = np.sort(rows)
+        dist = block_distances(np.asarray(self.vectors[rows]), query[None, :], self.space, self.sq_norms[rows])[:, 0]
+        order = np.argsort(dist)[:k]
+        return rows[order], dist[order]
+
+    def search_batch(self, queries, k: int) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k cho nhiều queries một lần.
+
+        Returns:
+            list (mỗi query) các (record index, distance) tăng dần
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.count == 0 or k <= 0:
+            return [[] for _ in queries]
+        source = self.codes if self.codes is not None else self.vectors
+        n = max(k * RESCORE_FACTOR, RESCORE_MIN) if self.codes is not None else k
+
+        if self.nlist:
+            # Mỗi query scan các lists khác nhau
+            found = [self._scan(source, self._scan_rows(q), q[None, :], n) for q in queries]
+            found = [(rows[:, 0], dist[:, 0]) for rows, dist in found]
+        else:
+            rows, dist = self._scan(source, [(0, self.count)], queries, n)
+            found = [(rows[:, i], dist[:, i]) for i in range(len(queries))]
+
+        results = []
+        for query, (rows, dist) in zip(queries, found):
+            if self.codes is not None:
+                rows, dist = self._rescore(rows, query, k)
+            rows, dist = rows[:k], dist[:k]
+            if self.rows is not None:
+                rows = self.rows[rows]
+            results.append([(int(r), float(d)) for r, d in zip(rows, dist)])
+        return results
+
+    def record(self, i: int) -> dict:
+        """id, text và metadata của chunk thứ i"""
+        data = json.loads(bytes(self.records[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8"))
+        return {"id": self.ids[i], "document": data["d"], "metadata": data["m"]}
+
+    def vectors_of(self, indices) -> np.ndarray:
+        """Vectors float32 của các records (vd. cho MMR)"""
+        positions = np.asarray(indices, dtype=np.int64)
+        if self.rows is not None:
+            if self._positions is None:
+                self._positions = np.argsort(self.rows)
+            positions = self._positions[positions]
+        return np.asarray(self.vectors[positions], dtype=np.float32)
+
+    def nbytes(self) -> dict:
+        return {
+            "vectors": self.count * self.dim * 4,
+            "codes": int(self.codes.nbytes) if self.codes is not None else 0,
+            "records": int(self.offsets[-1]) if len(self.offsets) else 0
+        }
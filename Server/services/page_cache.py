@@ -0,0 +1,162 @@
+"""
+Page Text Cache
+Text từng trang đã parse của PDF, key = SHA-256 nội dung file → dùng chung cho mọi
+RAG configs, mọi chunk_size/chunk_overlap và mọi lần index lại: PDF chỉ parse một lần.
+
+- Format: gzip JSONL ({"page_content", "metadata"} mỗi dòng), ghi bởi pdf_loader.extract_pdf_pages
+- Layout: page_cache/<2 ký tự đầu của hash>/<hash>.v<PAGE_CACHE_VERSION>.pages.jsonl.gz
+- Được tính ngay khi upload (background, process pool), RAGProcessor dùng nếu đã có
+- Giới hạn dung lượng, vượt quá thì xóa theo LRU (mtime được cập nhật mỗi lần dùng)
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+import hashlib
+import os
+import threading
+import time
+
+from services.pdf_loader import iter_extract_pdfs, PDF_TIMEOUT_S
+
+
+PAGE_CACHE_ENABLED = os.getenv("RAG_PAGE_CACHE", "1") != "0"
+PAGE_CACHE_DIR = os.getenv("RAG_PAGE_CACHE_DIR", "page_cache")
+PAGE_CACHE_MAX_BYTES = int(float(os.getenv("RAG_PAGE_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+# Tăng khi cách extract text thay đổi để bỏ qua cache cũ
+PAGE_CACHE_VERSION = 1
+
+
+def compute_file_hash(file_path: str) -> str:
+    """SHA-256 của nội dung file (đọc theo block 1MB)"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """Cache text các trang PDF trên disk, key = hash nội dung file"""
+
+    def __init__(self, root: str = PAGE_CACHE_DIR, max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path_for(self, doc_hash: str) -> str:
+        """Nơi lưu (hoặc sẽ lưu) text của document"""
+        directory = self.root / doc_hash[:2]
+        directory.mkdir(parents=True, exist_ok=True)
+        return str(directory / f"{doc_hash}.v{PAGE_CACHE_VERSION}.pages.jsonl.gz")
+
+    def get(self, doc_hash: str) -> Optional[str]:
+        """Đường dẫn text đã cache, None nếu chưa có"""
+        path = self.root / doc_hash[:2] / f"{doc_hash}.v{PAGE_CACHE_VERSION}.pages.jsonl.gz"
+        if not path.exists():
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return str(path)
+
+    def has(self, doc_hash: str) -> bool:
+        return self.get(doc_hash) is not None
+
+    def warm(self, pdf_paths: Iterable[str], max_workers: int = 1, timeout: float = PDF_TIMEOUT_S) -> Dict[str, dict]:
+        """
+        Parse các PDFs chưa có trong cache (process pool) và ghi vào cache.
+
+        Returns:
+            {pdf_path: {"doc_hash", "num_pages", "cached", "error"}}
+        """
+        results = {}
+        to_parse = {}
+        for pdf_path in pdf_paths:
+            try:
+                doc_hash = compute_file_hash(pdf_path)
+            except OSError as e:
+                results[pdf_path] = {"doc_hash": None, "num_pages": 0, "cached": False, "error": str(e)}
+                continue
+            if self.has(doc_hash):
+                results[pdf_path] = {"doc_hash": doc_hash, "num_pages": None, "cached": True, "error": None}
+            else:
+                to_parse[pdf_path] = doc_hash
+
+        if to_parse:
+            pages_paths = {pdf_path: self.path_for(doc_hash) for pdf_path, doc_hash in to_parse.items()}
+            for parsed in iter_extract_pdfs(pages_paths, max_workers=max_workers, timeout=timeout):
+                results[parsed["path"]] = {
+                    "doc_hash": to_parse[parsed["path"]],
+                    "num_pages": parsed["num_pages"],
+                    "cached": False,
+                    "error": parsed["error"]
+                }
+                if parsed["error"]:
+                    print(f"[PageCache] Could not parse {parsed['path']}: {parsed['error']}")
+                else:
+                    print(f"[PageCache] Cached {parsed['num_pages']} pages of {Path(parsed['path']).name} "
+                          f"in {parsed['elapsed']:.1f}s")
+            self.prune()
+        return results
+
+    def size(self) -> int:
+        return sum(p.stat().st_size for p in self.root.glob("*/*.pages.jsonl.gz")) if self.root.exists() else 0
+
+    def prune(self) -> int:
+        """
+        Xóa các entries ít dùng nhất cho tới khi dưới max_bytes, trả về số bytes đã xóa.
+        File tmp cũ hơn timeout parse (worker bị kill giữa lúc ghi) cũng bị xóa.
+        """
+        if not self.root.exists():
+            return 0
+        freed = 0
+        stale_before = time.time() - PDF_TIMEOUT_S
+        with self._lock:
+            for path in self.root.glob("*/*.tmp"):
+                try:
+                    stat = path.stat()
+                    if stat.st_mtime < stale_before:
+                        path.unlink()
+                        freed += stat.st_size
+                except OSError:
+                    continue
+
+            entries = []
+            for path in self.root.glob("*/*.pages.jsonl.gz"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for _, size, path in sorted(entries):
+                if total - evicted <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                evicted += size
+            freed += evicted
+        if freed:
+            print(f"[PageCache] Evicted {freed / 1024 / 1024:.1f} MB")
+        return freed
+
+    def stats(self) -> dict:
+        entries = list(self.root.glob("*/*.pages.jsonl.gz")) if self.root.exists() else []
+        return {"entries": len(entries), "bytes": sum(p.stat().st_size for p in entries), "max_bytes": self.max_bytes}
+
+
+_page_cache: Optional[PageTextCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageTextCache]:
+    """Page cache dùng chung cho cả process (None nếu bị tắt bằng RAG_PAGE_CACHE=0)"""
+    global _page_cache
+    if not PAGE_CACHE_ENABLED:
+        return None
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageTextCache()
+        return _page_cache
@@ -0,0 +1,243 @@
+"""
+PDF Loader Service
+Load và extract text từ nhiều PDFs song song bằng process pool.
+
+- Parsing PDF là CPU-bound → mỗi file chạy trong một worker process riêng
+- Mỗi file có timeout: worker bị treo (PDF lỗi) sẽ bị kill, các file khác chạy tiếp
+- Kết quả được yield ngay khi từng file xong để splitter xử lý luôn
+- extract_pdf_pages ghi text từng trang ra file (gzip JSONL) ngay trong worker,
+  nên process cha chỉ stream từng trang một thay vì giữ cả document trong memory
+- read_pdf_info đọc số trang + metadata (title, author, creation date) lúc upload
+"""
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import gzip
+import json
+import multiprocessing
+import os
+import re
+import time
+
+
+PDF_WORKERS = int(os.getenv("RAG_PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_TIMEOUT_S = float(os.getenv("RAG_PDF_TIMEOUT", "300"))
+
+
+def extract_pdf_pages(pdf_path: str, pages_path: str) -> int:
+    """
+    Parse PDF từng trang (lazy) và ghi ra pages_path dạng gzip JSONL
+    ({"page_content", "metadata"} mỗi dòng). Chạy trong worker process.
+    File chỉ xuất hiện khi đã ghi xong (tmp + rename). Trả về số trang.
+    """
+    from langchain_community.document_loaders import PyPDFLoader
+
+    # Tên tmp riêng cho mỗi process: nhiều jobs có thể cùng ghi một entry của page cache
+    tmp_path = f"{pages_path}.{os.getpid()}.tmp"
+    num_pages = 0
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=3) as f:
+            for page in PyPDFLoader(pdf_path).lazy_load():
+                f.write(json.dumps({"page_content": page.page_content, "metadata": page.metadata}) + "\n")
+                num_pages += 1
+        os.replace(tmp_path, pages_path)
+    except BaseException:
+        # Worker bị kill (timeout) thì không tới được đây: PageTextCache.prune dọn các tmp cũ
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return num_pages
+
+
+# D:YYYYMMDDHHmmSS+HH'mm' (các phần sau năm đều có thể thiếu)
+_PDF_DATE = re.compile(r"^D?:?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?([Zz]|[+-]\d{2}'?\d{2}'?)?")
+
+
+def parse_pdf_date(value) -> Optional[datetime]:
+    """Ngày dạng PDF (D:20240131120000+07'00') → datetime UTC không tz, None nếu không parse được"""
+    match = _PDF_DATE.match(str(value or "").strip())
+    if not match:
+        return None
+    year, month, day, hour, minute, second, tz = match.groups()
+    try:
+        parsed = datetime(int(year), int(month or 1), int(day or 1), int(hour or 0), int(minute or 0), int(second or 0))
+    except ValueError:
+        return None
+    if tz and tz not in ("Z", "z"):
+        digits = tz.replace("'", "")
+        offset = timedelta(hours=int(digits[1:3]), minutes=int(digits[3:5] or 0))
+        parsed = parsed - offset if digits[0] == "+" else parsed + offset
+    return parsed
+
+
+def read_pdf_info(pdf_path: str) -> dict:
+    """Số trang và metadata của PDF (title, author, creation_date). Chạy trong worker process."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    metadata = reader.metadata or {}
+
+    def text(key: str) -> Optional[str]:
+        value = metadata.get(key)
+        value = str(value).strip() if value is not None else ""
+        return value or None
+
+    return {
+        "total_pages": len(reader.pages),
+        "title": text("/Title"),
+        "author": text("/Author"),
+        "creation_date": parse_pdf_date(metadata.get("/CreationDate"))
+    }
+
+
+def iter_pages(pages_path: str) -> Iterator:
+    """Stream các trang (LangChain Documents) từ file do extract_pdf_pages ghi"""
+    from langchain_core.documents import Document
+
+    with gzip.open(pages_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            yield Document(page_content=record["page_content"], metadata=record["metadata"])
+
+
+def _new_executor(max_workers: int) -> ProcessPoolExecutor:
+    # spawn: an toàn khi process cha có nhiều threads (uvicorn, chroma)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _kill_executor(executor: ProcessPoolExecutor) -> None:
+    """Dừng pool ngay lập tức, kể cả các workers đang treo"""
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.join(timeout=5)
+
+
+def iter_extract_pdfs(
+    pages_paths: Dict[str, str],
+    max_workers: int = PDF_WORKERS,
+    timeout: float = PDF_TIMEOUT_S
+) -> Iterator[dict]:
+    """
+    Parse PDFs song song, text được ghi ra file (extract_pdf_pages), kết quả chỉ chứa đường dẫn.
+    Yield theo thứ tự hoàn thành.
+
+    Args:
+        pages_paths: {pdf_path: pages_path}
+        max_workers: số worker processes (0 = parse tuần tự trong process hiện tại, không có timeout)
+        timeout: thời gian tối đa (giây) cho mỗi file
+
+    Yields:
+        dict với keys: path, pages_path, num_pages, error, elapsed
+    """
+    tasks = {pdf_path: (pdf_path, pages_path) for pdf_path, pages_path in pages_paths.items()}
+    for path, started, num_pages, error in _iter_pool(extract_pdf_pages, tasks, max_workers, timeout):
+        yield {
+            "path": path,
+            "pages_path": pages_paths[path],
+            "num_pages": num_pages or 0,
+            "error": error,
+            "elapsed": time.monotonic() - started
+        }
+
+
+def iter_read_pdf_info(
+    pdf_paths: List[str],
+    max_workers: int = 1,
+    timeout: float = PDF_TIMEOUT_S
+) -> Iterator[dict]:
+    """
+    read_pdf_info cho nhiều PDFs (process pool, timeout mỗi file như khi parse).
+
+    Yields:
+        dict với keys: path, info (None nếu lỗi), error, elapsed
+    """
+    for path, started, info, error in _iter_pool(read_pdf_info, {p: (p,) for p in pdf_paths}, max_workers, timeout):
+        yield {"path": path, "info": info, "error": error, "elapsed": time.monotonic() - started}
+
+
+def _iter_pool(
+    fn: Callable,
+    tasks: Dict[str, Tuple],
+    max_workers: int,
+    timeout: float
+) -> Iterator[Tuple[str, float, object, str]]:
+    """Chạy fn(*tasks[path]) cho mỗi file, yield (path, started, value, error) theo thứ tự hoàn thành"""
+    pdf_paths = list(tasks)
+    if max_workers <= 0:
+        for path in pdf_paths:
+            started = time.monotonic()
+            try:
+                yield path, started, fn(*tasks[path]), None
+            except Exception as e:
+                yield path, started, None, str(e)
+        return
+
+    pending = deque(pdf_paths)
+    # Files đang chạy khi pool bị crash: không biết file nào gây lỗi,
+    # nên chạy lại từng file một (isolated) để xác định đúng file lỗi
+    suspects = deque()
+    in_flight = {}  # future -> (path, started, isolated)
+    executor = _new_executor(max_workers)
+
+    try:
+        while pending or suspects or in_flight:
+            # Chỉ submit tối đa max_workers files → file nào được submit là đang chạy,
+            # nên deadline tính từ lúc submit
+            if suspects:
+                if not in_flight:
+                    path = suspects.popleft()
+                    in_flight[executor.submit(fn, *tasks[path])] = (path, time.monotonic(), True)
+            else:
+                while pending and len(in_flight) < max_workers:
+                    path = pending.popleft()
+                    in_flight[executor.submit(fn, *tasks[path])] = (path, time.monotonic(), False)
+
+            next_deadline = min(started for _, started, _ in in_flight.values()) + timeout
+            done, _ = wait(in_flight, timeout=max(0.0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+
+            broken = False
+            for future in done:
+                path, started, isolated = in_flight.pop(future)
+                try:
+                    value = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    if isolated:
+                        yield path, started, None, "Worker process crashed while parsing"
+                    else:
+                        suspects.append(path)
+                    continue
+                except Exception as e:
+                    yield path, started, None, str(e)
+                    continue
+                yield path, started, value, None
+
+            now = time.monotonic()
+            expired = [f for f, (_, started, _) in in_flight.items() if now - started >= timeout]
+            for future in expired:
+                path, started, _ = in_flight.pop(future)
+                print(f"[PDFLoader] Timeout after {timeout}s: {path}")
+                yield path, started, None, f"Timed out after {timeout}s"
+
+            if expired or broken:
+                # Worker treo không thể cancel → kill cả pool, chạy lại các files còn dở
+                survivors = [path for path, _, _ in in_flight.values()]
+                in_flight.clear()
+                _kill_executor(executor)
+                if broken:
+                    suspects.extend(survivors)
+                else:
+                    pending.extendleft(reversed(survivors))
+                executor = _new_executor(max_workers)
+    finally:
+        _kill_executor(executor)
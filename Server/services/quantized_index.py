@@ -0,0 +1,207 @@
+"""
+Quantized Index Service
+Bản sao nén của các embeddings trong một version vector store (float16 hoặc int8),
+dùng để tìm candidates nhanh và ít memory; top candidates được chấm điểm lại bằng
+vectors float32 gốc trong Chroma nên thứ hạng cuối cùng vẫn ở full precision.
+
+Layout (trong thư mục version):
+    quantized/meta.json      {"storage", "space", "dim", "count"}
+    quantized/ids.json       chunk ids theo thứ tự hàng
+    quantized/codes.npy      (count, dim) float16 hoặc int8 — mở bằng mmap
+    quantized/scales.npy     int8: scale của từng vector (x ≈ code * scale)
+    quantized/sq_norms.npy   |x|² (cho space "l2")
+
+Chỉ trang nào của codes.npy được đọc mới nằm trong RAM (page cache), int8 nhỏ
+bằng 1/4 float32, float16 bằng 1/2.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+
+VECTOR_STORAGE_OPTIONS = ("float32", "float16", "int8")
+DEFAULT_VECTOR_STORAGE = "float32"
+
+# Số candidates lấy từ index nén = k * RESCORE_FACTOR (tối thiểu RESCORE_MIN)
+RESCORE_FACTOR = int(os.getenv("RAG_QUANT_RESCORE_FACTOR", "4"))
+RESCORE_MIN = int(os.getenv("RAG_QUANT_RESCORE_MIN", "20"))
+
+INDEX_DIR_NAME = "quantized"
+
+# Số hàng xử lý mỗi lần khi scan (giới hạn memory tạm khi dequantize)
+_SCAN_BLOCK = 65536
+_READ_PAGE = 1000
+
+
+def quantize(vectors: np.ndarray, storage: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Nén vectors float32 → (codes, scales). int8: scale đối xứng theo từng vector"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if storage == "float16":
+        return vectors.astype(np.float16), None
+    if storage == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unsupported vector storage: {storage}")
+
+
+def distances(vectors: np.ndarray, query: np.ndarray, space: str,
+              sq_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """Khoảng cách giống Chroma (càng nhỏ càng gần): l2 = bình phương Euclid, ip = 1 - dot, cosine = 1 - cos"""
+    dots = vectors @ query
+    if space == "ip":
+        return 1.0 - dots
+    if space == "cosine":
+        norms = np.sqrt(sq_norms) if sq_norms is not None else np.linalg.norm(vectors, axis=1)
+        return 1.0 - dots / np.maximum(norms * np.linalg.norm(query), 1e-12)
+    if sq_norms is None:
+        sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+    return sq_norms - 2.0 * dots + float(query @ query)
+
+
+def collection_space(collection) -> str:
+    """Distance space của Chroma collection (mặc định l2)"""
+    return (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+class QuantizedIndex:
+    """Index nén của một version vector store"""
+
+    def __init__(self, version_dir):
+        self.dir = Path(version_dir) / INDEX_DIR_NAME
+        meta = json.loads((self.dir / "meta.json").read_text())
+        self.storage = meta["storage"]
+        self.space = meta["space"]
+        self.dim = meta["dim"]
+        self.ids: List[str] = json.loads((self.dir / "ids.json").read_text())
+        self.codes = np.load(self.dir / "codes.npy", mmap_mode="r")
+        self.scales = np.load(self.dir / "scales.npy") if self.storage == "int8" else None
+        self.sq_norms = np.load(self.dir / "sq_norms.npy")
+
+    @staticmethod
+    def exists(version_dir) -> bool:
+        return (Path(version_dir) / INDEX_DIR_NAME / "meta.json").exists()
+
+    @staticmethod
+    def storage_of(version_dir) -> str:
+        """Kiểu lưu vectors hiện tại của version ("float32" nếu không có index nén)"""
+        try:
+            return json.loads((Path(version_dir) / INDEX_DIR_NAME / "meta.json").read_text())["storage"]
+        except (OSError, ValueError, KeyError):
+            return DEFAULT_VECTOR_STORAGE
+
+    @staticmethod
+    def remove(version_dir) -> None:
+        shutil.rmtree(Path(version_dir) / INDEX_DIR_NAME, ignore_errors=True)
+
+    @classmethod
+    def build(cls, version_dir, collection, storage: str) -> dict:
+        """
+        Đọc mọi embeddings của Chroma collection, nén và ghi ra thư mục quantized/
+        (ghi vào thư mục tạm rồi đổi tên → reader không thấy index ghi dở).
+        """
+        if storage not in VECTOR_STORAGE_OPTIONS or storage == DEFAULT_VECTOR_STORAGE:
+            raise ValueError(f"Unsupported vector storage: {storage}")
+
+        count = collection.count()
+        ids: List[str] = []
+        codes = scales = sq_norms = None
+        offset = 0
+        while offset < count:
+            page = collection.get(include=["embeddings"], limit=_READ_PAGE, offset=offset)
+            if not page["ids"]:
+                break
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if codes is None:
+                codes = np.empty((count, vectors.shape[1]), dtype=np.float16 if storage == "float16" else np.int8)
+                scales = np.empty(count, dtype=np.float32)
+                sq_norms = np.empty(count, dtype=np.float32)
+            rows = slice(len(ids), len(ids) + len(vectors))
+            codes[rows], page_scales = quantize(vectors, storage)
+            if page_scales is not None:
+                scales[rows] = page_scales
+            sq_norms[rows] = np.einsum("ij,ij->i", vectors, vectors)
+            ids.extend(page["ids"])
+            offset += len(page["ids"])
+
+        target = Path(version_dir) / INDEX_DIR_NAME
+        tmp = target.with_name(f"{INDEX_DIR_NAME}.{uuid.uuid4().hex}.tmp")
+        tmp.mkdir(parents=True)
+        n = len(ids)
+        dim = codes.shape[1] if codes is not None else 0
+        np.save(tmp / "codes.npy", codes[:n] if codes is not None else np.empty((0, 0), dtype=np.int8))
+        np.save(tmp / "sq_norms.npy", sq_norms[:n] if sq_norms is not None else np.empty(0, dtype=np.float32))
+        if storage == "int8":
+            np.save(tmp / "scales.npy", scales[:n] if scales is not None else np.empty(0, dtype=np.float32))
+        (tmp / "ids.json").write_text(json.dumps(ids))
+        meta = {"storage": storage, "space": collection_space(collection), "dim": dim, "count": n}
+        (tmp / "meta.json").write_text(json.dumps(meta))
+
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+        print(f"[QuantizedIndex] {storage} index for {n} vectors ({dim}d) at {target}")
+        return meta
+
+    def candidates(self, query: List[float], n: int) -> List[Tuple[str, float]]:
+        """Top-n (id, khoảng cách xấp xỉ) từ vectors nén"""
+        total = len(self.ids)
+        if total == 0 or n <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        best_rows, best_dist = [], []
+        for start in range(0, total, _SCAN_BLOCK):
+            block = np.asarray(self.codes[start:start + _SCAN_BLOCK], dtype=np.float32)
+            if self.scales is not None:
+                block *= self.scales[start:start + _SCAN_BLOCK, None]
+            dist = distances(block, query, self.space, self.sq_norms[start:start + _SCAN_BLOCK])
+            if len(dist) > n:
+                top = np.argpartition(dist, n - 1)[:n]
+            else:
+                top = np.arange(len(dist))
+            best_rows.append(top + start)
+            best_dist.append(dist[top])
+        rows = np.concatenate(best_rows)
+        dist = np.concatenate(best_dist)
+        order = np.argsort(dist)[:n]
+        return [(self.ids[rows[i]], float(dist[i])) for i in order]
+
+    def nbytes(self) -> Dict[str, int]:
+        """Dung lượng của index nén (codes) và float32 tương ứng"""
+        return {
+            "codes": int(self.codes.nbytes) + (int(self.scales.nbytes) if self.scales is not None else 0),
+            "float32": len(self.ids) * self.dim * 4
+        }
+
+
+def rescore(collection, query: List[float], candidate_ids: List[str], k: int, space: str) -> List[dict]:
+    """
+    Chấm điểm lại candidates bằng vectors float32 trong Chroma.
+    Ids không còn trong collection (vd. document vừa bị xóa) bị bỏ qua.
+
+    Returns:
+        list dict (id, document, metadata, distance), sắp theo distance tăng dần, tối đa k
+    """
+    if not candidate_ids:
+        return []
+    found = collection.get(ids=candidate_ids, include=["embeddings", "documents", "metadatas"])
+    if not found["ids"]:
+        return []
+    vectors = np.asarray(found["embeddings"], dtype=np.float32)
+    dist = distances(vectors, np.asarray(query, dtype=np.float32), space)
+    order = np.argsort(dist)[:k]
+    return [
+        {
+            "id": found["ids"][i],
+            "document": found["documents"][i],
+            "metadata": found["metadatas"][i] or {},
+            "distance": float(dist[i])
+        }
+        for i in order
+    ]
@@ -0,0 +1,104 @@
+"""
+Quantized Vector Store
+LangChain VectorStore bọc Chroma: tìm candidates trên index nén (quantized_index),
+chấm điểm lại bằng vectors float32 trong Chroma. Kết quả và scores có cùng dạng
+với Chroma (distance, càng nhỏ càng gần) nên chat/benchmark dùng được như cũ;
+các hàm *_with_relevance_scores trả về relevance (cao hơn = giống hơn) như NumpyVectorStore.
+
+Search có metadata filter, MMR và ghi dữ liệu được chuyển thẳng cho Chroma.
+"""
+
+from typing import Any, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from services.quantized_index import QuantizedIndex, rescore, RESCORE_FACTOR, RESCORE_MIN
+
+
+class QuantizedVectorStore(VectorStore):
+    """Chroma + index nén để tìm candidates"""
+
+    def __init__(self, store, index: QuantizedIndex, rescore_factor: int = RESCORE_FACTOR):
+        self.store = store
+        self.index = index
+        self.rescore_factor = rescore_factor
+
+    @property
+    def embeddings(self):
+        return self.store.embeddings
+
+    @property
+    def _collection(self):
+        return self.store._collection
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Build the Chroma store first, then wrap it with QuantizedVectorStore")
+
+    def add_texts(self, texts, metadatas=None, **kwargs) -> List[str]:
+        # Chunks mới chỉ có trong index nén sau lần build tiếp theo
+        return self.store.add_texts(texts, metadatas=metadatas, **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs):
+        return self.store.delete(ids=ids, **kwargs)
+
+    def _select_relevance_score_fn(self):
+        return self.store._select_relevance_score_fn()
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        if filter or kwargs.get("where_document"):
+            # Hàm này của Chroma trả về distance (không đổi sang relevance)
+            return self.store.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, filter=filter, **kwargs
+            )
+        candidates = self.index.candidates(embedding, max(k * self.rescore_factor, RESCORE_MIN))
+        rows = rescore(self.store._collection, embedding, [chunk_id for chunk_id, _ in candidates],
+                       k, self.index.space)
+        return [
+            (Document(page_content=row["document"], metadata=row["metadata"], id=row["id"]), row["distance"])
+            for row in rows
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Như similarity_search_by_vector_with_score nhưng score là relevance (cao hơn = giống hơn)"""
+        return self._to_relevance(self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, **kwargs))
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self.store.embeddings.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _to_relevance(self, results: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        relevance = self._select_relevance_score_fn()
+        return [(doc, relevance(score)) for doc, score in results]
+
+    def _similarity_search_with_relevance_scores(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self._to_relevance(self.similarity_search_with_score(query, k=k, **kwargs))
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.store.max_marginal_relevance_search(query, k=k, **kwargs)
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4,
+                                                **kwargs: Any) -> List[Document]:
+        return self.store.max_marginal_relevance_search_by_vector(embedding, k=k, **kwargs)
+
+
+def wrap_vector_store(store, version_dir):
+    """Bọc Chroma bằng QuantizedVectorStore nếu version có index nén, ngược lại trả về store"""
+    if QuantizedIndex.exists(version_dir):
+        return QuantizedVectorStore(store, QuantizedIndex(version_dir))
+    return store
@@ -0,0 +1,243 @@
+"""
+RAG Benchmark Service
+Đo chất lượng retrieval (recall@k, MRR) và latency của các RAG configuration
+trên một bộ query đã gán nhãn.
+
+Query set là file JSON (list) hoặc JSONL, mỗi query có dạng:
+    {
+        "query": "Làm sao để vượt qua nỗi buồn?",
+        "relevant": [{"source": "hieu-ve-trai-tim.pdf", "page": 12}],
+        "answer_contains": ["nỗi buồn"]
+    }
+
+Một chunk được coi là relevant nếu khớp một label trong "relevant"
+(tên file, và page nếu có) hoặc chứa một chuỗi trong "answer_contains".
+"""
+
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import json
+import re
+import time
+
+from sqlalchemy.orm import Session
+from models.rag_config import RAGConfig
+from models.model import Model
+
+
+BENCHMARK_RESULTS_DIR = Path("benchmark_results")
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số tokens (word pieces + dấu câu)"""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentile với nội suy tuyến tính (pct trong khoảng 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def load_query_set(path: str) -> List[Dict[str, Any]]:
+    """Load labeled query set từ file JSON hoặc JSONL"""
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".jsonl"):
+        queries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        queries = json.loads(text)
+    return validate_query_set(queries)
+
+
+def validate_query_set(queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Kiểm tra mỗi query có text và ít nhất một label"""
+    for i, item in enumerate(queries):
+        if not item.get("query"):
+            raise ValueError(f"Query #{i} has no 'query' text")
+        if not item.get("relevant") and not item.get("answer_contains"):
+            raise ValueError(f"Query #{i} has no 'relevant' or 'answer_contains' labels")
+    return queries
+
+
+def _label_matches(label: Dict[str, Any], doc) -> bool:
+    metadata = doc.metadata or {}
+    source = Path(str(metadata.get("source", ""))).name
+    if label.get("source") and not source.endswith(Path(label["source"]).name):
+        return False
+    if label.get("page") is not None and metadata.get("page") != label["page"]:
+        return False
+    return True
+
+
+def _matched_labels(item: Dict[str, Any], doc) -> List[int]:
+    """Trả về index của các labels mà chunk này khớp"""
+    labels = item.get("relevant", [])
+    matched = [i for i, label in enumerate(labels) if _label_matches(label, doc)]
+
+    content = doc.page_content.lower()
+    offset = len(labels)
+    for j, answer in enumerate(item.get("answer_contains", [])):
+        if answer.lower() in content:
+            matched.append(offset + j)
+    return matched
+
+
+def evaluate_query(item: Dict[str, Any], docs: List) -> Dict[str, Any]:
+    """Tính recall@k, reciprocal rank và context tokens cho một query"""
+    num_labels = len(item.get("relevant", [])) + len(item.get("answer_contains", []))
+    found = set()
+    reciprocal_rank = 0.0
+
+    for rank, doc in enumerate(docs, start=1):
+        matched = _matched_labels(item, doc)
+        if matched and reciprocal_rank == 0.0:
+            reciprocal_rank = 1.0 / rank
+        found.update(matched)
+
+    return {
+        "recall": len(found) / num_labels if num_labels else 0.0,
+        "reciprocal_rank": reciprocal_rank,
+        "context_tokens": sum(estimate_tokens(doc.page_content) for doc in docs)
+    }
+
+
+def run_benchmark(vector_store, queries: List[Dict[str, Any]], k: int,
+                  search_type: str = "similarity") -> Dict[str, Any]:
+    """
+    Chạy query set trên một vector store, trả về summary và kết quả từng query.
+    Retrieve giống chat (as_retriever theo search_type của config: similarity, mmr, ...).
+    """
+    per_query = []
+    latencies_ms = []
+    retriever = vector_store.as_retriever(search_type=search_type, search_kwargs={"k": k})
+
+    for item in queries:
+        started = time.perf_counter()
+        docs = retriever.invoke(item["query"])
+        latency_ms = (time.perf_counter() - started) * 1000
+        latencies_ms.append(latency_ms)
+
+        metrics = evaluate_query(item, docs)
+        metrics.update({"query": item["query"], "latency_ms": round(latency_ms, 2)})
+        per_query.append(metrics)
+
+    n = len(per_query)
+    return {
+        "k": k,
+        "num_queries": n,
+        "recall_at_k": round(sum(q["recall"] for q in per_query) / n, 4) if n else 0.0,
+        "mrr": round(sum(q["reciprocal_rank"] for q in per_query) / n, 4) if n else 0.0,
+        "avg_context_tokens": round(sum(q["context_tokens"] for q in per_query) / n, 1) if n else 0.0,
+        "p50_latency_ms": round(percentile(latencies_ms, 50) or 0.0, 2),
+        "p95_latency_ms": round(percentile(latencies_ms, 95) or 0.0, 2),
+        "per_query": per_query
+    }
+
+
+def benchmark_configs(
+    db: Session,
+    config_ids: List[int],
+    queries: List[Dict[str, Any]],
+    k: Optional[int] = None,
+    rag_processor=None
+) -> Dict[str, Any]:
+    """
+    Benchmark nhiều RAG configs trên cùng một query set.
+
+    Returns:
+        dict với keys: run_id, created_at, num_queries, rows (một row mỗi config)
+    """
+    if rag_processor is None:
+        from services.rag_processor import RAGProcessor
+        rag_processor = RAGProcessor()
+
+    rows = []
+    for config_id in config_ids:
+        config = db.query(RAGConfig).filter(RAGConfig.id == config_id).first()
+        if not config:
+            rows.append({"config_id": config_id, "success": False, "message": "RAG configuration not found"})
+            continue
+
+        embedding_model = db.query(Model).filter(Model.id == config.embedding_model_id).first()
+        if not embedding_model:
+            rows.append({"config_id": config_id, "success": False, "message": "Embedding model not found"})
+            continue
+
+        row = {
+            "config_id": config.id,
+            "config_name": config.config_name,
+            "embedding_model": embedding_model.model_name,
+            "chunk_size": config.chunk_size,
+            "chunk_overlap": config.chunk_overlap,
+            "search_type": config.search_type
+        }
+
+        try:
+            vector_store = rag_processor.load_vector_store(config.config_name, embedding_model.model_name,
+                                                           search_ef=config.hnsw_search_ef)
+            print(f"[Benchmark] Running {len(queries)} queries on '{config.config_name}'")
+            result = run_benchmark(vector_store, queries, k or config.k_value, config.search_type)
+            row.update(result)
+            row["success"] = True
+        except Exception as e:
+            print(f"[Benchmark] Error on '{config.config_name}': {str(e)}")
+            row.update({"success": False, "message": str(e)})
+
+        rows.append(row)
+
+    created_at = datetime.now()
+    return {
+        "run_id": created_at.strftime("%Y%m%d_%H%M%S_%f"),
+        "created_at": created_at.isoformat(),
+        "num_queries": len(queries),
+        "rows": rows
+    }
+
+
+def save_benchmark_run(run: Dict[str, Any]) -> str:
+    """Lưu kết quả benchmark ra benchmark_results/<run_id>.json"""
+    BENCHMARK_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = BENCHMARK_RESULTS_DIR / f"{run['run_id']}.json"
+    path.write_text(json.dumps(run, ensure_ascii=False, indent=2), encoding="utf-8")
+    return str(path)
+
+
+def list_benchmark_runs(limit: int = 20) -> List[Dict[str, Any]]:
+    """Lấy các lần chạy benchmark gần nhất (mới nhất trước)"""
+    if not BENCHMARK_RESULTS_DIR.exists():
+        return []
+    paths = sorted(BENCHMARK_RESULTS_DIR.glob("*.json"), reverse=True)[:limit]
+    return [json.loads(p.read_text(encoding="utf-8")) for p in paths]
+
+
+def comparison_table(runs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flatten các runs thành bảng so sánh (bỏ per-query details)"""
+    table = []
+    for run in runs:
+        for row in run.get("rows", []):
+            if not row.get("success"):
+                continue
+            table.append({
+                "run_id": run["run_id"],
+                "config_id": row["config_id"],
+                "config_name": row["config_name"],
+                "embedding_model": row["embedding_model"],
+                "chunk_size": row["chunk_size"],
+                "chunk_overlap": row["chunk_overlap"],
+                "search_type": row["search_type"],
+                "k": row["k"],
+                "recall_at_k": row["recall_at_k"],
+                "mrr": row["mrr"],
+                "avg_context_tokens": row["avg_context_tokens"],
+                "p50_latency_ms": row["p50_latency_ms"],
+                "p95_latency_ms": row["p95_latency_ms"]
+            })
+    return table
@@ -3,37 +3,136 @@ RAG Processor Service
 Xử lý việc load PDFs, split text, embedding và lưu vào Chroma vector store
 """
 
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Dict, Optional
+import hashlib
 import os
+import time
 
 try:
-    from langchain_community.document_loaders import PyPDFLoader
     from langchain_text_splitters import RecursiveCharacterTextSplitter
     from langchain_ollama import OllamaEmbeddings
     from langchain_chroma import Chroma
+    from services.vector_backends import (
+        open_vector_store, export_indexes, exports_match, refresh_exports, VECTOR_BACKENDS
+    )
     HAS_LANGCHAIN = True
 except ImportError:
     HAS_LANGCHAIN = False
 
+from services.pdf_loader import iter_extract_pdfs, PDF_WORKERS, PDF_TIMEOUT_S
+from services.ingest_pipeline import prefetch, iter_chunk_batches, PIPELINE_QUEUE_BATCHES
+from services.embedding_pipeline import BatchEmbedder, EMBED_BATCH_SIZE, EMBED_CONCURRENCY
+from services.embedding_cache import get_embedding_cache
+from services.index_checkpoint import IndexCheckpoint
+from services.page_cache import get_page_cache, compute_file_hash
+from services.vector_store_versions import VectorStoreVersions, safe_config_name, store_root
+from services.quantized_index import DEFAULT_VECTOR_STORAGE, VECTOR_STORAGE_OPTIONS
+from services.hnsw_config import hnsw_metadata, hnsw_build_matches, apply_search_ef, validate_hnsw_params
+from services.chunk_dedup import DEDUP_VERSION
+from services.index_stats import (
+    write_build_info, read_build_info, manifest_chunk_counts, manifest_references, release_references
+)
+from services.token_splitter import (
+    TokenTextSplitter, TEXT_SPLITTERS, DEFAULT_TEXT_SPLITTER, TOKEN_SPLITTER_VERSION,
+    check_token_encoding, encoding_fingerprint
+)
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# Tăng khi logic chunking thay đổi để invalidate các index cũ
+CHUNKING_VERSION = 1
+
+# Chroma giới hạn số records mỗi lần add/delete
+UPSERT_BATCH_SIZE = 256
+METADATA_PAGE_SIZE = 5000
+# Số lần làm lại việc xóa documents khi một build khác publish trong lúc đang xóa
+DELETE_PUBLISH_ATTEMPTS = 3
+
+
+class IndexingCancelled(Exception):
+    """Raise từ progress_callback để dừng process_rag_config giữa chừng"""
+
+
+def chunking_fingerprint(chunk_size: int, chunk_overlap: int, dedupe: bool = False,
+                         text_splitter: str = DEFAULT_TEXT_SPLITTER, token_encoding: Optional[str] = None) -> str:
+    """Các params ảnh hưởng tới nội dung chunks"""
+    if text_splitter == "token":
+        encoding = encoding_fingerprint(token_encoding)
+        fingerprint = f"token:{encoding}:{chunk_size}:{chunk_overlap}:v{TOKEN_SPLITTER_VERSION}"
+    else:
+        fingerprint = f"recursive:{chunk_size}:{chunk_overlap}:v{CHUNKING_VERSION}"
+    return f"{fingerprint}:dedup{DEDUP_VERSION}" if dedupe else fingerprint
+
+
+def make_text_splitter(text_splitter: str, chunk_size: int, chunk_overlap: int,
+                       token_encoding: Optional[str] = None):
+    """Splitter theo ký tự (recursive, LangChain) hoặc theo tokens (chunk_size/chunk_overlap tính bằng tokens)"""
+    if text_splitter == "token":
+        return TokenTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, encoding=token_encoding)
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True
+    )
+
+
+def index_key(doc_hash: str, fingerprint: str, embedding_model: str) -> str:
+    """
+    Key ổn định cho (nội dung document, chunking params, embedding model):
+    đổi embedding model → mọi keys đổi → vectors được embed lại bằng model mới
+    """
+    return hashlib.sha256(f"{doc_hash}|{fingerprint}|{embedding_model}".encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_id(key: str, chunk_index: int) -> str:
+    """Chunk id ổn định: cùng document + cùng params → cùng ids"""
+    return f"{key}-{chunk_index:06d}"
+
 
 class RAGProcessor:
     """Xử lý RAG: load PDFs, split, embed và lưu vào Chroma"""
 
-    def __init__(self, ollama_base_url: str = "http://localhost:11434"):
+    def __init__(
+        self,
+        ollama_base_url: str = OLLAMA_BASE_URL,
+        pdf_workers: int = PDF_WORKERS,
+        pdf_timeout: float = PDF_TIMEOUT_S,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+        embed_concurrency: int = EMBED_CONCURRENCY,
+        embedding_cache=None,
+        use_embedding_cache: bool = True,
+        pipeline_queue_batches: int = PIPELINE_QUEUE_BATCHES,
+        page_cache=None,
+        use_page_cache: bool = True
+    ):
         if not HAS_LANGCHAIN:
             raise ImportError(
                 "Langchain dependencies not installed. "
                 "Please install: pip install langchain langchain-community langchain-text-splitters langchain-ollama langchain-chroma"
             )
         self.ollama_base_url = ollama_base_url
+        self.pdf_workers = pdf_workers
+        self.pdf_timeout = pdf_timeout
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.pipeline_queue_batches = pipeline_queue_batches
+        self.embedding_cache = embedding_cache or (get_embedding_cache() if use_embedding_cache else None)
+        self.page_cache = page_cache or (get_page_cache() if use_page_cache else None)
         self.chroma_base_dir = Path("chroma_db")
         self.chroma_base_dir.mkdir(exist_ok=True)
 
     def get_vector_store_path(self, config_name: str) -> str:
-        """Generate vector store path từ config name"""
-        safe_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in config_name)
-        return str(self.chroma_base_dir / f"chroma_langchain_db_{safe_name}")
+        """Thư mục gốc của vector store (chứa các versions) của config"""
+        return str(store_root(config_name, self.chroma_base_dir))
+
+    def get_versions(self, config_name: str) -> VectorStoreVersions:
+        return VectorStoreVersions(self.get_vector_store_path(config_name))
+
+    def get_staging_path(self, config_name: str) -> str:
+        """Thư mục checkpoint của indexing đang dở"""
+        return str(self.chroma_base_dir / "staging" / safe_config_name(config_name))
 
     def process_rag_config(
         self,
@@ -41,93 +140,494 @@ class RAGProcessor:
         embedding_model_name: str,
         document_file_paths: List[str],
         chunk_size: int,
-        chunk_overlap: int
+        chunk_overlap: int,
+        document_ids: Optional[List[int]] = None,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        vector_storage: str = DEFAULT_VECTOR_STORAGE,
+        vector_backend: str = "chroma",
+        hnsw_params: Optional[dict] = None,
+        shared_from: Optional[str] = None,
+        dedupe_chunks: bool = False,
+        text_splitter: str = DEFAULT_TEXT_SPLITTER,
+        token_encoding: Optional[str] = None
     ) -> dict:
         """
-        Xử lý RAG configuration:
-        1. Load PDFs
-        2. Split text
-        3. Create embeddings
-        4. Store in Chroma
+        Xử lý RAG configuration (incremental, content-addressed):
+        1. Hash nội dung từng PDF → index_key = hash(content + chunking params + embedding model)
+        2. Xóa vectors của documents không còn trong config (hoặc đã thay đổi)
+        3. Load + split + embed chỉ các documents mới/thay đổi, theo streaming pipeline
+           (memory tối đa phụ thuộc batch size, không phụ thuộc số trang)
+        4. Chunks không đổi được giữ nguyên
+        5. Document index dở (có checkpoint trong staging) chạy tiếp từ batch đã commit cuối cùng
+        6. Build trên một version mới (copy của version hiện tại), xong mới publish
+           → chat luôn đọc một version hoàn chỉnh
+        7. vector_storage "float16"/"int8": ghi thêm index nén cho version (search trên
+           index nén, rescore bằng float32)
+        8. vector_backend "numpy": export version ra NumpyIndex mmap để chat search
+           không cần mở Chroma
+        9. hnsw_params (space, m, construction_ef, search_ef): collection_metadata của Chroma;
+           đổi space/M/construction_ef → collection mới, vectors copy từ version cũ
+        10. shared_from: tên config đã build với cùng embedding model và chunking (sweep build)
+           → documents đã có đủ chunks ở đó được copy (text + vectors), không parse/split/embed lại
+        11. dedupe_chunks: bỏ header/footer lặp lại và chunks trùng/gần trùng (MinHash) trong
+           từng document trước khi embed
+        12. text_splitter "token": chunk_size/chunk_overlap tính bằng tokens của token_encoding
+           (tên tiktoken hoặc tokenizer.json của embedding model, None → RAG_TOKEN_ENCODING) thay vì ký tự
+
+        progress_callback (nếu có) được gọi với dict tiến độ (stage, documents_total,
+        documents_done, pages_parsed, chunks_embedded); raise IndexingCancelled trong
+        callback để hủy, exception này được raise lại cho caller.
 
         Returns:
-            dict với keys: success, message, vector_store_path, num_chunks
+            dict với keys: success, message, vector_store_path, num_chunks, num_documents,
+            num_added_chunks, num_deleted_chunks, num_unchanged_documents
         """
+        progress = {
+            "stage": "hashing",
+            "documents_total": len(document_file_paths),
+            "documents_done": 0,
+            "pages_parsed": 0,
+            "chunks_embedded": 0
+        }
+
+        def report(**updates):
+            progress.update(updates)
+            if progress_callback:
+                progress_callback(dict(progress))
+
+        if vector_storage not in VECTOR_STORAGE_OPTIONS:
+            return {
+                "success": False,
+                "message": f"Unsupported vector storage '{vector_storage}' (options: {', '.join(VECTOR_STORAGE_OPTIONS)})"
+            }
+        if vector_backend not in VECTOR_BACKENDS:
+            return {
+                "success": False,
+                "message": f"Unsupported vector backend '{vector_backend}' (options: {', '.join(VECTOR_BACKENDS)})"
+            }
+        if text_splitter not in TEXT_SPLITTERS:
+            return {
+                "success": False,
+                "message": f"Unsupported text splitter '{text_splitter}' (options: {', '.join(TEXT_SPLITTERS)})"
+            }
+        if text_splitter == "token":
+            encoding_error = check_token_encoding(token_encoding)
+            if encoding_error:
+                return {"success": False, "message": encoding_error}
+        hnsw_params = hnsw_params or {}
+        hnsw_error = validate_hnsw_params(**hnsw_params)
+        if hnsw_error:
+            return {"success": False, "message": hnsw_error}
+        collection_metadata = hnsw_metadata(**hnsw_params)
+        shared_versions, shared_lease = None, None
+
         try:
-            # 1. Load PDFs
-            print(f"Loading {len(document_file_paths)} PDF files...")
-            documents = []
-            for pdf_path in document_file_paths:
+            report()
+            build_started = time.monotonic()
+            started_at = datetime.utcnow()
+            splitter = make_text_splitter(text_splitter, chunk_size, chunk_overlap, token_encoding)
+            # 1. Tính index_key cho từng document
+            fingerprint = chunking_fingerprint(chunk_size, chunk_overlap, dedupe_chunks, text_splitter, token_encoding)
+            wanted: Dict[str, dict] = {}
+            for i, pdf_path in enumerate(document_file_paths):
                 if not os.path.exists(pdf_path):
                     print(f"Warning: File not found: {pdf_path}")
                     continue
 
-                try:
-                    loader = PyPDFLoader(pdf_path)
-                    docs = loader.load()
-                    documents.extend(docs)
-                    print(f"Loaded {len(docs)} pages from {Path(pdf_path).name}")
-                except Exception as e:
-                    print(f"Error loading {pdf_path}: {str(e)}")
+                doc_hash = compute_file_hash(pdf_path)
+                key = index_key(doc_hash, fingerprint, embedding_model_name)
+                reference = {"document_id": document_ids[i] if document_ids else None, "source": pdf_path}
+                if key in wanted:
+                    # Cùng nội dung: chunks chỉ index một lần, document được ghi nhận trong manifest
+                    print(f"Duplicate content: {Path(pdf_path).name} shares chunks with "
+                          f"{Path(wanted[key]['path']).name}")
+                    wanted[key]["references"].append(reference)
                     continue
+                wanted[key] = {"path": pdf_path, "doc_hash": doc_hash, "references": [reference]}
 
-            if not documents:
+            if not wanted:
                 return {
                     "success": False,
                     "message": "No documents loaded successfully"
                 }
 
-            print(f"Total pages loaded: {len(documents)}")
-
-            # 2. Split text
-            print(f"Splitting text with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}...")
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap,
-                add_start_index=True
-            )
-            all_splits = text_splitter.split_documents(documents)
-            print(f"Created {len(all_splits)} text chunks")
-
-            if not all_splits:
-                return {
-                    "success": False,
-                    "message": "No text chunks created from documents"
-                }
-
-            # 3. Create embeddings và store in Chroma
+            # 2. Version gốc: version đang build dở (resume) hoặc version chat đang dùng
             print(f"Creating embeddings with model: {embedding_model_name}...")
             embeddings = OllamaEmbeddings(
                 base_url=self.ollama_base_url,
                 model=embedding_model_name
             )
 
-            vector_store_path = self.get_vector_store_path(config_name)
+            versions = self.get_versions(config_name)
+            checkpoint = IndexCheckpoint(self.get_staging_path(config_name))
+            current_version = versions.current_version()
+            building_version = versions.building_version()
+            if not building_version:
+                # Documents ghi nhận là xong của một build đã bỏ không còn đúng
+                checkpoint.clear_finished()
+            base_version = building_version or current_version
+            base_store = None
+            existing = {}
+            if base_version:
+                base_store = Chroma(
+                    persist_directory=str(versions.version_path(base_version)),
+                    embedding_function=embeddings
+                )
+                # Số chunks mong đợi: manifest của version + documents đã xong của build đang dở
+                expected_counts = manifest_chunk_counts(versions.version_path(base_version))
+                if building_version:
+                    expected_counts.update(checkpoint.finished())
+                existing = self._existing_chunks(base_store, expected_counts)
+
+            # 3. Xóa chunks không còn cần (document bị bỏ, đổi nội dung/params, hoặc index dở
+            #    mà không có checkpoint để chạy tiếp)
+            unchanged_keys = {
+                key for key in wanted
+                if key in existing and len(existing[key]["ids"]) == existing[key]["expected"]
+            }
+            checkpoint.discard_except(set(wanted) - unchanged_keys)
+
+            # Chunks không đổi giữ document đang gắn trong metadata nếu document đó vẫn dùng nội dung
+            # này; nếu không (document chính đã bị bỏ, còn document trùng nội dung) gắn lại metadata
+            reattributed = set()
+            for key in unchanged_keys:
+                references = wanted[key]["references"]
+                attributed = {"document_id": existing[key]["document_id"], "source": existing[key]["source"]}
+                if attributed in references:
+                    references.remove(attributed)
+                    references.insert(0, attributed)
+                    wanted[key]["path"] = attributed["source"]
+                else:
+                    reattributed.add(key)
+
+            # Chunks của config dùng chung (cùng index_key = cùng nội dung + chunking): copy thay vì embed
+            shared = set()
+            shared_collection = None
+            if shared_from:
+                shared_versions = self.get_versions(shared_from)
+                shared_version, shared_lease = shared_versions.acquire_current()
+                if shared_version:
+                    shared_store = Chroma(persist_directory=str(shared_versions.version_path(shared_version)))
+                    shared_collection = shared_store._collection
+                    shared_existing = self._existing_chunks(
+                        shared_store, manifest_chunk_counts(shared_versions.version_path(shared_version))
+                    )
+                    shared = {
+                        key for key in set(wanted) - unchanged_keys
+                        if key in shared_existing
+                        and len(shared_existing[key]["ids"]) == shared_existing[key]["expected"]
+                    }
+
+            # Text đã parse: page cache (theo hash nội dung, dùng chung mọi configs) hoặc staging của lần chạy trước
+            cached_pages = {}
+            if self.page_cache:
+                for key in set(wanted) - unchanged_keys - shared:
+                    path = self.page_cache.get(wanted[key]["doc_hash"])
+                    if path:
+                        cached_pages[key] = path
+            resumable = {
+                key for key in wanted
+                if key not in unchanged_keys and key not in shared
+                and (key in cached_pages or checkpoint.has_pages(key))
+            }
+
+            stale_ids = []
+            for key, chunk in existing.items():
+                complete = chunk["expected"] is not None and len(chunk["ids"]) == chunk["expected"]
+                if key not in wanted or (not complete and key not in resumable):
+                    stale_ids.extend(chunk["ids"])
+
+            exports_changed = (
+                current_version is None
+                or not exports_match(versions.version_path(current_version), vector_storage, vector_backend)
+            )
+            # HNSW space/M/construction_ef chỉ đặt được khi tạo collection
+            rebuild_collection = (
+                base_store is not None
+                and not hnsw_build_matches(base_store._collection.metadata, collection_metadata)
+            )
+            # Manifest phải ghi đủ documents dùng từng key (xóa document chỉ xóa chunks không còn ai dùng)
+            current_manifest = (
+                (read_build_info(versions.version_path(current_version)) or {}).get("manifest") or {}
+                if current_version else {}
+            )
+            references_changed = any(
+                key not in current_manifest or manifest_references(current_manifest[key]) != info["references"]
+                for key, info in wanted.items()
+            )
+            if (not stale_ids and len(unchanged_keys) == len(wanted) and base_version == current_version
+                    and not exports_changed and not rebuild_collection
+                    and not reattributed and not references_changed):
+                print(f"Vector store {versions.root.name} is up to date ({current_version})")
+                return {
+                    "success": True,
+                    "message": "Vector store is already up to date",
+                    "vector_store_path": str(versions.version_path(current_version)),
+                    "vector_store_version": current_version,
+                    "num_chunks": base_store._collection.count(),
+                    "num_documents": len(wanted),
+                    "num_pages_loaded": 0,
+                    "num_added_chunks": 0,
+                    "num_deleted_chunks": 0,
+                    "num_unchanged_documents": len(unchanged_keys),
+                    "num_resumed_documents": 0
+                }
+
+            # Build trên version mới; chat tiếp tục dùng version hiện tại cho tới khi publish
+            if rebuild_collection:
+                print(f"HNSW parameters changed ({collection_metadata}), building a new collection")
+                versions.abandon_build()
+                build_version = versions.begin_build(copy_current=False)
+            else:
+                build_version = versions.begin_build()
+            vector_store_path = str(versions.version_path(build_version))
             print(f"Storing vectors in: {vector_store_path}")
+            vector_store = Chroma(
+                persist_directory=vector_store_path,
+                embedding_function=embeddings,
+                collection_metadata=collection_metadata
+            )
+            if rebuild_collection:
+                # Lease giữ version gốc (có thể là version build dở vừa bỏ) cho tới khi copy xong
+                lease = versions.acquire(base_version)
+                try:
+                    report(stage="copying")
+                    copied = self._copy_chunks(base_store._collection, vector_store._collection)
+                    print(f"Copied {copied} chunks from version {base_version}")
+                    # Collection mới chưa có manifest: ghi nhận documents đã đủ chunks để resume được
+                    for key in unchanged_keys:
+                        checkpoint.finish(key, existing[key]["expected"])
+                finally:
+                    versions.release(lease)
+            else:
+                apply_search_ef(vector_store._collection, collection_metadata["hnsw:search_ef"])
+
+            if stale_ids:
+                self._delete_ids(vector_store, stale_ids)
+                print(f"Deleted {len(stale_ids)} stale chunks")
 
-            # Xóa thư mục cũ nếu tồn tại (để tránh duplicate data)
-            if os.path.exists(vector_store_path):
-                import shutil
-                shutil.rmtree(vector_store_path)
-                print(f"Removed existing vector store at {vector_store_path}")
-
-            # Tạo vector store mới
-            vector_store = Chroma.from_documents(
-                documents=all_splits,
-                embedding=embeddings,
-                persist_directory=vector_store_path
+            report(stage="parsing", documents_total=len(wanted), documents_done=len(unchanged_keys))
+
+            # 4. Streaming pipeline cho documents mới/thay đổi:
+            #    parse (process pool → file) → stream trang + split → batch → embed → upsert
+            embedded_before = 0
+            # embed() nhận tối đa UPSERT_BATCH_SIZE texts mỗi lần: giới hạn batch size (kể cả autotune)
+            # để mỗi lần vẫn đủ batches cho max_concurrency requests song song
+            embedder = BatchEmbedder(
+                embeddings,
+                batch_size=self.embed_batch_size,
+                max_concurrency=self.embed_concurrency,
+                max_batch_size=max(1, UPSERT_BATCH_SIZE // max(1, self.embed_concurrency)),
+                progress_callback=lambda stats: report(chunks_embedded=embedded_before + stats["chunks_embedded"])
             )
 
-            print(f"Successfully created vector store with {len(all_splits)} chunks")
+            def chunk_metadata(key: str) -> dict:
+                info = wanted[key]
+                # source ghi đè metadata của trang (text cache có thể đến từ một bản upload khác)
+                metadata = {"source": info["path"], "doc_hash": info["doc_hash"], "index_key": key}
+                if info["references"][0]["document_id"] is not None:
+                    metadata["document_id"] = info["references"][0]["document_id"]
+                return metadata
+
+            for key in sorted(reattributed):
+                self._update_metadata(vector_store._collection, existing[key]["ids"], chunk_metadata(key))
+            if reattributed:
+                print(f"Reattributed chunks of {len(reattributed)} documents shared by duplicate uploads")
+
+            # Manifest: số chunks mong đợi của từng document trong version (integrity check của index stats)
+            def manifest_entry(key: str, chunk_count: Optional[int] = None, error: Optional[str] = None) -> dict:
+                primary, *duplicates = wanted[key]["references"]
+                entry = {**primary, "chunk_count": chunk_count}
+                if duplicates:
+                    entry["duplicates"] = duplicates
+                if error:
+                    entry["error"] = error
+                return entry
+
+            manifest = {key: manifest_entry(key, existing[key]["expected"]) for key in unchanged_keys}
+            manifest.update({key: manifest_entry(key, shared_existing[key]["expected"]) for key in shared})
+
+            num_shared_chunks = 0
+            if shared:
+                report(stage="copying")
+                for key in sorted(shared):
+                    num_shared_chunks += self._copy_chunks(
+                        shared_collection, vector_store._collection,
+                        where={"index_key": key}, metadata=chunk_metadata(key)
+                    )
+                    checkpoint.finish(key, shared_existing[key]["expected"])
+                    report(documents_done=progress["documents_done"] + 1)
+                print(f"Copied {num_shared_chunks} chunks of {len(shared)} documents from {shared_from}")
+
+            def parsed_documents():
+                # Documents đã có text (page cache hoặc lần chạy trước): không parse,
+                # chạy tiếp từ batch đã commit cuối cùng
+                for key in sorted(resumable):
+                    committed = checkpoint.committed(key)
+                    # Store thiếu chunks đã ghi nhận là committed (vd. bị xóa tay) → upsert lại từ đầu
+                    if len(existing.get(key, {}).get("ids", [])) < committed:
+                        committed = 0
+                    pages_path = cached_pages.get(key) or checkpoint.pages_path(key)
+                    yield {"key": key, "path": wanted[key]["path"], "pages_path": pages_path,
+                           "metadata": chunk_metadata(key), "skip": committed}
+
+                to_parse = {
+                    wanted[key]["path"]: key for key in wanted
+                    if key not in unchanged_keys and key not in resumable and key not in shared
+                }
+                if to_parse:
+                    print(f"Parsing {len(to_parse)} PDF files with {self.pdf_workers} workers...")
+                # Ghi thẳng vào page cache → lần index sau (config khác, chunking khác) không parse lại
+                pages_paths = {
+                    path: self.page_cache.path_for(wanted[key]["doc_hash"]) if self.page_cache
+                    else checkpoint.pages_path(key)
+                    for path, key in to_parse.items()
+                }
+                for parsed in iter_extract_pdfs(pages_paths, max_workers=self.pdf_workers, timeout=self.pdf_timeout):
+                    key = to_parse[parsed["path"]]
+                    if not parsed["error"]:
+                        print(f"Parsed {parsed['num_pages']} pages from {Path(parsed['path']).name} "
+                              f"in {parsed['elapsed']:.1f}s")
+                    yield {"key": key, "path": parsed["path"], "pages_path": parsed["pages_path"],
+                           "metadata": chunk_metadata(key), "error": parsed["error"]}
+
+            num_added = 0
+            num_pages = 0
+            resumed_keys = set()
+            removed = {"furniture_lines": 0, "exact_duplicates": 0, "near_duplicates": 0}
+            batches = prefetch(
+                iter_chunk_batches(parsed_documents(), splitter, UPSERT_BATCH_SIZE, dedupe=dedupe_chunks),
+                maxsize=self.pipeline_queue_batches
+            )
+            try:
+                for event in batches:
+                    key = event["key"]
+                    name = Path(event["path"]).name if "path" in event else key
+
+                    if event["type"] == "document_error":
+                        print(f"Error loading {event['path']}: {event['error']}")
+                        # Lỗi có thể đến sau vài batches: bỏ các chunks dở của document
+                        vector_store._collection.delete(where={"index_key": key})
+                        manifest[key] = manifest_entry(key, error=event["error"])
+                        checkpoint.finish(key)
+                        report(documents_done=progress["documents_done"] + 1)
+
+                    elif event["type"] == "document_start":
+                        if event["skip"]:
+                            resumed_keys.add(key)
+                            print(f"Resuming {name} from chunk {event['skip']}")
+                        report(stage="embedding")
+
+                    elif event["type"] == "batch":
+                        texts = event["texts"]
+                        # Embedder chỉ đếm chunks cache miss, cộng thêm các batches đã xong
+                        embedded_before = num_added - embedder.chunks_embedded
+                        vectors = self._embed_texts(embedder, embedding_model_name, texts)
+                        batch_end = event["start"] + len(texts)
+                        vector_store._collection.upsert(
+                            ids=[chunk_id(key, n) for n in range(event["start"], batch_end)],
+                            embeddings=vectors,
+                            documents=texts,
+                            metadatas=event["metadatas"]
+                        )
+                        checkpoint.mark_committed(key, batch_end)
+                        num_added += len(texts)
+                        report(chunks_embedded=num_added)
+
+                    elif event["type"] == "document_end":
+                        num_pages += event["num_pages"]
+                        for counter in removed:
+                            removed[counter] += event.get(counter, 0)
+                        if event.get("exact_duplicates") or event.get("near_duplicates"):
+                            print(f"Dropped {event['exact_duplicates']} duplicate and {event['near_duplicates']} "
+                                  f"near-duplicate chunks from {name}")
+                        if event["chunk_count"] == 0:
+                            print(f"No text chunks created from {name}")
+                        else:
+                            print(f"Indexed {name}: {event['chunk_count']} chunks")
+                        manifest[key] = manifest_entry(key, event["chunk_count"])
+                        checkpoint.finish(key, event["chunk_count"])
+                        report(documents_done=progress["documents_done"] + 1, pages_parsed=num_pages)
+            finally:
+                # Dừng các stage phía trước ngay (vd. khi bị cancel) để kill process pool
+                batches.close()
+
+            num_chunks = vector_store._collection.count()
+            if num_chunks == 0:
+                return {
+                    "success": False,
+                    "message": "No text chunks created from documents"
+                }
+
+            # Index phục vụ search (nén / numpy) được build lại từ toàn bộ collection mỗi lần publish
+            report(stage="exporting")
+            export_indexes(vector_store_path, vector_store._collection, vector_storage, vector_backend)
+
+            build_seconds = time.monotonic() - build_started
+            build_stats = {
+                "version": build_version,
+                "started_at": started_at.isoformat(),
+                "finished_at": datetime.utcnow().isoformat(),
+                "duration_s": round(build_seconds, 2),
+                "embedding_model": embedding_model_name,
+                "chunking": fingerprint,
+                "num_documents": len(wanted),
+                "num_pages_loaded": num_pages,
+                "num_chunks": num_chunks,
+                "num_added_chunks": num_added,
+                "num_deleted_chunks": len(stale_ids),
+                "num_shared_chunks": num_shared_chunks,
+                "chunks_per_sec": round(num_added / build_seconds, 2) if build_seconds else 0.0,
+                "embedding": embedder.stats(),
+                "dedupe": {"enabled": dedupe_chunks, **removed},
+                "vector_storage": vector_storage,
+                "vector_backend": vector_backend,
+                "hnsw": collection_metadata
+            }
+            write_build_info(vector_store_path, build_stats, manifest)
+
+            versions.publish(build_version)
+            checkpoint.clear_finished()
+            versions.gc()
+            report(stage="done")
+            print(f"Vector store ready: {num_chunks} chunks "
+                  f"(+{num_added} added, -{len(stale_ids)} deleted, {len(unchanged_keys)} documents unchanged, "
+                  f"{len(resumed_keys)} resumed, {len(shared)} shared)")
+            if dedupe_chunks:
+                print(f"Dedupe: removed {removed['furniture_lines']} header/footer lines, "
+                      f"{removed['exact_duplicates']} duplicate and {removed['near_duplicates']} near-duplicate chunks")
+            if num_added:
+                print(f"Embedding stats: {embedder.stats()}")
+            if self.embedding_cache:
+                print(f"Embedding cache: {self.embedding_cache.stats()}")
 
             return {
                 "success": True,
                 "message": f"RAG processing completed successfully",
                 "vector_store_path": vector_store_path,
-                "num_chunks": len(all_splits),
-                "num_documents": len(documents)
+                "vector_store_version": build_version,
+                "num_chunks": num_chunks,
+                "num_documents": len(wanted),
+                "num_pages_loaded": num_pages,
+                "num_added_chunks": num_added,
+                "num_deleted_chunks": len(stale_ids),
+                "num_unchanged_documents": len(unchanged_keys),
+                "num_resumed_documents": len(resumed_keys),
+                "num_cached_documents": len(cached_pages),
+                "num_shared_documents": len(shared),
+                "num_shared_chunks": num_shared_chunks,
+                "dedupe": {"enabled": dedupe_chunks, **removed},
+                "text_splitter": text_splitter,
+                "build_seconds": round(build_seconds, 2),
+                "vector_storage": vector_storage,
+                "vector_backend": vector_backend,
+                "hnsw": collection_metadata,
+                "embedding_stats": embedder.stats()
             }
 
+        except IndexingCancelled:
+            print(f"RAG processing cancelled for {config_name}")
+            raise
         except Exception as e:
             print(f"Error in RAG processing: {str(e)}")
             import traceback
@@ -136,24 +636,204 @@ class RAGProcessor:
                 "success": False,
                 "message": f"RAG processing failed: {str(e)}"
             }
+        finally:
+            if shared_lease:
+                shared_versions.release(shared_lease)
+
+    def _embed_texts(self, embedder: BatchEmbedder, embedding_model_name: str, texts: List[str]) -> List[List[float]]:
+        """Lấy embeddings từ cache trước, chỉ gọi Ollama cho các texts chưa có"""
+        if not self.embedding_cache:
+            return embedder.embed(texts)
+
+        vectors = self.embedding_cache.get_many(embedding_model_name, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_vectors = embedder.embed(missing_texts)
+            self.embedding_cache.put_many(embedding_model_name, missing_texts, new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+        print(f"[EmbeddingCache] {len(texts) - len(missing)}/{len(texts)} chunks served from cache")
+        return vectors
+
+    def delete_document_vectors(self, config_name: str, document_ids: List[int],
+                                file_paths: Optional[List[str]] = None) -> int:
+        """
+        Xóa chunks của documents khỏi vector store (version hiện tại và version đang build)
+        ngay lập tức, không cần chờ lần index tiếp theo.
+        Chunks còn được một document trùng nội dung dùng (theo manifest) được giữ lại và gắn
+        lại cho document đó. Chunks cũ không có document_id được tìm theo metadata "source".
+
+        Version hiện tại đang mở cho chat nên không sửa tại chỗ: copy sang version mới, xóa và
+        export lại trên bản copy rồi publish atomic (như một lần build). Nếu một build khác đã
+        publish trong lúc đó thì làm lại trên version mới đó.
+
+        Returns:
+            Số chunks đã xóa khỏi version hiện tại
+        """
+        file_paths = file_paths or []
+        versions = self.get_versions(config_name)
+        deleted_current = 0
+        for _ in range(DELETE_PUBLISH_ATTEMPTS):
+            current, lease = versions.acquire_current()
+            if current is None:
+                break
+            try:
+                if not self._references_documents(versions.version_path(current), document_ids, file_paths):
+                    break
+                version, copy_lease = versions.copy_version(current)
+            finally:
+                versions.release(lease)
+
+            # Bản copy chưa publish bị GC dọn khi nhả lease nếu không publish được
+            try:
+                version_path = versions.version_path(version)
+                collection = Chroma(persist_directory=str(version_path))._collection
+                deleted_current = self._remove_documents(config_name, version, collection,
+                                                         document_ids, file_paths)
+                # Index phục vụ search (nén / numpy) cũng phải bỏ các chunks này, trước khi publish
+                refresh_exports(version_path, collection)
+                published = versions.publish(version, expected_current=current)
+            finally:
+                versions.release(copy_lease)
+            if published:
+                versions.gc()
+                break
+            print(f"[VectorStore] {config_name}: version changed while deleting documents {document_ids}, retrying")
+        else:
+            raise RuntimeError(f"Vector store {config_name} kept changing while deleting documents {document_ids}")
+
+        # Version đang build chưa publish (chat không đọc) nên sửa tại chỗ. BUILDING ghi trước lần
+        # publish ở trên thì đọc thấy ở đây; ghi sau thì begin_build đã copy lại từ version mới
+        building = versions.building_version()
+        if building:
+            version_path = versions.version_path(building)
+            collection = Chroma(persist_directory=str(version_path))._collection
+            self._remove_documents(config_name, building, collection, document_ids, file_paths)
+        return deleted_current
+
+    def _references_documents(self, version_path: Path, document_ids: List[int], file_paths: List[str]) -> bool:
+        """Version có chunks hoặc mục manifest nào của các documents không (để không copy version vô ích)"""
+        manifest = (read_build_info(version_path) or {}).get("manifest") or {}
+        for entry in manifest.values():
+            for reference in manifest_references(entry):
+                if reference.get("document_id") in document_ids or reference.get("source") in file_paths:
+                    return True
+        collection = Chroma(persist_directory=str(version_path))._collection
+        filters = [{"document_id": doc_id} for doc_id in document_ids]
+        filters += [{"source": path} for path in file_paths]
+        return any(collection.get(where=where, limit=1, include=[])["ids"] for where in filters)
+
+    def _remove_documents(self, config_name: str, version: str, collection,
+                          document_ids: List[int], file_paths: List[str]) -> int:
+        """Xóa chunks của documents khỏi một version chưa publish (sửa tại chỗ), trả về số chunks đã xóa"""
+        versions = self.get_versions(config_name)
+        released, reassigned = release_references(versions.version_path(version), document_ids, file_paths)
 
-    def load_vector_store(self, config_name: str, embedding_model_name: str):
-        """Load existing vector store"""
+        ids = set()
+        filters = [{"document_id": doc_id} for doc_id in document_ids]
+        filters += [{"source": path} for path in file_paths]
+        filters += [{"index_key": key} for key in released or ()]
+        for where in filters:
+            page = collection.get(where=where, include=["metadatas"])
+            ids.update(
+                chunk_id_ for chunk_id_, metadata in zip(page["ids"], page["metadatas"])
+                if (metadata or {}).get("index_key") not in reassigned
+            )
+        ids = sorted(ids)
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            collection.delete(ids=ids[start:start + UPSERT_BATCH_SIZE])
+        if ids:
+            print(f"[VectorStore] {config_name}/{version}: deleted {len(ids)} chunks "
+                  f"of documents {document_ids}")
+        for key, entry in reassigned.items():
+            metadata = {"source": entry["source"]}
+            if entry.get("document_id") is not None:
+                metadata["document_id"] = entry["document_id"]
+            key_ids = collection.get(where={"index_key": key}, include=[])["ids"]
+            self._update_metadata(collection, key_ids, metadata)
+        if reassigned:
+            print(f"[VectorStore] {config_name}/{version}: kept chunks of {len(reassigned)} documents "
+                  f"still used by duplicate uploads")
+        return len(ids)
+
+    def _copy_chunks(self, source, target, where: Optional[dict] = None, metadata: Optional[dict] = None) -> int:
+        """
+        Copy chunks (vectors, texts, metadatas) giữa hai Chroma collections
+        (where: chỉ các chunks khớp filter; metadata: ghi đè lên metadata của từng chunk)
+        """
+        copied = 0
+        while True:
+            page = source.get(where=where, include=["embeddings", "documents", "metadatas"],
+                              limit=UPSERT_BATCH_SIZE, offset=copied)
+            if not page["ids"]:
+                return copied
+            metadatas = page["metadatas"]
+            if metadata:
+                metadatas = [{**(m or {}), **metadata} for m in metadatas]
+            target.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                          documents=page["documents"], metadatas=metadatas)
+            copied += len(page["ids"])
+
+    def _update_metadata(self, collection, ids: List[str], metadata: dict) -> None:
+        """Ghi đè các keys của metadata lên metadata hiện có của chunks (không đụng tới vectors/text)"""
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            page = collection.get(ids=ids[start:start + UPSERT_BATCH_SIZE], include=["metadatas"])
+            collection.update(ids=page["ids"], metadatas=[{**(m or {}), **metadata} for m in page["metadatas"]])
+
+    def _delete_ids(self, vector_store, ids: List[str]) -> None:
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            vector_store.delete(ids=ids[start:start + UPSERT_BATCH_SIZE])
+
+    def _existing_chunks(self, vector_store, expected_counts: Optional[Dict[str, int]] = None) -> Dict[str, dict]:
+        """
+        Đọc metadata của store hiện có, group theo index_key.
+        Chunks cũ không có index_key (store build trước đây) được gom vào key "" để xóa.
+        expected_counts: số chunks mong đợi của documents đã index xong (manifest / checkpoint);
+        store build trước đây có chunk_count trong metadata từng chunk.
+        """
+        expected_counts = expected_counts or {}
+        existing: Dict[str, dict] = {}
+        offset = 0
+        while True:
+            page = vector_store._collection.get(include=["metadatas"], limit=METADATA_PAGE_SIZE, offset=offset)
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            for chunk_id_, metadata in zip(ids, page.get("metadatas") or []):
+                metadata = metadata or {}
+                key = metadata.get("index_key", "")
+                entry = existing.setdefault(key, {
+                    "ids": [],
+                    "expected": expected_counts.get(key, metadata.get("chunk_count")) if key else None,
+                    "document_id": metadata.get("document_id"),
+                    "source": metadata.get("source")
+                })
+                entry["ids"].append(chunk_id_)
+            offset += len(ids)
+        return existing
+
+    def load_vector_store(self, config_name: str, embedding_model_name: str, search_ef: Optional[int] = None):
+        """Load version hiện tại của vector store (giữ lease tới khi object bị giải phóng)"""
         try:
-            vector_store_path = self.get_vector_store_path(config_name)
+            versions = self.get_versions(config_name)
+            version, lease = versions.acquire_current()
 
-            if not os.path.exists(vector_store_path):
-                raise FileNotFoundError(f"Vector store not found at {vector_store_path}")
+            if version is None:
+                raise FileNotFoundError(f"Vector store not found at {versions.root}")
+            vector_store_path = str(versions.version_path(version))
 
             embeddings = OllamaEmbeddings(
                 base_url=self.ollama_base_url,
                 model=embedding_model_name
             )
 
-            vector_store = Chroma(
-                persist_directory=vector_store_path,
-                embedding_function=embeddings
-            )
+            try:
+                vector_store = open_vector_store(vector_store_path, embeddings, search_ef=search_ef)
+            except Exception:
+                versions.release(lease)
+                raise
+            versions.hold(vector_store, lease)
 
             return vector_store
 
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from database.connection import get_db
+from database.connection import get_db, SessionLocal
 from models.rag_config import RAGConfig
 from models.document import Document
 from models.rag_document import RagDocument
 from models.model import Model
+from models.index_job import IndexJob
 from schemas.rag_config_schema import RAGConfigCreate, RAGConfigUpdate, RAGConfigOut
 from schemas.document_schema import DocumentCreate, DocumentUpdate, DocumentOut
 
@@ -15,17 +18,48 @@ try:
 except ImportError as e:
     print(f"Warning: RAGProcessor not available: {e}")
     HAS_RAG_PROCESSOR = False
+from services.storage_gc import collect_garbage, drop_config_store
+from services.quantized_index import VECTOR_STORAGE_OPTIONS
+from services.numpy_index import VECTOR_BACKENDS
+from services.token_splitter import TEXT_SPLITTERS, check_token_encoding
+from services.hnsw_config import validate_hnsw_params
+from services.page_cache import get_page_cache, compute_file_hash
+from services.pdf_loader import iter_read_pdf_info, PDF_WORKERS
+from services.index_snapshot import export_snapshot, import_snapshot, SnapshotError, SNAPSHOT_DIR
+
 from schemas.rag_document_schema import RagDocumentCreate, RagDocumentBatchCreate, RagDocumentOut, RagDocumentWithDetails
 from schemas.model_schema import ModelCreate, ModelUpdate, ModelOut
+from schemas.benchmark_schema import BenchmarkRequest
+from schemas.index_job_schema import IndexJobOut, SweepBuildRequest
+from services.rag_benchmark import (
+    benchmark_configs, validate_query_set, save_benchmark_run,
+    list_benchmark_runs, comparison_table
+)
+from services.index_jobs import (
+    enqueue_job, request_cancel, retry_job, job_to_dict, TERMINAL_STATUSES
+)
 from auth.auth import get_current_user
 from models.user import User
 from typing import List, Optional
 from datetime import datetime
+import hashlib
+import json
 import os
 import shutil
+import time
+import uuid
+import zipfile
 from pathlib import Path
 
 
+# Đổi các fields này → build lại index. Embedding model/chunking đổi index_key của mọi documents
+# (embed lại), các fields còn lại dùng lại vectors của version hiện tại/embedding cache.
+# hnsw_search_ef không cần: chat áp dụng khi mở store
+_REINDEX_FIELDS = ("embedding_model_id", "chunk_size", "chunk_overlap", "text_splitter", "token_encoding",
+                   "dedupe_chunks", "vector_storage", "vector_backend", "hnsw_space", "hnsw_m",
+                   "hnsw_construction_ef")
+
+
 router = APIRouter(prefix="/rag-configs", tags=["RAG Configurations"])
 
 
@@ -37,6 +71,9 @@ def create_rag_config(
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admin can create RAG configurations")
+    _check_index_options(config.vector_storage, config.vector_backend)
+    _check_text_splitter(config.text_splitter, config.token_encoding)
+    _check_hnsw_params(config.hnsw_space, config.hnsw_m, config.hnsw_construction_ef, config.hnsw_search_ef)
 
     new_config = RAGConfig(
         config_name=config.config_name,
@@ -44,9 +81,18 @@ def create_rag_config(
         embedding_model_id=config.embedding_model_id,
         chunk_size=config.chunk_size,
         chunk_overlap=config.chunk_overlap,
+        text_splitter=config.text_splitter,
+        token_encoding=config.token_encoding,
         search_type=config.search_type,
         k_value=config.k_value,
-        prompt_template=config.prompt_template
+        prompt_template=config.prompt_template,
+        vector_storage=config.vector_storage,
+        vector_backend=config.vector_backend,
+        hnsw_space=config.hnsw_space,
+        hnsw_m=config.hnsw_m,
+        hnsw_construction_ef=config.hnsw_construction_ef,
+        hnsw_search_ef=config.hnsw_search_ef,
+        dedupe_chunks=config.dedupe_chunks
     )
 
     db.add(new_config)
@@ -90,14 +136,66 @@ def update_rag_config(
         raise HTTPException(status_code=404, detail="RAG configuration not found")
 
     update_data = config_update.model_dump(exclude_unset=True)
+    _check_index_options(update_data.get("vector_storage", config.vector_storage),
+                         update_data.get("vector_backend", config.vector_backend))
+    _check_text_splitter(update_data.get("text_splitter", config.text_splitter),
+                         update_data.get("token_encoding", config.token_encoding))
+    _check_hnsw_params(update_data.get("hnsw_space"), update_data.get("hnsw_m"),
+                       update_data.get("hnsw_construction_ef"), update_data.get("hnsw_search_ef"))
+    index_changed = any(
+        field in update_data and update_data[field] != getattr(config, field) for field in _REINDEX_FIELDS
+    )
     for field, value in update_data.items():
         setattr(config, field, value)
 
     db.commit()
     db.refresh(config)
+
+    # Đổi embedding model/chunking/kiểu lưu vectors/backend/HNSW → build lại index
+    if index_changed and HAS_RAG_PROCESSOR:
+        document_ids = [
+            doc_id for (doc_id,) in
+            db.query(RagDocument.document_id).filter(RagDocument.rag_config_id == config_id).all()
+        ]
+        if document_ids:
+            job = enqueue_job(db, config_id, document_ids)
+            print(f"[RAGConfig] {config.config_name}: index options changed, queued index job {job.id}")
     return config
 
 
+def _check_hnsw_params(space: Optional[str], m: Optional[int],
+                       construction_ef: Optional[int], search_ef: Optional[int]) -> None:
+    error = validate_hnsw_params(space, m, construction_ef, search_ef)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+
+def _check_index_options(vector_storage: Optional[str], vector_backend: Optional[str]) -> None:
+    if vector_storage not in VECTOR_STORAGE_OPTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"vector_storage must be one of: {', '.join(VECTOR_STORAGE_OPTIONS)}"
+        )
+    if vector_backend not in VECTOR_BACKENDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"vector_backend must be one of: {', '.join(VECTOR_BACKENDS)}"
+        )
+
+
+def _check_text_splitter(text_splitter: Optional[str], token_encoding: Optional[str] = None) -> None:
+    if text_splitter not in TEXT_SPLITTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"text_splitter must be one of: {', '.join(TEXT_SPLITTERS)}"
+        )
+    # Encoding không load được (thiếu thư viện, offline chưa có cache) → báo ngay, không đợi index job lỗi
+    if text_splitter == "token":
+        error = check_token_encoding(token_encoding)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+
+
 @router.delete("/{config_id}")
 def delete_rag_config(
     config_id: int,
@@ -111,9 +209,22 @@ def delete_rag_config(
     if not config:
         raise HTTPException(status_code=404, detail="RAG configuration not found")
 
+    config_name = config.config_name
     db.delete(config)
     db.commit()
-    return {"message": f"RAG configuration '{config.config_name}' deleted successfully"}
+
+    # Xóa vector store + staging nếu không còn config nào khác dùng chung tên store
+    storage = None
+    if not db.query(RAGConfig).filter(RAGConfig.config_name == config_name).first():
+        try:
+            storage = drop_config_store(config_name)
+        except Exception as e:
+            print(f"Warning: Could not delete vector store of '{config_name}': {str(e)}")
+
+    return {
+        "message": f"RAG configuration '{config_name}' deleted successfully",
+        "storage": storage
+    }
 
 
 # ========================= DOCUMENT MANAGEMENT ENDPOINTS =========================
@@ -122,18 +233,36 @@ def delete_rag_config(
 UPLOAD_DIR = Path("uploads/documents")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Kích thước tối đa của một file upload
+UPLOAD_MAX_BYTES = int(float(os.getenv("RAG_UPLOAD_MAX_MB", "200")) * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Parse text các trang vào page cache ngay sau upload (mặc định, client có thể tắt cho từng upload)
+UPLOAD_CACHE_PAGES = os.getenv("RAG_UPLOAD_CACHE_PAGES", "1") not in ("0", "false", "False")
+
+# Số PDFs tối đa của một bulk upload (tính cả các entries trong ZIP)
+BULK_UPLOAD_MAX_FILES = int(os.getenv("RAG_BULK_UPLOAD_MAX_FILES", "5000"))
+
+# Fields của Document lấy từ PDF khi client không gửi
+_PDF_INFO_FIELDS = ("title", "author", "total_pages", "creation_date")
+
 
 @router.post("/documents/upload", response_model=DocumentOut)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     title: Optional[str] = Form(None),
     author: Optional[str] = Form(None),
     total_pages: Optional[int] = Form(None),
     creation_date: Optional[str] = Form(None),
+    cache_pages: bool = Form(UPLOAD_CACHE_PAGES),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Upload document file và lưu thông tin vào database"""
+    """
+    Upload document file và lưu thông tin vào database.
+    Số trang, title, author, creation date không được gửi → đọc từ PDF ở background
+    (cùng với parse text vào page cache nếu cache_pages), response không phải chờ.
+    """
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admin can upload documents")
 
@@ -141,17 +270,34 @@ async def upload_document(
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-    # Tạo unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{timestamp}_{file.filename}"
-    file_path = UPLOAD_DIR / filename
+    if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File is larger than {UPLOAD_MAX_BYTES // (1024 * 1024)} MB")
 
-    # Save file to disk
+    # Ghi vào file tạm (streaming, hash trong lúc ghi), trùng nội dung → dùng lại document đã có
+    part_path = UPLOAD_DIR / f".{uuid.uuid4().hex}.part"
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        content_hash, size = await _stream_upload(file, part_path)
+        existing = await run_in_threadpool(_find_document_by_hash, db, content_hash, size)
+        if existing:
+            if not os.path.exists(existing.file_path):
+                # File của document đã bị mất trên disk → khôi phục bằng bản vừa upload
+                await run_in_threadpool(os.replace, part_path, existing.file_path)
+            print(f"Upload of '{file.filename}' has the same content as document {existing.id}, reusing it")
+            if existing.total_pages is None:
+                missing = [field for field in _PDF_INFO_FIELDS if getattr(existing, field) is None]
+                background_tasks.add_task(_process_uploads, [(existing.id, existing.file_path, missing)], cache_pages)
+            return existing
+
+        # Tạo unique filename (không ghi đè file cùng tên upload trong cùng giây)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path = await run_in_threadpool(_unique_upload_path, timestamp, Path(file.filename).name)
+        await run_in_threadpool(os.replace, part_path, file_path)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    finally:
+        await run_in_threadpool(part_path.unlink, missing_ok=True)
 
     # Parse creation_date if provided
     parsed_creation_date = None
@@ -161,23 +307,355 @@ async def upload_document(
         except ValueError:
             pass
 
-    # Lưu thông tin vào database
+    # Lưu thông tin vào database (title tạm là tên file cho tới khi đọc được title trong PDF)
     new_document = Document(
         file_name=file.filename,
         file_path=str(file_path),
         title=title or file.filename.replace('.pdf', ''),
         author=author,
         total_pages=total_pages,
-        creation_date=parsed_creation_date
+        creation_date=parsed_creation_date,
+        content_hash=content_hash
     )
 
     db.add(new_document)
     db.commit()
     db.refresh(new_document)
 
+    from_pdf = [field for field, value in (("title", title), ("author", author), ("total_pages", total_pages),
+                                           ("creation_date", parsed_creation_date)) if not value]
+    background_tasks.add_task(_process_uploads, [(new_document.id, str(file_path), from_pdf)], cache_pages)
+
     return new_document
 
 
+@router.post("/documents/bulk-upload")
+def bulk_upload_documents(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    rag_config_id: Optional[int] = Form(None),
+    cache_pages: bool = Form(UPLOAD_CACHE_PAGES),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Upload nhiều PDFs và/hoặc ZIP archives (chứa PDFs) trong một request.
+
+    - Mỗi PDF (mỗi entry của ZIP) được ghi ra disk theo từng block; ZIP được đọc từ file tạm
+      của request theo từng entry, không load cả archive vào memory
+    - Trùng nội dung với document đã có (hoặc với file khác trong batch) → dùng lại document đó
+    - Documents mới được insert trong một transaction
+    - rag_config_id: thêm documents vào config (giữ documents đã gán) và queue một index job
+    - Số trang/metadata và page cache được đọc ở background như upload đơn lẻ
+
+    Rất nhiều files nên gửi dạng ZIP (multipart parser giới hạn số files mỗi request).
+
+    Returns:
+        Dict với số file created/duplicate/failed/skipped, kết quả từng file và index job (nếu có)
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can upload documents")
+
+    config = None
+    if rag_config_id is not None:
+        config = db.query(RAGConfig).filter(RAGConfig.id == rag_config_id).first()
+        if not config:
+            raise HTTPException(status_code=404, detail="RAG configuration not found")
+
+    results = []
+    staged = []  # PDFs đã ghi ra file tạm: {result, part, hash, size, name}
+
+    def stage(name: str, source) -> None:
+        result = {"file": name}
+        results.append(result)
+        if len(staged) >= BULK_UPLOAD_MAX_FILES:
+            result.update(status="skipped", error=f"More than {BULK_UPLOAD_MAX_FILES} PDFs in one upload")
+            return
+        part = UPLOAD_DIR / f".{uuid.uuid4().hex}.part"
+        try:
+            content_hash, size = _copy_upload(source, part)
+        except Exception as e:
+            part.unlink(missing_ok=True)
+            result.update(status="failed", error=e.detail if isinstance(e, _UploadRejected) else str(e))
+            return
+        staged.append({"result": result, "part": part, "hash": content_hash, "size": size,
+                       "name": Path(name).name})
+
+    moved = []
+    try:
+        # 1. Ghi từng PDF ra file tạm (hash trong lúc ghi)
+        for upload in files:
+            name = upload.filename or ""
+            if name.lower().endswith(".zip"):
+                try:
+                    with zipfile.ZipFile(upload.file) as archive:
+                        for info in archive.infolist():
+                            entry = Path(info.filename)
+                            if info.is_dir() or info.filename.startswith("__MACOSX/") or entry.name.startswith("."):
+                                continue
+                            entry_name = f"{name}/{info.filename}"
+                            if entry.suffix.lower() != ".pdf":
+                                results.append({"file": entry_name, "status": "skipped", "error": "Not a PDF"})
+                            elif info.file_size > UPLOAD_MAX_BYTES:
+                                results.append({"file": entry_name, "status": "failed",
+                                                "error": f"File is larger than {UPLOAD_MAX_BYTES // (1024 * 1024)} MB"})
+                            else:
+                                with archive.open(info) as source:
+                                    stage(entry_name, source)
+                except zipfile.BadZipFile as e:
+                    results.append({"file": name, "status": "failed", "error": f"Invalid ZIP archive: {str(e)}"})
+            elif name.lower().endswith(".pdf"):
+                upload.file.seek(0)
+                stage(name, upload.file)
+            else:
+                results.append({"file": name, "status": "skipped", "error": "Only PDF and ZIP files are allowed"})
+
+        # 2. Documents đã có cùng nội dung (một query cho mỗi 500 hashes)
+        existing = {}
+        if staged:
+            _backfill_content_hashes(db, {item["size"] for item in staged})
+            hashes = list({item["hash"] for item in staged})
+            for start in range(0, len(hashes), 500):
+                for document in db.query(Document).filter(Document.content_hash.in_(hashes[start:start + 500])):
+                    existing.setdefault(document.content_hash, document)
+
+        # 3. Chuyển file mới vào uploads, insert mọi documents trong một transaction
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        new_documents = {}
+        for item in staged:
+            result = item["result"]
+            document = existing.get(item["hash"])
+            if document:
+                if not os.path.exists(document.file_path):
+                    # File của document đã bị mất trên disk → khôi phục bằng bản vừa upload
+                    os.replace(item["part"], document.file_path)
+                result.update(status="duplicate", document_id=document.id)
+                continue
+            if item["hash"] in new_documents:
+                result["status"] = "duplicate"
+                continue
+            file_path = _unique_upload_path(timestamp, item["name"])
+            moved.append(file_path)
+            os.replace(item["part"], file_path)
+            new_documents[item["hash"]] = Document(
+                file_name=item["name"],
+                file_path=str(file_path),
+                title=Path(item["name"]).stem,
+                content_hash=item["hash"]
+            )
+            result["status"] = "created"
+
+        db.add_all(list(new_documents.values()))
+        db.flush()
+        for item in staged:
+            if item["hash"] in new_documents:
+                item["result"]["document_id"] = new_documents[item["hash"]].id
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        for path in moved:
+            path.unlink(missing_ok=True)
+        raise HTTPException(status_code=500, detail=f"Bulk upload failed: {str(e)}")
+    finally:
+        for item in staged:
+            item["part"].unlink(missing_ok=True)
+
+    created = [(document.id, document.file_path) for document in new_documents.values()]
+    if created:
+        background_tasks.add_task(
+            _process_uploads, [(doc_id, path, list(_PDF_INFO_FIELDS)) for doc_id, path in created], cache_pages
+        )
+
+    # 4. Gán vào config (thêm vào documents đã có) và queue index job
+    job = None
+    document_ids = list(dict.fromkeys(r["document_id"] for r in results if r.get("document_id")))
+    if config and document_ids:
+        linked = {
+            doc_id for (doc_id,) in
+            db.query(RagDocument.document_id).filter(RagDocument.rag_config_id == config.id).all()
+        }
+        db.add_all([RagDocument(rag_config_id=config.id, document_id=doc_id)
+                    for doc_id in document_ids if doc_id not in linked])
+        db.commit()
+        if HAS_RAG_PROCESSOR:
+            job = enqueue_job(db, config.id, sorted(linked | set(document_ids)))
+            print(f"Queued index job {job.id} for config: {config.config_name}")
+
+    counts = {status: sum(1 for r in results if r.get("status") == status)
+              for status in ("created", "duplicate", "failed", "skipped")}
+    print(f"Bulk upload: {counts['created']} created, {counts['duplicate']} duplicates, "
+          f"{counts['failed']} failed, {counts['skipped']} skipped")
+    return {
+        "success": counts["failed"] == 0,
+        "message": (f"{counts['created']} documents created, {counts['duplicate']} duplicates, "
+                    f"{counts['failed']} failed, {counts['skipped']} skipped"
+                    + (f", indexing job {job.id} queued" if job else "")),
+        **counts,
+        "results": results,
+        "job": job_to_dict(job) if job else None
+    }
+
+
+def _unique_upload_path(timestamp: str, file_name: str) -> Path:
+    """
+    Đường dẫn lưu file upload chưa tồn tại (files cùng tên trong cùng một giây, kể cả từ các
+    requests song song): tạo file rỗng giữ chỗ bằng O_EXCL, caller os.replace file upload lên đó
+    """
+    counter = 0
+    while True:
+        name = f"{timestamp}_{file_name}" if counter == 0 else f"{timestamp}_{counter}_{file_name}"
+        path = UPLOAD_DIR / name
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            counter += 1
+
+
+class _UploadRejected(Exception):
+    """File upload không hợp lệ (status_code + detail cho HTTPException)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _UploadWriter:
+    """
+    Ghi một file upload vào file tạm theo từng block: kiểm tra PDF header ở block đầu và
+    giới hạn kích thước trước khi ghi tiếp, tính SHA-256 trong lúc ghi
+    """
+
+    def __init__(self, target: Path):
+        self.target = target
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._file = open(target, "wb")
+
+    def write(self, block: bytes) -> None:
+        if self.size == 0 and not block.startswith(b"%PDF-"):
+            raise _UploadRejected(400, "File is not a valid PDF")
+        self.size += len(block)
+        if self.size > UPLOAD_MAX_BYTES:
+            raise _UploadRejected(413, f"File is larger than {UPLOAD_MAX_BYTES // (1024 * 1024)} MB")
+        self._digest.update(block)
+        self._file.write(block)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def result(self) -> tuple:
+        """(sha256 hex, số bytes) sau khi ghi xong"""
+        if self.size == 0:
+            raise _UploadRejected(400, "File is empty")
+        return self._digest.hexdigest(), self.size
+
+
+async def _stream_upload(file: UploadFile, target: Path) -> tuple:
+    """
+    Ghi upload vào target theo từng block (đọc async, ghi trong threadpool → không chặn event loop).
+    Returns (sha256 hex, số bytes).
+    """
+    writer = await run_in_threadpool(_UploadWriter, target)
+    try:
+        while True:
+            block = await file.read(UPLOAD_CHUNK_BYTES)
+            if not block:
+                break
+            await run_in_threadpool(writer.write, block)
+        return writer.result()
+    except _UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    finally:
+        await run_in_threadpool(writer.close)
+
+
+def _copy_upload(source, target: Path) -> tuple:
+    """Như _stream_upload cho file object đồng bộ (entry của ZIP, file của bulk upload)"""
+    writer = _UploadWriter(target)
+    try:
+        for block in iter(lambda: source.read(UPLOAD_CHUNK_BYTES), b""):
+            writer.write(block)
+        return writer.result()
+    finally:
+        writer.close()
+
+
+def _backfill_content_hashes(db: Session, sizes: set) -> None:
+    """
+    Documents upload trước khi có content_hash: hash các file có kích thước trùng với
+    một upload (và ghi lại hash để lần sau không phải đọc lại)
+    """
+    changed = False
+    for candidate in db.query(Document).filter(Document.content_hash.is_(None)).all():
+        try:
+            if os.path.getsize(candidate.file_path) not in sizes:
+                continue
+            candidate.content_hash = compute_file_hash(candidate.file_path)
+            changed = True
+        except OSError:
+            continue
+    if changed:
+        db.commit()
+
+
+def _find_document_by_hash(db: Session, content_hash: str, size: int) -> Optional[Document]:
+    """Document có cùng nội dung, None nếu chưa có"""
+    document = db.query(Document).filter(Document.content_hash == content_hash).first()
+    if document:
+        return document
+    _backfill_content_hashes(db, {size})
+    return db.query(Document).filter(Document.content_hash == content_hash).first()
+
+
+def _process_uploads(uploads: List[tuple], cache_pages: bool) -> None:
+    """
+    Background sau upload: đọc số trang + metadata của PDFs (worker processes, có timeout)
+    để điền các fields client không gửi, rồi parse text các trang vào page cache
+    → lần index đầu tiên không phải parse.
+
+    Args:
+        uploads: [(document_id, file_path, fields lấy từ PDF)]
+    """
+    fields_of = {file_path: (document_id, fields) for document_id, file_path, fields in uploads if fields}
+    if fields_of:
+        db = SessionLocal()
+        try:
+            pending = 0
+            workers = min(PDF_WORKERS, len(fields_of))
+            for result in iter_read_pdf_info(list(fields_of), max_workers=workers):
+                if result["error"]:
+                    print(f"Warning: Could not read PDF metadata of {result['path']}: {result['error']}")
+                    continue
+                document_id, fields = fields_of[result["path"]]
+                document = db.query(Document).filter(Document.id == document_id).first()
+                if document:
+                    for field in fields:
+                        if result["info"].get(field) is not None:
+                            setattr(document, field, result["info"][field])
+                    pending += 1
+                # Commit theo lô: bulk upload có thể có hàng nghìn files
+                if pending >= 200:
+                    db.commit()
+                    pending = 0
+            db.commit()
+        finally:
+            db.close()
+    if cache_pages:
+        _warm_page_cache(*[file_path for _, file_path, _ in uploads])
+
+
+def _warm_page_cache(*file_paths: str) -> None:
+    page_cache = get_page_cache()
+    if page_cache is None:
+        return
+    try:
+        page_cache.warm(file_paths, max_workers=min(PDF_WORKERS, len(file_paths)))
+    except Exception as e:
+        print(f"Warning: Could not cache pages of {len(file_paths)} uploads: {str(e)}")
+
+
 @router.get("/documents/", response_model=List[DocumentOut])
 def list_documents(
     search: Optional[str] = None,
@@ -249,6 +727,12 @@ def delete_document(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
+    # Xóa chunks của document khỏi vector store của mọi config đang dùng nó
+    configs = db.query(RAGConfig).join(
+        RagDocument, RagDocument.rag_config_id == RAGConfig.id
+    ).filter(RagDocument.document_id == doc_id).all()
+    deleted_chunks = _delete_vectors(configs, [document])
+
     # Xóa file trên disk nếu tồn tại
     try:
         file_path = Path(document.file_path)
@@ -262,7 +746,31 @@ def delete_document(
     db.delete(document)
     db.commit()
 
-    return {"message": f"Document '{document.file_name}' deleted successfully"}
+    return {
+        "message": f"Document '{document.file_name}' deleted successfully",
+        "deleted_chunks": deleted_chunks
+    }
+
+
+def _delete_vectors(configs: List[RAGConfig], documents: List[Document]) -> dict:
+    """
+    Xóa chunks của documents khỏi vector store của các configs → {config_name: số chunks}.
+    Mỗi config xóa mọi documents trong một lần (mỗi lần là một version mới được copy và publish).
+    """
+    deleted = {}
+    if not HAS_RAG_PROCESSOR or not documents:
+        return deleted
+    processor = RAGProcessor()
+    document_ids = [document.id for document in documents]
+    for config in configs:
+        try:
+            deleted[config.config_name] = processor.delete_document_vectors(
+                config.config_name, document_ids, [document.file_path for document in documents]
+            )
+        except Exception as e:
+            print(f"Warning: Could not delete vectors of documents {document_ids} "
+                  f"from '{config.config_name}': {str(e)}")
+    return deleted
 
 
 # ========================= RAG DOCUMENT ASSOCIATIONS =========================
@@ -275,15 +783,15 @@ def add_documents_to_rag_config(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Thêm documents vào RAG configuration và trigger RAG processing.
+    Thêm documents vào RAG configuration và tạo background indexing job.
 
     Flow:
     1. Lưu document associations vào database
-    2. Lấy thông tin embedding model
-    3. Load PDFs và process RAG (split, embed, store in Chroma)
+    2. Tạo index job (load PDFs, split, embed, store in Chroma chạy ở background worker)
+    3. Client poll GET /rag-configs/jobs/{job_id} (hoặc /events) để theo dõi tiến độ
 
     Returns:
-        Dict with associations and RAG processing result
+        Dict with associations and the queued job
     """
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admin can add documents to RAG config")
@@ -317,69 +825,36 @@ def add_documents_to_rag_config(
     for assoc in new_associations:
         db.refresh(assoc)
 
-    # ===== TRIGGER RAG PROCESSING =====
-    try:
-        # Kiểm tra RAGProcessor có available không
-        if not HAS_RAG_PROCESSOR:
-            return {
-                "success": False,
-                "message": "Documents added but RAG processing unavailable (langchain not installed)",
-                "associations": [{"id": a.id, "rag_config_id": a.rag_config_id, "document_id": a.document_id} for a in new_associations]
-            }
-
-        # Lấy embedding model name
-        embedding_model = db.query(Model).filter(Model.id == config.embedding_model_id).first()
-        if not embedding_model:
-            return {
-                "success": False,
-                "message": "Embedding model not found",
-                "associations": [{"id": a.id, "rag_config_id": a.rag_config_id, "document_id": a.document_id} for a in new_associations]
-            }
-
-        # Lấy file paths của documents
-        document_file_paths = [doc.file_path for doc in documents]
-
-        # Initialize RAG processor
-        rag_processor = RAGProcessor()
-
-        # Process RAG
-        print(f"Starting RAG processing for config: {config.config_name}")
-        result = rag_processor.process_rag_config(
-            config_name=config.config_name,
-            embedding_model_name=embedding_model.model_name,
-            document_file_paths=document_file_paths,
-            chunk_size=config.chunk_size,
-            chunk_overlap=config.chunk_overlap
-        )
+    associations = [{"id": a.id, "rag_config_id": a.rag_config_id, "document_id": a.document_id} for a in new_associations]
 
-        if result["success"]:
-            return {
-                "success": True,
-                "message": f"Successfully added {len(new_associations)} documents and processed RAG",
-                "associations": [{"id": a.id, "rag_config_id": a.rag_config_id, "document_id": a.document_id} for a in new_associations],
-                "rag_processing": {
-                    "vector_store_path": result["vector_store_path"],
-                    "num_chunks": result["num_chunks"],
-                    "num_documents": result["num_documents"]
-                }
-            }
-        else:
-            return {
-                "success": False,
-                "message": f"Documents added but RAG processing failed: {result['message']}",
-                "associations": [{"id": a.id, "rag_config_id": a.rag_config_id, "document_id": a.document_id} for a in new_associations]
-            }
+    # ===== TRIGGER RAG PROCESSING (background job) =====
+    # Kiểm tra RAGProcessor có available không
+    if not HAS_RAG_PROCESSOR:
+        return {
+            "success": False,
+            "message": "Documents added but RAG processing unavailable (langchain not installed)",
+            "associations": associations
+        }
 
-    except Exception as e:
-        print(f"Error in RAG processing: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    # Lấy embedding model name
+    embedding_model = db.query(Model).filter(Model.id == config.embedding_model_id).first()
+    if not embedding_model:
         return {
             "success": False,
-            "message": f"Documents added but RAG processing failed: {str(e)}",
-            "associations": [{"id": a.id, "rag_config_id": a.rag_config_id, "document_id": a.document_id} for a in new_associations]
+            "message": "Embedding model not found",
+            "associations": associations
         }
 
+    job = enqueue_job(db, config_id, [doc.id for doc in documents])
+    print(f"Queued index job {job.id} for config: {config.config_name}")
+
+    return {
+        "success": True,
+        "message": f"Added {len(new_associations)} documents, indexing job {job.id} queued",
+        "associations": associations,
+        "job": job_to_dict(job)
+    }
+
 
 @router.get("/{config_id}/documents", response_model=List[RagDocumentWithDetails])
 def get_rag_config_documents(
@@ -445,7 +920,338 @@ def remove_document_from_rag_config(
     db.delete(rag_doc)
     db.commit()
 
-    return {"message": "Document removed from RAG configuration successfully"}
+    config = db.query(RAGConfig).filter(RAGConfig.id == config_id).first()
+    document = db.query(Document).filter(Document.id == doc_id).first()
+    deleted_chunks = _delete_vectors([config], [document]) if config and document else {}
+
+    return {
+        "message": "Document removed from RAG configuration successfully",
+        "deleted_chunks": deleted_chunks
+    }
+
+
+@router.post("/{config_id}/documents/remove")
+def remove_documents_from_rag_config(
+    config_id: int,
+    document_ids: List[int],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Xóa nhiều documents khỏi RAG configuration, vector store chỉ được copy và publish một lần"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can remove documents from RAG config")
+
+    config = db.query(RAGConfig).filter(RAGConfig.id == config_id).first()
+    if not config:
+        raise HTTPException(status_code=404, detail="RAG configuration not found")
+
+    rag_docs = db.query(RagDocument).filter(
+        RagDocument.rag_config_id == config_id,
+        RagDocument.document_id.in_(document_ids)
+    ).all()
+    if not rag_docs:
+        raise HTTPException(status_code=404, detail="Document associations not found")
+
+    removed_ids = [rag_doc.document_id for rag_doc in rag_docs]
+    for rag_doc in rag_docs:
+        db.delete(rag_doc)
+    db.commit()
+
+    documents = db.query(Document).filter(Document.id.in_(removed_ids)).all()
+    deleted_chunks = _delete_vectors([config], documents)
+
+    return {
+        "message": f"Removed {len(removed_ids)} documents from RAG configuration",
+        "removed_document_ids": removed_ids,
+        "deleted_chunks": deleted_chunks
+    }
+
+
+# ========================= SWEEP BUILD =========================
+
+@router.post("/sweep")
+def build_config_sweep(
+    request: SweepBuildRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Gán cùng documents cho một grid RAG configs và build tất cả trong một index job.
+    Mỗi PDF chỉ parse một lần; split + embed một lần cho mỗi cách chunking (embedding model,
+    splitter, chunk_size, chunk_overlap, dedupe), các configs còn lại của nhóm copy chunks đã embed.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can build RAG configurations")
+
+    if not HAS_RAG_PROCESSOR:
+        raise HTTPException(status_code=503, detail="RAG processing unavailable (langchain not installed)")
+
+    config_ids = list(dict.fromkeys(request.config_ids))
+    if not config_ids or not request.document_ids:
+        raise HTTPException(status_code=400, detail="config_ids and document_ids must not be empty")
+
+    configs = db.query(RAGConfig).filter(RAGConfig.id.in_(config_ids)).all()
+    if len(configs) != len(config_ids):
+        raise HTTPException(status_code=404, detail="One or more RAG configurations not found")
+
+    model_ids = {config.embedding_model_id for config in configs}
+    if db.query(Model).filter(Model.id.in_(model_ids)).count() != len(model_ids):
+        raise HTTPException(status_code=400, detail="Embedding model not found for one or more configurations")
+
+    documents = db.query(Document).filter(Document.id.in_(request.document_ids)).all()
+    if len(documents) != len(set(request.document_ids)):
+        raise HTTPException(status_code=404, detail="One or more documents not found")
+
+    # Thay associations của mọi configs trong sweep (giống POST /{config_id}/documents)
+    db.query(RagDocument).filter(RagDocument.rag_config_id.in_(config_ids)).delete(synchronize_session=False)
+    for config_id in config_ids:
+        for doc in documents:
+            db.add(RagDocument(rag_config_id=config_id, document_id=doc.id))
+    db.commit()
+
+    job = enqueue_job(db, config_ids[0], [doc.id for doc in documents], sweep_config_ids=config_ids)
+    print(f"Queued sweep job {job.id} for {len(config_ids)} configs")
+
+    return {
+        "success": True,
+        "message": f"Sweep build of {len(config_ids)} configs queued as job {job.id}",
+        "job": job_to_dict(job)
+    }
+
+
+# ========================= SNAPSHOT ENDPOINTS =========================
+
+@router.get("/{config_id}/snapshot")
+def export_rag_config_snapshot(
+    config_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Tải snapshot (.tar.gz: vectors, chunk texts, metadata, config params, embedding model,
+    checksums) của version hiện tại để import vào server khác mà không embed lại
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can export RAG configurations")
+
+    config = db.query(RAGConfig).filter(RAGConfig.id == config_id).first()
+    if not config:
+        raise HTTPException(status_code=404, detail="RAG configuration not found")
+
+    out_path = SNAPSHOT_DIR / f"export-{config.id}-{datetime.now():%Y%m%d_%H%M%S_%f}.tar.gz"
+    try:
+        manifest = export_snapshot(db, config, out_path)
+    except SnapshotError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export snapshot: {str(e)}")
+
+    # File tạm bị xóa sau khi gửi xong
+    background_tasks.add_task(os.remove, str(out_path))
+    return FileResponse(
+        out_path,
+        media_type="application/gzip",
+        filename=f"{config.config_name}-{manifest['source_version']}.tar.gz"
+    )
+
+
+@router.post("/snapshots/import")
+def import_rag_config_snapshot(
+    file: UploadFile = File(...),
+    config_name: Optional[str] = Form(None),
+    replace: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import snapshot thành version mới của config (tạo config nếu chưa có; config đã có cần replace=true).
+    Checksums được kiểm tra trước khi ghi gì vào store; documents được map theo hash nội dung file.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can import RAG configurations")
+
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    upload_path = SNAPSHOT_DIR / f"import-{datetime.now():%Y%m%d_%H%M%S_%f}.tar.gz"
+    try:
+        with open(upload_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        return import_snapshot(db, upload_path, config_name=config_name, replace=replace)
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to import snapshot: {str(e)}")
+    finally:
+        upload_path.unlink(missing_ok=True)
+
+
+# ========================= INDEX JOB ENDPOINTS =========================
+
+def _get_job_or_404(db: Session, job_id: int) -> IndexJob:
+    job = db.query(IndexJob).filter(IndexJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Index job not found")
+    return job
+
+
+@router.get("/jobs/", response_model=List[IndexJobOut])
+def list_index_jobs(
+    config_id: Optional[int] = None,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Lấy các index jobs gần nhất (lọc theo config nếu có)"""
+    query = db.query(IndexJob)
+    if config_id is not None:
+        query = query.filter(IndexJob.rag_config_id == config_id)
+    jobs = query.order_by(IndexJob.id.desc()).limit(limit).all()
+    return [job_to_dict(job) for job in jobs]
+
+
+@router.get("/jobs/{job_id}", response_model=IndexJobOut)
+def get_index_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Trạng thái và tiến độ của một index job (để poll)"""
+    return job_to_dict(_get_job_or_404(db, job_id))
+
+
+@router.get("/jobs/{job_id}/events")
+def stream_index_job_events(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Server-Sent Events: gửi trạng thái job mỗi khi thay đổi, kết thúc khi job xong"""
+    _get_job_or_404(db, job_id)
+
+    def event_generator():
+        last_payload = None
+        last_sent = time.monotonic()
+        while True:
+            # Session riêng cho mỗi lần đọc để thấy dữ liệu mới nhất do worker commit
+            poll_db = SessionLocal()
+            try:
+                job = poll_db.query(IndexJob).filter(IndexJob.id == job_id).first()
+                payload = json.dumps(job_to_dict(job), default=str) if job else None
+                status = job.status if job else None
+            finally:
+                poll_db.close()
+
+            if payload is None:
+                yield "event: error\ndata: {\"detail\": \"Index job not found\"}\n\n"
+                return
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= 15:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            if status in TERMINAL_STATUSES:
+                return
+            time.sleep(1)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=IndexJobOut)
+def cancel_index_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Hủy index job đang chờ hoặc đang chạy"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can cancel index jobs")
+
+    try:
+        job = request_cancel(db, _get_job_or_404(db, job_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job_to_dict(job)
+
+
+@router.post("/jobs/{job_id}/retry", response_model=IndexJobOut)
+def retry_index_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Chạy lại index job đã failed/cancelled"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can retry index jobs")
+
+    try:
+        job = retry_job(db, _get_job_or_404(db, job_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job_to_dict(job)
+
+
+# ========================= STORAGE MAINTENANCE =========================
+
+@router.post("/maintenance/gc")
+def run_storage_gc(
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Dọn vector stores/staging của configs đã xóa, versions cũ không còn reader
+    và uploads không còn document nào tham chiếu. dry_run=true chỉ báo cáo.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can run storage maintenance")
+
+    return {"success": True, **collect_garbage(db, dry_run=dry_run)}
+
+
+# ========================= BENCHMARK ENDPOINTS =========================
+
+@router.post("/benchmarks/")
+def run_rag_benchmark(
+    request: BenchmarkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Chạy labeled query set trên các RAG configs, trả về recall@k, MRR, context tokens và latency"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can run benchmarks")
+
+    if not HAS_RAG_PROCESSOR:
+        raise HTTPException(status_code=503, detail="RAG processing unavailable (langchain not installed)")
+
+    if not request.config_ids:
+        raise HTTPException(status_code=400, detail="config_ids must not be empty")
+
+    try:
+        queries = validate_query_set([q.model_dump() for q in request.queries])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+
+    run = benchmark_configs(db, request.config_ids, queries, k=request.k)
+    run["results_path"] = save_benchmark_run(run)
+    return run
+
+
+@router.get("/benchmarks/")
+def list_rag_benchmarks(
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """Lấy bảng so sánh các lần benchmark gần nhất (cho RAG Versions tab)"""
+    runs = list_benchmark_runs(limit=limit)
+    return {
+        "runs": [{"run_id": r["run_id"], "created_at": r["created_at"], "num_queries": r["num_queries"]} for r in runs],
+        "table": comparison_table(runs)
+    }
 
 
 # ========================= MODEL MANAGEMENT ENDPOINTS =========================
@@ -0,0 +1,116 @@
+"""
+Storage GC Service
+Dọn dữ liệu trên disk không còn được database tham chiếu:
+- Thư mục vector store của RAG configs đã bị xóa (và versions cũ không còn reader)
+- Thư mục staging (checkpoint indexing) của configs đã bị xóa
+- File upload không còn document nào trỏ tới
+
+Chỉ xóa những gì không còn reader/không mới tạo gần đây, và báo cáo dung lượng thu hồi.
+"""
+
+from pathlib import Path
+import os
+import shutil
+import time
+
+from sqlalchemy.orm import Session
+
+from models.rag_config import RAGConfig
+from models.document import Document
+from services.vector_store_versions import (
+    VectorStoreVersions, CHROMA_BASE_DIR, STORE_PREFIX, safe_config_name, store_root, dir_size
+)
+
+
+UPLOAD_DIR = Path("uploads/documents")
+
+# File upload mới hơn khoảng này có thể chưa kịp ghi vào database → không xóa
+UPLOAD_GRACE_S = float(os.getenv("RAG_GC_UPLOAD_GRACE_S", "3600"))
+
+
+def drop_config_store(config_name: str, base_dir: Path = CHROMA_BASE_DIR, dry_run: bool = False) -> dict:
+    """Xóa vector store và staging của một config (versions đang có reader được giữ lại cho lần GC sau)"""
+    store = VectorStoreVersions(store_root(config_name, base_dir)).drop(dry_run)
+    staging = Path(base_dir) / "staging" / safe_config_name(config_name)
+    staging_bytes = dir_size(staging) if staging.exists() else 0
+    if staging.exists() and not dry_run:
+        shutil.rmtree(staging, ignore_errors=True)
+    store["bytes_freed"] += staging_bytes
+    return store
+
+
+def collect_garbage(
+    db: Session,
+    base_dir: Path = CHROMA_BASE_DIR,
+    upload_dir: Path = UPLOAD_DIR,
+    dry_run: bool = False
+) -> dict:
+    """
+    Chạy GC toàn bộ.
+
+    Returns:
+        dict với keys: dry_run, stores (versions cũ đã xóa), orphan_stores, orphan_staging,
+        orphan_uploads, bytes_freed
+    """
+    base_dir = Path(base_dir)
+    upload_dir = Path(upload_dir)
+    config_names = {safe_config_name(name) for (name,) in db.query(RAGConfig.config_name).all()}
+
+    report = {
+        "dry_run": dry_run,
+        "stores": [],
+        "orphan_stores": [],
+        "orphan_staging": [],
+        "orphan_uploads": [],
+        "bytes_freed": 0
+    }
+
+    # 1. Vector stores: store của config đã xóa → drop, còn lại → xóa versions cũ
+    if base_dir.exists():
+        for root in sorted(base_dir.glob(f"{STORE_PREFIX}*")):
+            if not root.is_dir():
+                continue
+            name = root.name[len(STORE_PREFIX):]
+            versions = VectorStoreVersions(root)
+            if name in config_names:
+                result = versions.gc(dry_run=dry_run)
+                if result["removed_versions"]:
+                    report["stores"].append(result)
+            else:
+                result = versions.drop(dry_run=dry_run)
+                report["orphan_stores"].append(result)
+            report["bytes_freed"] += result["bytes_freed"]
+
+    # 2. Staging của configs đã xóa
+    staging_base = base_dir / "staging"
+    if staging_base.exists():
+        for staging in sorted(staging_base.iterdir()):
+            if staging.is_dir() and staging.name not in config_names:
+                size = dir_size(staging)
+                if not dry_run:
+                    shutil.rmtree(staging, ignore_errors=True)
+                report["orphan_staging"].append({"path": str(staging), "bytes": size})
+                report["bytes_freed"] += size
+
+    # 3. Uploads không còn document nào tham chiếu
+    if upload_dir.exists():
+        referenced = {
+            os.path.normpath(os.path.abspath(path))
+            for (path,) in db.query(Document.file_path).all() if path
+        }
+        now = time.time()
+        for file in sorted(upload_dir.iterdir()):
+            if not file.is_file() or os.path.normpath(os.path.abspath(file)) in referenced:
+                continue
+            stat = file.stat()
+            if now - stat.st_mtime < UPLOAD_GRACE_S:
+                continue
+            if not dry_run:
+                file.unlink(missing_ok=True)
+            report["orphan_uploads"].append({"path": str(file), "bytes": stat.st_size})
+            report["bytes_freed"] += stat.st_size
+
+    print(f"[StorageGC] {'Would free' if dry_run else 'Freed'} {report['bytes_freed'] / 1024 / 1024:.1f} MB "
+          f"({len(report['orphan_stores'])} orphan stores, {len(report['orphan_staging'])} staging dirs, "
+          f"{len(report['orphan_uploads'])} uploads, {len(report['stores'])} stores with old versions)")
+    return report
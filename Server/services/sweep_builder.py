@@ -0,0 +1,110 @@
+"""
+Sweep Builder
+Build nhiều RAG configs (grid chunk_size/k/search type/...) trên cùng một tập documents
+trong một job, dùng chung phần việc nặng:
+
+- Parse: mỗi PDF một lần (page cache theo hash nội dung)
+- Split + embed: một lần cho mỗi cách chunking (embedding model, splitter, chunk_size,
+  chunk_overlap, dedupe_chunks);
+  config đầu tiên của nhóm build bình thường, các configs còn lại copy chunks + vectors
+  từ store của nó (RAGProcessor shared_from)
+- Configs chỉ khác k/search type dùng chung một store (cùng config_name) chỉ build một lần
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.rag_config import RAGConfig
+from services.hnsw_config import hnsw_params_of
+
+
+def sweep_groups(configs: List[RAGConfig]) -> List[List[RAGConfig]]:
+    """
+    Nhóm configs theo (embedding model, splitter, token encoding, chunk_size, chunk_overlap, dedupe_chunks),
+    giữ thứ tự ban đầu.
+    Trong mỗi nhóm, configs cùng config_name (cùng vector store) chỉ giữ config đầu tiên.
+    """
+    groups: Dict[Tuple[int, str, Optional[str], int, int, bool], List[RAGConfig]] = {}
+    seen_stores = set()
+    for config in configs:
+        if config.config_name in seen_stores:
+            continue
+        seen_stores.add(config.config_name)
+        text_splitter = config.text_splitter or "recursive"
+        key = (config.embedding_model_id, text_splitter, config.token_encoding if text_splitter == "token" else None,
+               config.chunk_size, config.chunk_overlap, bool(config.dedupe_chunks))
+        groups.setdefault(key, []).append(config)
+    return list(groups.values())
+
+
+def run_sweep(
+    processor,
+    configs: List[RAGConfig],
+    model_names: Dict[int, str],
+    document_file_paths: List[str],
+    document_ids: List[int],
+    progress_callback: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """
+    Build tất cả configs của sweep bằng processor (RAGProcessor).
+
+    Args:
+        model_names: {embedding_model_id: model_name}
+
+    Returns:
+        dict với keys: success, message, configs ({config_name: kết quả process_rag_config}),
+        num_groups, num_shared_documents
+    """
+    groups = sweep_groups(configs)
+    builds = [config for group in groups for config in group]
+    num_docs = len(document_file_paths)
+    totals = {"pages_parsed": 0, "chunks_embedded": 0}
+    results: Dict[str, dict] = {}
+
+    for position, config in enumerate(builds):
+        def report(progress: dict, position=position, config=config):
+            if not progress_callback:
+                return
+            progress_callback({
+                # stage: "<config>: <stage>" (cột stage giới hạn 50 ký tự)
+                "stage": f"{config.config_name}: {progress.get('stage')}"[:50],
+                "documents_total": num_docs * len(builds),
+                "documents_done": num_docs * position + progress.get("documents_done", 0),
+                "pages_parsed": totals["pages_parsed"] + progress.get("pages_parsed", 0),
+                "chunks_embedded": totals["chunks_embedded"] + progress.get("chunks_embedded", 0)
+            })
+
+        # Config đã build thành công đầu tiên của nhóm là nguồn chunks cho các configs sau
+        group = next(g for g in groups if config in g)
+        leader = next((c for c in group if results.get(c.config_name, {}).get("success")), None)
+
+        print(f"[Sweep] Building {config.config_name} ({position + 1}/{len(builds)})"
+              + (f", sharing chunks with {leader.config_name}" if leader else ""))
+        result = processor.process_rag_config(
+            config_name=config.config_name,
+            embedding_model_name=model_names[config.embedding_model_id],
+            document_file_paths=document_file_paths,
+            chunk_size=config.chunk_size,
+            chunk_overlap=config.chunk_overlap,
+            document_ids=document_ids,
+            progress_callback=report,
+            vector_storage=config.vector_storage or "float32",
+            vector_backend=config.vector_backend or "chroma",
+            hnsw_params=hnsw_params_of(config),
+            shared_from=leader.config_name if leader else None,
+            dedupe_chunks=bool(config.dedupe_chunks),
+            text_splitter=config.text_splitter or "recursive",
+            token_encoding=config.token_encoding
+        )
+        results[config.config_name] = result
+        totals["pages_parsed"] += result.get("num_pages_loaded", 0)
+        totals["chunks_embedded"] += result.get("num_added_chunks", 0)
+
+    failed = [name for name, result in results.items() if not result.get("success")]
+    return {
+        "success": not failed,
+        "message": (f"Built {len(results) - len(failed)}/{len(results)} configs in {len(groups)} chunking groups"
+                    + (f"; failed: {', '.join(failed)}" if failed else "")),
+        "configs": results,
+        "num_groups": len(groups),
+        "num_shared_documents": sum(result.get("num_shared_documents", 0) for result in results.values())
+    }
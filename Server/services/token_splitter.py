@@ -0,0 +1,245 @@
+"""
+Token Splitter
+Split text theo số tokens thay vì số ký tự, để chunks khớp với token budget của prompt
+và giới hạn input của embedding model.
+
+Encoding (per RAG config, mặc định RAG_TOKEN_ENCODING):
+- tên encoding của tiktoken (cl100k_base, o200k_base, ...): file BPE được tải lần đầu dùng,
+  server offline cần TIKTOKEN_CACHE_DIR trỏ tới cache đã có file
+- đường dẫn tokenizer.json của HuggingFace (thư viện tokenizers): dùng tokenizer của chính
+  embedding model (vd. BERT WordPiece của nomic-embed-text) để budget đúng bằng tokens của model
+
+Mỗi trang chỉ encode một lần (Rust), sau đó làm việc trên offsets:
+1. Vị trí ký tự bắt đầu của từng token (tiktoken: bảng số bytes mỗi token id + cumsum)
+2. Ranh giới (đoạn văn > dòng > câu > từ) map về chỉ số token bằng searchsorted
+3. Chunk = [begin, end) trong token space: end là ranh giới mạnh nhất (gần cuối nhất) trong
+   nửa sau của cửa sổ chunk_size tokens, không có ranh giới thì cắt đúng chunk_size tokens;
+   overlap lùi lại chunk_overlap tokens rồi tiến tới đầu từ gần nhất
+Text của chunk là đoạn text gốc giữa hai offsets, không decode lại.
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import hashlib
+import os
+
+import numpy as np
+
+
+TEXT_SPLITTERS = ("recursive", "token")
+DEFAULT_TEXT_SPLITTER = "recursive"
+
+TOKEN_ENCODING = os.getenv("RAG_TOKEN_ENCODING", "cl100k_base")
+
+# Tăng khi thuật toán thay đổi (nằm trong chunking fingerprint)
+TOKEN_SPLITTER_VERSION = 2
+
+# Độ ưu tiên của ranh giới trước một token: đoạn văn > dòng > câu > từ > giữa từ
+_PARAGRAPH, _LINE, _SENTENCE, _WORD, _NONE = 4, 3, 2, 1, 0
+# Loại ký tự ASCII (ký tự ngoài ASCII → 0) để tìm ranh giới bằng numpy trên cả trang
+_BLANK, _NEWLINE, _PUNCT = 1, 2, 4
+_CHAR_CLASS = np.zeros(128, dtype=np.uint8)
+_CHAR_CLASS[[ord(c) for c in " \t\r\f\v"]] = _BLANK
+_CHAR_CLASS[ord("\n")] = _NEWLINE
+_CHAR_CLASS[[ord(c) for c in ".!?;:"]] = _PUNCT
+
+# Chunk phải đầy ít nhất tỉ lệ này trước khi được cắt sớm ở một ranh giới mạnh hơn
+_MIN_FILL = 0.5
+
+
+class _TiktokenTokenizer:
+    """tiktoken Encoding; offsets tính từ số bytes UTF-8 của từng token id"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        lengths = np.zeros(encoding.max_token_value + 1, dtype=np.int64)
+        for token in range(len(lengths)):
+            try:
+                lengths[token] = len(encoding.decode_single_token_bytes(token))
+            except KeyError:
+                pass
+        self._byte_lengths = lengths
+
+    def token_starts(self, text: str) -> np.ndarray:
+        """Vị trí ký tự bắt đầu của từng token"""
+        tokens = np.asarray(self.encoding.encode_ordinary(text), dtype=np.int64)
+        lengths = self._byte_lengths[tokens]
+        byte_starts = np.cumsum(lengths) - lengths
+        if text.isascii():
+            return byte_starts
+        # Byte → ký tự chứa nó (token BPE có thể bắt đầu giữa một ký tự nhiều bytes)
+        data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+        char_of_byte = np.cumsum((data & 0xC0) != 0x80) - 1
+        return char_of_byte[byte_starts]
+
+    def count(self, texts: List[str]) -> List[int]:
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+
+class _HuggingFaceTokenizer:
+    """tokenizers.Tokenizer (tokenizer.json của embedding model); offsets có sẵn từ encode"""
+
+    def __init__(self, tokenizer):
+        tokenizer.no_truncation()
+        self.tokenizer = tokenizer
+
+    def token_starts(self, text: str) -> np.ndarray:
+        offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+        if not offsets:
+            return np.zeros(0, dtype=np.int64)
+        return np.maximum.accumulate(np.fromiter((start for start, _ in offsets), dtype=np.int64, count=len(offsets)))
+
+    def count(self, texts: List[str]) -> List[int]:
+        return [len(encoded.ids) for encoded in self.tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+
+def _is_tokenizer_file(encoding: str) -> bool:
+    return encoding.endswith(".json") or os.path.sep in encoding
+
+
+@lru_cache(maxsize=8)
+def load_tokenizer(encoding: str = TOKEN_ENCODING):
+    """Tokenizer của encoding (tên tiktoken hoặc đường dẫn tokenizer.json), cache trong process"""
+    if _is_tokenizer_file(encoding):
+        try:
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ImportError("Tokenizer files require the tokenizers library. Please install: pip install tokenizers")
+        return _HuggingFaceTokenizer(Tokenizer.from_file(encoding))
+    try:
+        import tiktoken
+    except ImportError:
+        raise ImportError("Token splitter requires tiktoken. Please install: pip install tiktoken")
+    return _TiktokenTokenizer(tiktoken.get_encoding(encoding))
+
+
+def check_token_encoding(encoding: Optional[str]) -> Optional[str]:
+    """Load thử encoding, trả về thông báo lỗi (None nếu hợp lệ) để báo ngay khi tạo/sửa config"""
+    encoding = encoding or TOKEN_ENCODING
+    try:
+        load_tokenizer(encoding)
+    except ImportError as e:
+        return str(e)
+    except Exception as e:
+        reason = (str(e).splitlines() or [type(e).__name__])[0]
+        if _is_tokenizer_file(encoding):
+            return f"Cannot load tokenizer file '{encoding}': {reason}"
+        return (f"Cannot load tiktoken encoding '{encoding}': {reason}. Encodings are downloaded on first use; "
+                f"on an offline server set TIKTOKEN_CACHE_DIR to a cache that contains it, or use the path "
+                f"of the embedding model's tokenizer.json")
+    return None
+
+
+def encoding_fingerprint(encoding: Optional[str]) -> str:
+    """Định danh encoding trong chunking fingerprint (tokenizer file: hash nội dung)"""
+    encoding = encoding or TOKEN_ENCODING
+    if not _is_tokenizer_file(encoding):
+        return encoding
+    with open(encoding, "rb") as f:
+        return f"file-{hashlib.sha256(f.read()).hexdigest()[:16]}"
+
+
+class TokenTextSplitter:
+    """
+    Splitter theo tokens, cùng interface split_documents/split_text với splitters của LangChain;
+    metadata start_index là vị trí ký tự của chunk trong trang (như add_start_index=True).
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, encoding: Optional[str] = None, tokenizer=None):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.tokenizer = tokenizer or load_tokenizer(encoding or TOKEN_ENCODING)
+
+    @staticmethod
+    def _priorities(text: str, starts: np.ndarray) -> np.ndarray:
+        """Độ ưu tiên của ranh giới trước từng token (phần tử cuối: cuối text)"""
+        n = len(starts)
+        if text.isascii():
+            codes = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        else:
+            codes = np.minimum(np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32), 127)
+        classes = _CHAR_CLASS[codes]
+        space = classes & (_BLANK | _NEWLINE) != 0
+
+        # Ranh giới theo vị trí ký tự (ranh giới nằm trước ký tự đó)
+        at_char = np.zeros(len(codes) + 1, dtype=np.int8)
+        # Từ: tại khoảng trắng (tiktoken: khoảng trắng thuộc token sau) và ngay sau khoảng trắng
+        at_char[:-1][space] = _WORD
+        at_char[1:][space] = _WORD
+        # Câu: khoảng trắng sau dấu câu (dấu câu thuộc về câu trước)
+        at_char[np.flatnonzero((classes[:-1] == _PUNCT) & (classes[1:] == _BLANK)) + 1] = _SENTENCE
+        # Dòng: "\n"; đoạn văn: "\n" mà tới "\n" tiếp theo chỉ có khoảng trắng
+        newlines = np.flatnonzero(classes == _NEWLINE)
+        at_char[newlines] = _LINE
+        if len(newlines) > 1:
+            non_blank = np.cumsum(classes != _BLANK)
+            empty = non_blank[newlines[1:] - 1] - non_blank[newlines[:-1]] == 0
+            at_char[newlines[:-1][empty]] = _PARAGRAPH
+
+        # Map về token: ranh giới giữa một token (vd. ".\n\n" là một token) → token tiếp theo
+        positions = np.flatnonzero(at_char)
+        tokens = np.searchsorted(starts, positions)
+        priorities = np.full(n + 1, _NONE, dtype=np.int8)
+        if len(positions):
+            groups = np.flatnonzero(np.concatenate(([True], tokens[1:] != tokens[:-1])))
+            priorities[tokens[groups]] = np.maximum.reduceat(at_char[positions], groups)
+        priorities[0] = priorities[n] = _PARAGRAPH
+        return priorities
+
+    def split_text_with_offsets(self, text: str) -> List[Tuple[int, str]]:
+        """[(vị trí ký tự, chunk text)]"""
+        if not text.strip():
+            return []
+        starts = self.tokenizer.token_starts(text)
+        n = len(starts)
+        if n == 0:
+            return []
+        priorities = self._priorities(text, starts)
+        min_fill = max(1, int(self.chunk_size * _MIN_FILL))
+
+        chunks = []
+        begin = 0
+        while begin < n:
+            if begin + self.chunk_size >= n:
+                end = n
+            else:
+                # Ranh giới mạnh nhất (gần cuối nhất) trong [begin + min_fill, begin + chunk_size]
+                lo = begin + min_fill
+                window = priorities[lo:begin + self.chunk_size + 1]
+                last_best = len(window) - 1 - int(np.argmax(window[::-1]))
+                end = lo + last_best if window[last_best] > _NONE else begin + self.chunk_size
+
+            chunk_start = int(starts[begin])
+            chunk_end = int(starts[end]) if end < n else len(text)
+            chunk = text[chunk_start:chunk_end]
+            stripped = chunk.lstrip()
+            if stripped.strip():
+                chunks.append((chunk_start + len(chunk) - len(stripped), stripped.rstrip()))
+            if end >= n:
+                break
+
+            # Overlap: lùi lại chunk_overlap tokens, bắt đầu ở đầu từ gần nhất phía sau
+            next_begin = end
+            if self.chunk_overlap:
+                target = max(begin + 1, end - self.chunk_overlap)
+                words = np.flatnonzero(priorities[target:end] >= _WORD)
+                next_begin = target + int(words[0]) if len(words) else target
+            begin = next_begin
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        return [chunk for _, chunk in self.split_text_with_offsets(text)]
+
+    def split_documents(self, documents) -> List:
+        from langchain_core.documents import Document
+
+        splits = []
+        for doc in documents:
+            for start, chunk in self.split_text_with_offsets(doc.page_content):
+                splits.append(Document(page_content=chunk, metadata={**doc.metadata, "start_index": start}))
+        return splits
+
+    def count_tokens(self, text: str) -> int:
+        return self.tokenizer.count([text])[0]
@@ -0,0 +1,219 @@
+"""
+Vector Backends
+Chọn cách phục vụ search cho một version vector store:
+- "chroma": Chroma persistent client (kèm index nén nếu vector_storage float16/int8)
+- "numpy":  NumpyIndex mmap (flat hoặc IVF), không mở SQLite/HNSW khi query
+
+Build luôn ghi vào Chroma (incremental, resume); sau khi build xong, export_indexes
+ghi các index phục vụ search vào thư mục version và file EXPORTS ghi lại backend/storage.
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+import json
+import os
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from services.numpy_index import NumpyIndex, VECTOR_BACKENDS, DEFAULT_VECTOR_BACKEND
+from services.quantized_index import QuantizedIndex, DEFAULT_VECTOR_STORAGE
+from services.quantized_vector_store import wrap_vector_store
+from services.hnsw_config import apply_search_ef
+
+
+EXPORTS_FILE = "EXPORTS"
+
+
+def exports_of(version_dir) -> dict:
+    """Backend/storage của version (version cũ không có file EXPORTS → chroma)"""
+    try:
+        return json.loads((Path(version_dir) / EXPORTS_FILE).read_text())
+    except (OSError, ValueError):
+        return {"backend": DEFAULT_VECTOR_BACKEND, "storage": QuantizedIndex.storage_of(version_dir)}
+
+
+def exports_match(version_dir, vector_storage: str, vector_backend: str) -> bool:
+    exports = exports_of(version_dir)
+    return exports.get("backend") == vector_backend and exports.get("storage") == vector_storage
+
+
+def export_stamp(version_dir) -> int:
+    """Đổi mỗi khi index phục vụ search được ghi lại (chat dùng để reload cache)"""
+    try:
+        return (Path(version_dir) / EXPORTS_FILE).stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def export_indexes(version_dir, collection, vector_storage: str = DEFAULT_VECTOR_STORAGE,
+                   vector_backend: str = DEFAULT_VECTOR_BACKEND) -> dict:
+    """Ghi index phục vụ search của version từ Chroma collection, xóa index của backend khác"""
+    if vector_backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unsupported vector backend: {vector_backend}")
+
+    if vector_backend == "numpy":
+        QuantizedIndex.remove(version_dir)
+        NumpyIndex.build(version_dir, collection, vector_storage)
+    else:
+        NumpyIndex.remove(version_dir)
+        if vector_storage != DEFAULT_VECTOR_STORAGE:
+            QuantizedIndex.build(version_dir, collection, vector_storage)
+        else:
+            QuantizedIndex.remove(version_dir)
+
+    exports = {"backend": vector_backend, "storage": vector_storage, "updated_at": datetime.utcnow().isoformat()}
+    path = Path(version_dir) / EXPORTS_FILE
+    tmp = path.with_name(f"{EXPORTS_FILE}.{uuid.uuid4().hex}.tmp")
+    tmp.write_text(json.dumps(exports))
+    os.replace(tmp, path)
+    return exports
+
+
+def refresh_exports(version_dir, collection) -> None:
+    """Ghi lại index phục vụ search sau khi Chroma của version bị sửa tại chỗ (vd. xóa document)"""
+    exports = exports_of(version_dir)
+    if exports["backend"] != DEFAULT_VECTOR_BACKEND or exports["storage"] != DEFAULT_VECTOR_STORAGE:
+        export_indexes(version_dir, collection, exports["storage"], exports["backend"])
+
+
+def open_vector_store(version_dir, embeddings, search_ef: Optional[int] = None):
+    """LangChain VectorStore để search trên version, theo backend đã export (search_ef cho HNSW của Chroma)"""
+    if exports_of(version_dir).get("backend") == "numpy" and NumpyIndex.exists(version_dir):
+        return NumpyVectorStore(NumpyIndex(version_dir), embeddings)
+
+    from langchain_chroma import Chroma
+
+    store = Chroma(persist_directory=str(version_dir), embedding_function=embeddings)
+    apply_search_ef(store._collection, search_ef)
+    return wrap_vector_store(store, version_dir)
+
+
+def count_vectors(vector_store) -> int:
+    if isinstance(vector_store, NumpyVectorStore):
+        return vector_store.index.count
+    return vector_store._collection.count()
+
+
+def _maximal_marginal_relevance(query: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """Chọn k vectors vừa gần query vừa khác nhau (cosine)"""
+    if len(vectors) == 0:
+        return []
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_sim = unit @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    selected = [int(np.argmax(query_sim))]
+    while len(selected) < min(k, len(vectors)):
+        redundancy = (unit @ unit[selected].T).max(axis=1)
+        score = lambda_mult * query_sim - (1 - lambda_mult) * redundancy
+        score[selected] = -np.inf
+        selected.append(int(np.argmax(score)))
+    return selected
+
+
+class NumpyVectorStore(VectorStore):
+    """VectorStore chỉ đọc trên NumpyIndex; scores là distance giống Chroma"""
+
+    def __init__(self, index: NumpyIndex, embedding_function):
+        self.index = index
+        self._embedding_function = embedding_function
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("NumpyVectorStore is exported from a built Chroma store")
+
+    def add_texts(self, texts, metadatas=None, **kwargs) -> List[str]:
+        raise NotImplementedError("NumpyVectorStore is read-only; re-index the RAG config instead")
+
+    def _select_relevance_score_fn(self):
+        if self.index.space == "cosine":
+            return self._cosine_relevance_score_fn
+        if self.index.space == "ip":
+            return self._max_inner_product_relevance_score_fn
+        return self._euclidean_relevance_score_fn
+
+    def _to_document(self, i: int) -> Document:
+        record = self.index.record(i)
+        return Document(page_content=record["document"], metadata=record["metadata"], id=record["id"])
+
+    @staticmethod
+    def _matches(metadata: dict, filter: Optional[dict]) -> bool:
+        return not filter or all(metadata.get(key) == value for key, value in filter.items())
+
+    def _search(self, embeddings, k: int, filter: Optional[dict] = None) -> List[List[Tuple[Document, float]]]:
+        # Filter (so sánh bằng trên metadata) áp dụng sau search → lấy dư candidates
+        fetch = k * 10 if filter else k
+        results = []
+        for hits in self.index.search_batch(embeddings, fetch):
+            docs = []
+            for i, distance in hits:
+                doc = self._to_document(i)
+                if self._matches(doc.metadata, filter):
+                    docs.append((doc, distance))
+                if len(docs) == k:
+                    break
+            results.append(docs)
+        return results
+
+    def similarity_search_by_vectors_with_score(
+        self, embeddings: List[List[float]], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[List[Tuple[Document, float]]]:
+        """Batch search: một matrix multiply cho mọi queries"""
+        return self._search(embeddings, k, filter)
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self._search([embedding], k, filter)[0]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Như similarity_search_by_vector_with_score nhưng score là relevance (cao hơn = giống hơn)"""
+        return self._to_relevance(self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter))
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _to_relevance(self, results: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        relevance = self._select_relevance_score_fn()
+        return [(doc, relevance(score)) for doc, score in results]
+
+    def _similarity_search_with_relevance_scores(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self._to_relevance(self.similarity_search_with_score(query, k=k, **kwargs))
+
+    def max_marginal_relevance_search_by_vector(
+        self, embedding: List[float], k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5,
+        filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        hits = self.index.search_batch([embedding], fetch_k)[0]
+        indices = [i for i, _ in hits if self._matches(self.index.record(i)["metadata"], filter)]
+        if not indices:
+            return []
+        chosen = _maximal_marginal_relevance(
+            np.asarray(embedding, dtype=np.float32), self.index.vectors_of(indices), k, lambda_mult
+        )
+        return [self._to_document(indices[c]) for c in chosen]
+
+    def max_marginal_relevance_search(
+        self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs: Any
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self.embeddings.embed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, **kwargs
+        )
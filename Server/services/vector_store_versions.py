@@ -0,0 +1,361 @@
+"""
+Vector Store Versions
+Blue/green versioning cho vector store của mỗi RAG config: index build ghi vào một
+version mới, xong mới chuyển pointer → chat không bao giờ thấy store đang build dở.
+
+Layout:
+    chroma_db/chroma_langchain_db_<name>/
+        CURRENT                   {"version": ...} — version chat đang dùng (ghi tmp + os.replace → atomic)
+        PUBLISH.lock              khóa ngắn quanh publish (so sánh rồi ghi CURRENT)
+        BUILDING                  {"version": ...} — version đang build (giữ lại để resume nếu bị gián đoạn)
+        versions/<version>/       Chroma persist directory
+        leases/<version>/<holder> readers đang mở version (mỗi process một file)
+
+Store cũ (Chroma nằm ngay trong thư mục gốc, chưa có CURRENT) được coi là version "legacy".
+Version cũ chỉ bị xóa khi không còn reader nào giữ lease.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+import weakref
+
+
+CHROMA_BASE_DIR = Path("chroma_db")
+STORE_PREFIX = "chroma_langchain_db_"
+LEGACY_VERSION = "legacy"
+
+# Lease của process ở máy khác không kiểm tra được → coi là hết hạn sau khoảng này
+# (lớn hơn TTL cache của chat_service)
+LEASE_MAX_AGE_S = float(os.getenv("RAG_STORE_LEASE_MAX_AGE", str(3 * 86400)))
+
+# Lock file cũ hơn khoảng này là của process đã chết (lock chỉ giữ trong lúc ghi pointer)
+PUBLISH_LOCK_STALE_S = 30.0
+
+_CONTROL_NAMES = {"CURRENT", "BUILDING", "PUBLISH.lock", "versions", "leases"}
+_HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+# (store root, version) -> số readers trong process này
+_lease_counts: Dict[tuple, int] = {}
+_lease_lock = threading.Lock()
+
+
+def safe_config_name(config_name: str) -> str:
+    """Tên config an toàn để dùng làm tên thư mục"""
+    return "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in config_name)
+
+
+def store_root(config_name: str, base_dir: Path = CHROMA_BASE_DIR) -> Path:
+    """Thư mục gốc chứa mọi versions của một RAG config"""
+    return Path(base_dir) / f"{STORE_PREFIX}{safe_config_name(config_name)}"
+
+
+def dir_size(path: Path) -> int:
+    """Tổng dung lượng (bytes) các files trong thư mục"""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _holder_alive(holder: str) -> Optional[bool]:
+    """True/False nếu holder là process trên máy này, None nếu không xác định được"""
+    host, _, pid = holder.rpartition(":")
+    if host != socket.gethostname():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return None
+    return True
+
+
+class VectorStoreVersions:
+    """Quản lý các versions của một vector store"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    # ----- pointers -----
+
+    def _read_pointer(self, name: str) -> Optional[str]:
+        try:
+            return json.loads((self.root / name).read_text())["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_pointer(self, name: str, version: str) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f"{name}.{uuid.uuid4().hex}.tmp"
+        tmp.write_text(json.dumps({"version": version, "updated_at": datetime.utcnow().isoformat()}))
+        os.replace(tmp, self.root / name)
+
+    def has_legacy(self) -> bool:
+        return (self.root / "chroma.sqlite3").exists()
+
+    def current_version(self) -> Optional[str]:
+        """Version chat đang dùng (None nếu config chưa có index)"""
+        version = self._read_pointer("CURRENT")
+        if version and self.version_path(version).exists():
+            return version
+        if self.has_legacy():
+            return LEGACY_VERSION
+        return None
+
+    def building_version(self) -> Optional[str]:
+        """Version đang build dở (để resume), None nếu không có"""
+        version = self._read_pointer("BUILDING")
+        if version and self.version_path(version).exists():
+            return version
+        return None
+
+    def version_path(self, version: str) -> Path:
+        if version == LEGACY_VERSION:
+            return self.root
+        return self.root / "versions" / version
+
+    def current_path(self) -> Optional[Path]:
+        version = self.current_version()
+        return self.version_path(version) if version else None
+
+    def list_versions(self) -> List[str]:
+        versions_dir = self.root / "versions"
+        versions = sorted(p.name for p in versions_dir.iterdir() if p.is_dir()) if versions_dir.exists() else []
+        if self.has_legacy():
+            versions.insert(0, LEGACY_VERSION)
+        return versions
+
+    # ----- build / publish -----
+
+    def begin_build(self, copy_current: bool = True) -> str:
+        """
+        Version để build: resume version đang build dở nếu có, nếu không thì tạo
+        version mới là bản copy của version hiện tại (để index incremental).
+        copy_current=False → version mới rỗng (vd. collection phải tạo lại với tham số khác).
+        BUILDING được ghi dưới publish lock và chỉ khi CURRENT chưa đổi trong lúc copy: một lần
+        publish xen giữa (vd. xóa document) thì copy lại, nên thay đổi đó không bị build ghi đè.
+        """
+        building = self.building_version()
+        if building:
+            return building
+
+        for _ in range(5):
+            source = self.current_version() if copy_current else None
+            version, lease = self.copy_version(source)
+            try:
+                with self._publish_lock():
+                    if source is None or self.current_version() == source:
+                        self._write_pointer("BUILDING", version)
+                        return version
+            finally:
+                # Bản copy không dùng được thì GC dọn khi nhả lease
+                self.release(lease)
+            print(f"[VectorStore] {self.root.name}: version changed while copying {source}, copying again")
+        raise RuntimeError(f"Vector store {self.root} keeps changing, try again")
+
+    def copy_version(self, source: Optional[str]) -> tuple:
+        """
+        (version, lease) của version mới là bản copy của source (None → rỗng), không đổi
+        CURRENT/BUILDING. Dùng để sửa một version đã publish mà chat không thấy trạng thái dở
+        (sửa bản copy rồi publish); lease giữ cho GC không xóa bản copy trước khi publish.
+        """
+        version = f"v{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        lease = self.acquire(version)
+        target = self.version_path(version)
+        if source == LEGACY_VERSION:
+            target.mkdir(parents=True)
+            for entry in self.root.iterdir():
+                if entry.name in _CONTROL_NAMES or entry.name.endswith(".tmp"):
+                    continue
+                if entry.is_dir():
+                    shutil.copytree(entry, target / entry.name)
+                else:
+                    shutil.copy2(entry, target / entry.name)
+        elif source:
+            shutil.copytree(self.version_path(source), target)
+        else:
+            target.mkdir(parents=True)
+        return version, lease
+
+    def abandon_build(self) -> None:
+        """Bỏ version đang build dở (files được GC xóa sau)"""
+        (self.root / "BUILDING").unlink(missing_ok=True)
+
+    @contextmanager
+    def _publish_lock(self):
+        """Khóa giữa các processes (file tạo bằng O_EXCL) quanh việc đọc-so sánh-ghi CURRENT"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / "PUBLISH.lock"
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime > PUBLISH_LOCK_STALE_S:
+                        path.unlink(missing_ok=True)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            path.unlink(missing_ok=True)
+
+    def publish(self, version: str, expected_current: Optional[str] = None) -> bool:
+        """
+        Chuyển CURRENT sang version (atomic), readers mới sẽ dùng version này.
+        expected_current: chỉ publish nếu CURRENT vẫn là version đó (version được copy từ
+        CURRENT rồi sửa); trả về False nếu một build khác đã publish trong lúc đó.
+        """
+        with self._publish_lock():
+            if expected_current is not None and self.current_version() != expected_current:
+                return False
+            self._write_pointer("CURRENT", version)
+        if self.building_version() == version:
+            (self.root / "BUILDING").unlink(missing_ok=True)
+        print(f"[VectorStore] {self.root.name}: published version {version}")
+        return True
+
+    # ----- leases -----
+
+    def acquire(self, version: str) -> tuple:
+        """Đánh dấu process này đang đọc version (GC sẽ không xóa)"""
+        key = (str(self.root), version)
+        with _lease_lock:
+            if _lease_counts.get(key, 0) == 0:
+                lease_dir = self.root / "leases" / version
+                lease_dir.mkdir(parents=True, exist_ok=True)
+                (lease_dir / _HOLDER).touch()
+            _lease_counts[key] = _lease_counts.get(key, 0) + 1
+        return key
+
+    def release(self, key: tuple) -> None:
+        with _lease_lock:
+            count = _lease_counts.get(key, 0) - 1
+            if count > 0:
+                _lease_counts[key] = count
+                return
+            _lease_counts.pop(key, None)
+            root, version = key
+            (Path(root) / "leases" / version / _HOLDER).unlink(missing_ok=True)
+
+        # Reader cuối cùng của một version cũ → dọn ở background (không chặn thread đang chat)
+        if version not in (self.current_version(), self.building_version()):
+            threading.Thread(target=self.gc, name="vector-store-gc", daemon=True).start()
+
+    def acquire_current(self) -> tuple:
+        """
+        (version, lease) của CURRENT, hoặc (None, None) nếu chưa có index.
+        Lease được lấy trước rồi mới kiểm tra lại CURRENT, nên GC chạy song song
+        không thể xóa version giữa lúc đọc pointer và lúc mở store.
+        """
+        for _ in range(5):
+            version = self.current_version()
+            if version is None:
+                return None, None
+            lease = self.acquire(version)
+            if self.current_version() == version:
+                return version, lease
+            self.release(lease)
+        raise RuntimeError(f"Vector store {self.root} keeps changing, try again")
+
+    def hold(self, owner, lease: tuple) -> None:
+        """Giữ lease cho tới khi owner (vd. Chroma object trong cache) bị garbage collect"""
+        weakref.finalize(owner, self.release, lease)
+
+    def has_readers(self, version: str) -> bool:
+        """Còn process nào giữ lease trên version (lease của process đã chết bị xóa luôn)"""
+        lease_dir = self.root / "leases" / version
+        if not lease_dir.exists():
+            return False
+        readers = False
+        for lease in lease_dir.iterdir():
+            alive = _holder_alive(lease.name)
+            if alive is None:
+                try:
+                    alive = time.time() - lease.stat().st_mtime < LEASE_MAX_AGE_S
+                except OSError:
+                    alive = False
+            if alive:
+                readers = True
+            else:
+                lease.unlink(missing_ok=True)
+        return readers
+
+    # ----- garbage collection -----
+
+    def gc(self, dry_run: bool = False) -> dict:
+        """Xóa các versions không phải CURRENT/BUILDING và không còn reader nào"""
+        current = self.current_version()
+        building = self.building_version()
+        removed, bytes_freed = [], 0
+
+        for version in self.list_versions():
+            if version in (current, building) or self.has_readers(version):
+                continue
+            bytes_freed += self._remove_version(version, dry_run)
+            removed.append(version)
+
+        if removed:
+            print(f"[VectorStore] {self.root.name}: {'would remove' if dry_run else 'removed'} "
+                  f"{len(removed)} old versions ({bytes_freed / 1024 / 1024:.1f} MB)")
+        return {"store": str(self.root), "removed_versions": removed, "bytes_freed": bytes_freed}
+
+    def drop(self, dry_run: bool = False) -> dict:
+        """
+        Xóa cả store (config đã bị xóa): bỏ pointers, xóa mọi version không còn reader.
+        Versions còn reader được giữ lại cho lần GC sau; thư mục gốc bị xóa khi đã trống.
+        """
+        if not dry_run:
+            for name in ("CURRENT", "BUILDING"):
+                (self.root / name).unlink(missing_ok=True)
+
+        removed, kept, bytes_freed = [], [], 0
+        for version in self.list_versions():
+            if self.has_readers(version):
+                kept.append(version)
+                continue
+            bytes_freed += self._remove_version(version, dry_run)
+            removed.append(version)
+
+        if not kept and not dry_run:
+            bytes_freed += dir_size(self.root)
+            shutil.rmtree(self.root, ignore_errors=True)
+        return {"store": str(self.root), "removed_versions": removed, "kept_versions": kept,
+                "bytes_freed": bytes_freed}
+
+    def _remove_version(self, version: str, dry_run: bool) -> int:
+        """Xóa files của một version, trả về số bytes"""
+        if version == LEGACY_VERSION:
+            paths = [e for e in self.root.iterdir()
+                     if e.name not in _CONTROL_NAMES and not e.name.endswith(".tmp")]
+        else:
+            paths = [self.version_path(version)]
+        size = sum(dir_size(p) for p in paths)
+        if not dry_run:
+            for path in paths:
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink(missing_ok=True)
+            shutil.rmtree(self.root / "leases" / version, ignore_errors=True)
+        return size
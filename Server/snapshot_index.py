@@ -0,0 +1,63 @@
+"""
+Script để export/import snapshot của vector store (build index trên máy khác rồi ship sang)
+Chạy: python snapshot_index.py export --config-id 1 --out my_config.tar.gz
+      python snapshot_index.py inspect my_config.tar.gz
+      python snapshot_index.py import my_config.tar.gz [--config-name new_name] [--replace]
+"""
+import argparse
+import json
+import sys
+
+from database.connection import SessionLocal
+from models.rag_config import RAGConfig
+from services.index_snapshot import export_snapshot, import_snapshot, read_snapshot_manifest, SnapshotError
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import portable vector store snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Write a snapshot of the current index of a RAG config")
+    export_cmd.add_argument("--config-id", type=int, required=True)
+    export_cmd.add_argument("--out", required=True, help="Output archive (.tar.gz)")
+    export_cmd.add_argument("--compress-level", type=int, default=6, choices=range(1, 10))
+
+    inspect_cmd = commands.add_parser("inspect", help="Print the manifest of a snapshot")
+    inspect_cmd.add_argument("archive")
+
+    import_cmd = commands.add_parser("import", help="Load a snapshot as a new published index version")
+    import_cmd.add_argument("archive")
+    import_cmd.add_argument("--config-name", help="Target RAG config name (default: name in the snapshot)")
+    import_cmd.add_argument("--replace", action="store_true", help="Overwrite the index of an existing config")
+    args = parser.parse_args()
+
+    if args.command == "inspect":
+        manifest = read_snapshot_manifest(args.archive)
+        manifest["documents"] = len(manifest.get("documents") or [])
+        print(json.dumps(manifest, indent=2))
+        return
+
+    db = SessionLocal()
+    try:
+        if args.command == "export":
+            config = db.query(RAGConfig).filter(RAGConfig.id == args.config_id).first()
+            if not config:
+                sys.exit(f"RAG config {args.config_id} not found")
+            result = export_snapshot(db, config, args.out, compresslevel=args.compress_level)
+            print(f"\n✓ {result['vector_count']} chunks ({len(result['documents'])} documents) "
+                  f"written to {result['path']}")
+        else:
+            result = import_snapshot(db, args.archive, config_name=args.config_name, replace=args.replace)
+            print(f"\n✓ {result['message']} (config id {result['rag_config_id']}, "
+                  f"version {result['vector_store_version']})")
+            if result["documents_unmapped"]:
+                print(f"  {len(result['documents_unmapped'])} documents not found on this server "
+                      f"(chunks are searchable but not linked): {', '.join(result['documents_unmapped'][:10])}")
+    except SnapshotError as e:
+        sys.exit(f"Error: {str(e)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()